@@ -0,0 +1,94 @@
+# Copyright (c) 2022 Kanishka Jayawardane [kanishkagj@yahoo.com]
+# Copyright (c) 2022 Michael Selig
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Benchmark of the profoil.vel / profoil.xy loaders.
+# Times np.loadtxt against extract_vel/extract_xy on synthetic outputs of the usual size
+# (VELDIST 60 with 4 design alphas, 181 point .xy file) and 10x, 100x, 1000x that.
+# extract_vel reads through load_columns (fixed width parser); extract_xy is np.loadtxt itself,
+# so the "loader" column says so and its rows are expected to be at parity.
+
+# Usage (from the ui folder):
+#   python benchmarks/bench_loaders.py
+#   python benchmarks/bench_loaders.py --repeat 10 --scales 1 10 100
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from profoil_interface import extract_vel, extract_xy
+
+def write_vel(filename, n_alphas=4, n_points=181):
+    """
+    Velocity distributions in the layout of profoil.vel: phi going 0 -> 360 for each alpha
+    """
+    phi = np.linspace(0, 360, n_points)
+    with open(filename, "w") as f:
+        for a in range(n_alphas):
+            v_vinf = 1 + 0.3*np.sin(np.radians(phi)) + 0.05*a
+            f.write("".join("{:10.5f}{:10.5f}\n".format(p, v) for p, v in zip(phi, v_vinf)))
+
+def write_xy(filename, n_points=181):
+    t = np.linspace(0, 2*np.pi, n_points)
+    with open(filename, "w") as f:
+        f.write("".join("{:12.7f}{:12.7f}\n".format(x, y) for x, y in zip(0.5+0.5*np.cos(t), 0.06*np.sin(t))))
+
+def best_of(func, repeat):
+    func()  # warm up (file system cache)
+    times = []
+    for _ in range(repeat):
+        t_start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t_start)
+    return min(times)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="np.loadtxt vs extract_vel (load_columns) / extract_xy (np.loadtxt)")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100, 1000], help="multiples of the usual file size")
+    parser.add_argument("--repeat", type=int, default=5, help="best of n runs")
+    args = parser.parse_args(argv)
+
+    print("numpy {}".format(np.__version__))
+    print("{:6s} {:>7s} {:>10s} {:>14s} {:>14s} {:>14s} {:>8s}".format(
+          "file", "scale", "rows", "loadtxt [ms]", "extract [ms]", "loader", "speedup"))
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, writer, extract, loader, unit in [("vel", write_vel, extract_vel, "load_columns", {"n_alphas": 4}),
+                                                    ("xy",  write_xy,  extract_xy,  "np.loadtxt",   {"n_points": 181})]:
+            for scale in args.scales:
+                filename = Path(tmp)/"profoil_{}x.{}".format(scale, name)
+                key = list(unit)[0]
+                writer(filename, **{key: unit[key]*scale})
+
+                expected = np.loadtxt(filename)
+                assert np.array_equal(expected.T, extract(filename)), "loaders disagree"
+
+                t_old = best_of(lambda: np.loadtxt(filename), args.repeat)
+                t_new = best_of(lambda: extract(filename), args.repeat)
+                print("{:6s} {:>6d}x {:>10d} {:>14.3f} {:>14.3f} {:>14s} {:>7.2f}x".format(
+                      name, scale, len(expected), 1e3*t_old, 1e3*t_new, loader, t_old/t_new))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
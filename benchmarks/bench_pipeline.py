@@ -0,0 +1,260 @@
+# Copyright (c) 2022 Kanishka Jayawardane [kanishkagj@yahoo.com]
+# Copyright (c) 2022 Michael Selig
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Benchmark of the post-run pipeline on synthetic PROFOIL outputs (see fake_profoil.py), headless with the Agg backend.
+
+# +------------+--------------------------------------------------------------------+
+# | Scenario   | Timed work                                                         |
+# +------------+--------------------------------------------------------------------+
+# | parse      | extract_all_data(...) from the text outputs (no sidecar)           |
+# | sidecar    | extract_all_data(...) mapped from an up to date sidecar            |
+# | splines    | phi->x,y splines of a fresh RunResult                              |
+# | markers    | xy/velocity markers and velocity lines of a fresh RunResult        |
+# | plot       | plot_ue + plot_xy + plot_nu_alfa of a parsed run, drawn by Agg     |
+# | redraw     | full draw of the figure holding a run and its previous run         |
+# | round_trip | fake PROFOIL run + parse + plot + draw                             |
+# | click_draw | left click in cursor edit mode, the whole figure is drawn again    |
+# | click_blit | left click in cursor edit mode, only the edit line is blitted      |
+# +------------+--------------------------------------------------------------------+
+
+# Each scenario is timed on every size (FOIL segments : ALFASP alphas : points) and the results are
+# written as JSON, with the number of full figure draws per call (1 for plot and round_trip, 0 for a blitted click). Passing the JSON of an earlier run with --compare prints the ratios next to the timings.
+
+# Usage (from the ui folder):
+#   python benchmarks/bench_pipeline.py -o bench_pipeline.json
+#   python benchmarks/bench_pipeline.py --sizes 20:4:181 60:20:721 --repeat 10 --compare bench_pipeline.json
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import matplotlib
+import profoil_interface as p_intf
+from profoil_canvas import ProfoilCanvas
+from profoil_runner import ProfoilProcess
+from profoil_sidecar import SIDECAR_NAME
+
+# profoil_canvas selects Qt5Agg on import, the benchmark renders off screen
+import matplotlib.pyplot as plt
+plt.switch_backend("Agg")
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backend_bases import MouseEvent
+
+FAKE_PROFOIL = Path(__file__).resolve().with_name("fake_profoil.py")
+sys.path.insert(0, str(FAKE_PROFOIL.parent))
+from fake_profoil import make_input
+
+SCENARIOS = ["parse", "sidecar", "splines", "markers", "plot", "redraw", "round_trip", "click_draw", "click_blit"]
+DEFAULT_SIZES = ["20:4:181", "40:10:361", "80:40:1441"]
+
+class BenchCanvas(ProfoilCanvas):
+    """
+    The plotting half of ProfoilUI: the canvas with a run_result, drawn by Agg instead of Qt
+    """
+    def __init__(self):
+        super().__init__()
+        FigureCanvasAgg(self.gui_fig)
+        self.run_result = None
+        # on_click sets the cursor of the Qt canvas widget, there is none here
+        self.canvas = self
+
+    def setCursor(self, cursor):
+        pass
+
+    def plot_all(self, run_result):
+        self.run_result = run_result
+        with self.batch_render("Plot"):
+            self.plot_ue()
+            self.plot_xy()
+            self.plot_nu_alfa()
+
+    def start_cursor_edit(self, blit):
+        """
+        Cursor edit mode on the plotted run with an empty edit line, as after clicking "Cursor Edit"
+        """
+        self.set_cursor_edit_blit(blit)
+        self.ready_to_interact = True
+        self.edit_mode = True
+        self.cursor_edit_line_points = []
+        self.cursor_edit_line.set_data([], [])
+        self.gui_fig.canvas.draw()
+
+    def click(self, n):
+        """
+        Left click n of a row of clicks across the middle of an_ax
+        """
+        (x0, y0), (x1, y1) = self.an_ax.bbox.get_points()
+        x = x0 + (x1 - x0)*(0.1 + 0.8*(n % 50)/50)
+        event = MouseEvent("button_press_event", self.gui_fig.canvas, x, 0.5*(y0 + y1), button=1)
+        self.gui_fig.canvas.callbacks.process(event.name, event)
+
+def fake_command(points):
+    return [sys.executable, str(FAKE_PROFOIL), "--points", str(points)]
+
+def run_fake_profoil(workdir, points):
+    process = ProfoilProcess(workdir, timeout=60, command=fake_command(points))
+    if process.run() != "finished":
+        raise RuntimeError("fake PROFOIL failed: {}".format(process.error))
+
+def time_scenario(func, repeat, setup=None, scheduler=None):
+    """
+    Best and median wall time in ms of repeat calls to func, after one warm up call,
+    and the full figure draws per call counted by the render scheduler.
+    setup is called before every call, outside of the timing.
+    """
+    times = []
+    draws = 0
+    for i in range(repeat + 1):
+        if setup: setup()
+        n_draws = scheduler.full_draws
+        t_start = time.perf_counter()
+        func()
+        if i:
+            times.append(1e3*(time.perf_counter() - t_start))
+            draws += scheduler.full_draws - n_draws
+    return {"best_ms": round(min(times), 4), "median_ms": round(statistics.median(times), 4), "draws": draws/repeat}
+
+def bench_size(workdir, segments, alphas, points, repeat, scenarios, canvas):
+    workdir = Path(workdir)
+    (workdir/"profoil.in").write_text(make_input(segments, alphas))
+    run_fake_profoil(workdir, points)
+    sidecar = workdir/SIDECAR_NAME
+
+    def drop_sidecar():
+        if sidecar.is_file(): sidecar.unlink()
+
+    runs = {}
+    def new_run():
+        runs["run"] = p_intf.RunResult(**p_intf.extract_raw_data(workdir))
+
+    def markers():
+        run = runs["run"]
+        run.xy_marker_upper, run.xy_marker_lower
+        run.upper_vel_markers, run.lower_vel_markers
+        run.ue_lines
+
+    def new_run_with_markers():
+        new_run()
+        markers()
+
+    clicks = []
+    def click():
+        canvas.click(len(clicks))
+        clicks.append(1)
+
+    def start_cursor_edit(blit):
+        canvas.plot_all(runs["run"])
+        canvas.start_cursor_edit(blit)
+        clicks.clear()
+
+    def plot_with_history():
+        canvas.plot_all(runs["run"])
+        canvas.plot_all(runs["run"])
+
+    def round_trip():
+        run_fake_profoil(workdir, points)
+        canvas.plot_all(p_intf.extract_all_data(workdir))
+
+    # scenario: (timed function, untimed setup)
+    jobs = {"parse"     : (lambda: p_intf.extract_all_data(workdir), drop_sidecar),
+            "sidecar"   : (lambda: p_intf.extract_all_data(workdir), lambda: p_intf.extract_raw_data(workdir)),
+            "splines"   : (lambda: runs["run"].phi2xy_splines,       new_run),
+            "markers"   : (markers,                                  new_run),
+            "plot"      : (lambda: canvas.plot_all(runs["run"]),     new_run_with_markers),
+            "redraw"    : (canvas.gui_fig.canvas.draw,               None),
+            "round_trip": (round_trip,                               None),
+            "click_draw": (click,                                    None),
+            "click_blit": (click,                                    None)}
+    # clicks add up on the edit line of one plotted run, as in an edit session
+    setups = {"redraw"    : plot_with_history,
+              "click_draw": lambda: start_cursor_edit(False),
+              "click_blit": lambda: start_cursor_edit(True)}
+
+    results = []
+    for name in scenarios:
+        func, setup = jobs[name]
+        if name in setups:
+            new_run_with_markers()
+            setups[name]()
+        result = {"scenario": name, "segments": segments, "alphas": alphas, "points": points, "repeat": repeat}
+        result.update(time_scenario(func, repeat, setup, canvas.render_scheduler))
+        results.append(result)
+    return results
+
+def environment():
+    return {"date"      : datetime.datetime.now().isoformat(timespec="seconds"),
+            "python"    : platform.python_version(),
+            "numpy"     : np.__version__,
+            "matplotlib": matplotlib.__version__,
+            "backend"   : matplotlib.get_backend(),
+            "platform"  : platform.platform(),
+            "cpu_count" : os.cpu_count()}
+
+def result_key(result):
+    return result["scenario"], result["segments"], result["alphas"], result["points"]
+
+def parse_size(text):
+    segments, alphas, points = (int(n) for n in text.split(":"))
+    return segments, alphas, points
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Timings of the post-run pipeline on synthetic PROFOIL outputs")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="segments:alphas:points, ex: 20:4:181")
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per scenario")
+    parser.add_argument("-o", "--output", help="JSON file the results are written to")
+    parser.add_argument("--compare", help="JSON of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        baseline = {result_key(r): r for r in json.loads(Path(args.compare).read_text())["results"]}
+
+    canvas  = BenchCanvas()
+    results = []
+    print("{:10s} {:>9s} {:>7s} {:>7s} {:>10s} {:>12s} {:>6s} {:>8s}".format(
+          "scenario", "segments", "alphas", "points", "best [ms]", "median [ms]", "draws", "vs base"))
+    with tempfile.TemporaryDirectory(prefix="profoil_bench_") as workdir:
+        for size in args.sizes:
+            for result in bench_size(workdir, *parse_size(size), args.repeat, args.scenarios, canvas):
+                base = baseline.get(result_key(result))
+                ratio = "{:7.2f}x".format(result["best_ms"]/base["best_ms"]) if base else ""
+                print("{scenario:10s} {segments:>9d} {alphas:>7d} {points:>7d} {best_ms:>10.3f} {median_ms:>12.3f} {draws:>6.1f} ".format(**result) + ratio)
+                results.append(result)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"environment": environment(), "results": results}, indent=2))
+        print("Results written to {}".format(args.output))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+# Copyright (c) 2022 Kanishka Jayawardane [kanishkagj@yahoo.com]
+# Copyright (c) 2022 Michael Selig
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Synthetic stand-in for the PROFOIL executable, for benchmarks and for trying the UI out without the binary.
+# Run from a work directory holding profoil.in, it writes profoil.xy, profoil.dmp and profoil.vel in the
+# formats PROFOIL uses and prints a log (Newton iterations, Airfoil Name, STATISTICS) on stdout.
+# Nothing is solved: the numbers only have to look like a design.
+
+# +-------------+------------------------------------------------------------+
+# | Output      | Size                                                       |
+# +-------------+------------------------------------------------------------+
+# | profoil.xy  | --points coordinates                                       |
+# | profoil.vel | --points phi-v/v_inf rows (+1 LE stagnation point on every |
+# |             | other alpha) for each of the ALFASP alphas                 |
+# | profoil.dmp | one FOIL line per FOIL line of profoil.in, ILE, PHIS       |
+# | stdout      | --iterations Newton iteration lines + STATISTICS           |
+# +-------------+------------------------------------------------------------+
+
+# Usage:
+#   python fake_profoil.py --make-input --segments 20 --alphas 4 > profoil.in
+#   python fake_profoil.py --points 181 > profoil.log      (PROFOIL itself, from the work directory)
+# As a PROFOIL command for the runners: [sys.executable, "benchmarks/fake_profoil.py", "--points", "181"]
+
+import argparse
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+
+def make_input(segments=20, alphas=4, name="Fake Foil"):
+    """
+    profoil.in text with the given number of FOIL segments (half on each surface) and ALFASP alphas
+    """
+    nu   = np.linspace(0, 60, segments, endpoint=False)     # phi = 6 nu
+    alfa = 12 - 14*np.sin(np.radians(3*nu))**2
+    ile  = segments//2
+    foils = "\n".join("FOIL{:12.5f}{:12.5f}{:5d}{:4d}".format(n, a, i, 0)
+                      for i, (n, a) in enumerate(zip(nu, alfa), start=1))
+    alfasp = "\n".join(" {:.1f}".format(a) for a in np.linspace(-2, 10, alphas))
+    return ("COMMENT synthetic input of fake_profoil.py\nNAME {}\n{}\nILE {}\nPHIS 2.0 3.0\n"
+            "ALFASP {}\n{}\nNEWT1G 1 0\nVELDIST 60\nDUMP\nFINI\n").format(name, foils, ile, alphas, alfasp)
+
+def parse_input(text):
+    foil   = [(float(nu), float(alfa)) for nu, alfa in re.findall(r"^FOIL\s+(\S+)\s+(\S+)", text, flags=re.M)]
+    ile    = int(re.search(r"^ILE\s+(\d+)", text, flags=re.M).group(1))
+    phis   = re.search(r"^PHIS\s+(.*)", text, flags=re.M).group(1).strip()
+    alfasp = int(re.search(r"^ALFASP\s+(\d+)", text, flags=re.M).group(1))
+    name   = re.search(r"^NAME\s+(.*)", text, flags=re.M)
+    return foil, ile, phis, alfasp, name.group(1).strip() if name else "Unnamed"
+
+def write_outputs(workdir=".", points=181, iterations=5, out=sys.stdout):
+    """
+    Reads profoil.in of workdir, writes the output files and the log lines to out
+    """
+    workdir = Path(workdir)
+    foil, ile, phis, n_alphas, name = parse_input((workdir/"profoil.in").read_text())
+
+    for it in range(1, iterations + 1):
+        out.write(" ITERATION {:d}   RESIDUAL = {:.4E}\n".format(it, 10.0**-it))
+
+    # converged alpha* differ slightly from the prescribed ones
+    with open(workdir/"profoil.dmp", "w") as f:
+        for i, (nu, alfa) in enumerate(foil, start=1):
+            f.write("FOIL{:12.5f}{:12.5f}{:5d}{:4d}\n".format(nu, alfa + 0.01*np.sin(i), i, 0))
+        f.write("ILE {}\nPHIS {}\n".format(ile, phis))
+
+    # NACA 4 digit like contour on the equidistant phi distribution PROFOIL uses
+    phi = np.linspace(0, 360, points)
+    x   = 0.5 + 0.5*np.cos(np.radians(phi))
+    t   = 0.6*(0.2969*np.sqrt(x) - 0.1260*x - 0.3516*x**2 + 0.2843*x**3 - 0.1015*x**4)
+    y   = np.where(phi <= 180, t, -t) + 0.08*x*(1 - x)
+    with open(workdir/"profoil.xy", "w") as f:
+        f.write("".join("{:12.7f}{:12.7f}\n".format(a, b) for a, b in zip(x, y)))
+
+    with open(workdir/"profoil.vel", "w") as f:
+        for k, alpha in enumerate(np.linspace(-2, 10, n_alphas)):
+            phi_a = phi if k % 2 == 0 else np.insert(phi, points//2, phi[points//2] - 0.5)
+            v_vinf = np.abs(2*np.sin(np.radians(phi_a/2 - 90 + alpha))) * (1 + 0.1*np.sin(np.radians(phi_a)))
+            f.write("".join("{:10.5f}{:10.5f}\n".format(a, b) for a, b in zip(phi_a, v_vinf)))
+
+    stats = ["t/c    =   0.1200", "x/c at t/c max = 0.3000", "camber  =  0.0200", "cm0 = -0.0500",
+             "alpha_zl = -2.10", "LE radius = 0.0150", "area = 0.0800", "iterations = {}".format(iterations),
+             "K_S = 0.0", "TEX = 0.0", "TEY = 0.0", "omega_us = 1.0", "omega_ls = 1.0", "CPU time = 0.01 s"]
+    out.write(" Airfoil Name: {}\n AIRFOIL DESIGN IS FINISHED\n ********** STATISTICS **********\n".format(name))
+    out.write("".join("   {}\n".format(s) for s in stats))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic stand-in for PROFOIL")
+    parser.add_argument("--points", type=int, default=181, help="points of the .xy file and of each velocity distribution")
+    parser.add_argument("--iterations", type=int, default=5, help="Newton iteration lines in the log")
+    parser.add_argument("--make-input", action="store_true", help="print a profoil.in instead of running")
+    parser.add_argument("--segments", type=int, default=20, help="FOIL lines of --make-input")
+    parser.add_argument("--alphas", type=int, default=4, help="ALFASP alphas of --make-input")
+    args = parser.parse_args(argv)
+
+    if args.make_input:
+        sys.stdout.write(make_input(args.segments, args.alphas))
+    else:
+        write_outputs(".", args.points, args.iterations)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
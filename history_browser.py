@@ -0,0 +1,170 @@
+# Copyright (c) 2022 Kanishka Jayawardane [kanishkagj@yahoo.com]
+# Copyright (c) 2022 Michael Selig
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Qt browser of the design history database (profoil_history.py).
+# The table model reads the runs one HISTORY_PAGE_SIZE page at a time as the view scrolls down
+# (canFetchMore/fetchMore), so thousands of runs can be browsed without loading them all.
+# Selecting a run and pressing "Plot" (or double clicking it) emits plot_requested with the run id,
+# the main window re-plots the stored arrays without running PROFOIL.
+
+import datetime
+
+from PyQt5 import QtCore, QtWidgets
+
+from preferences import HISTORY_PAGE_SIZE
+
+class HistoryModel(QtCore.QAbstractTableModel):
+
+    COLUMNS = ["#", "Date", "Airfoil", "Status", "Converged", "Elapsed [s]"]
+
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.rows = []
+        self.stat_names = []
+        self.airfoil_name = None
+        self.converged = None
+        self.exhausted = False
+
+    def set_filter(self, airfoil_name=None, converged=None):
+        """
+        Restarts from the newest run with the given filters, see HistoryDB.page(...)
+        """
+        self.beginResetModel()
+        self.airfoil_name = "%{}%".format(airfoil_name) if airfoil_name else None
+        self.converged = converged
+        self.rows, self.exhausted = [], False
+        self.endResetModel()
+        self.fetchMore()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS) + len(self.stat_names)
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        if parent.isValid() or self.exhausted: return
+        before = self.rows[-1].id if self.rows else None
+        page = self.history.page(before, HISTORY_PAGE_SIZE, self.airfoil_name, self.converged)
+        self.exhausted = len(page) < HISTORY_PAGE_SIZE
+
+        # STATISTICS columns are taken from the runs as they come in
+        new_names = [name for run in page for name in run.stats if name not in self.stat_names]
+        new_names = list(dict.fromkeys(new_names))
+        if new_names:
+            first = self.columnCount()
+            self.beginInsertColumns(QtCore.QModelIndex(), first, first + len(new_names) - 1)
+            self.stat_names += new_names
+            self.endInsertColumns()
+
+        if page:
+            self.beginInsertRows(QtCore.QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows += page
+            self.endInsertRows()
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role != QtCore.Qt.DisplayRole or orientation != QtCore.Qt.Horizontal: return None
+        return self.COLUMNS[section] if section < len(self.COLUMNS) else self.stat_names[section - len(self.COLUMNS)]
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or role not in (QtCore.Qt.DisplayRole, QtCore.Qt.TextAlignmentRole): return None
+        run, column = self.rows[index.row()], index.column()
+        if role == QtCore.Qt.TextAlignmentRole:
+            return int(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter) if column not in (1, 2, 3) else None
+        if column == 0: return run.id
+        if column == 1: return datetime.datetime.fromtimestamp(run.created).strftime("%Y-%m-%d %H:%M:%S")
+        if column == 2: return run.airfoil_name
+        if column == 3: return run.status
+        if column == 4: return "yes" if run.converged else "no"
+        if column == 5: return "" if run.elapsed is None else "{:.2f}".format(run.elapsed)
+        value = run.stats.get(self.stat_names[column - len(self.COLUMNS)])
+        return "" if value is None else "{:g}".format(value)
+
+    def run_id(self, row):
+        return self.rows[row].id
+
+class HistoryBrowser(QtWidgets.QDialog):
+
+    # emitted with the id of the run to re-plot
+    plot_requested = QtCore.pyqtSignal(int)
+
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Run History")
+        self.resize(900, 500)
+        self.history = history
+
+        self.name_filter = QtWidgets.QLineEdit(self)
+        self.name_filter.setPlaceholderText("Airfoil name contains ...")
+        self.converged_only = QtWidgets.QCheckBox("Converged only", self)
+        self.lbl_count = QtWidgets.QLabel(self)
+
+        self.model = HistoryModel(history, self)
+        self.table = QtWidgets.QTableView(self)
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+
+        self.btn_plot  = QtWidgets.QPushButton("Plot", self)
+        self.btn_close = QtWidgets.QPushButton("Close", self)
+
+        filters = QtWidgets.QHBoxLayout()
+        filters.addWidget(self.name_filter)
+        filters.addWidget(self.converged_only)
+        filters.addStretch()
+        filters.addWidget(self.lbl_count)
+        buttons = QtWidgets.QHBoxLayout()
+        buttons.addStretch()
+        buttons.addWidget(self.btn_plot)
+        buttons.addWidget(self.btn_close)
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addLayout(filters)
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+
+        # filtering is applied once typing pauses, not on every key stroke
+        self.filter_timer = QtCore.QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(300)
+        self.filter_timer.timeout.connect(self.refresh)
+        self.name_filter.textChanged.connect(self.filter_timer.start)
+        self.converged_only.toggled.connect(self.refresh)
+        self.table.doubleClicked.connect(self.plot_selected)
+        self.btn_plot.clicked.connect(self.plot_selected)
+        self.btn_close.clicked.connect(self.close)
+
+        self.refresh()
+
+    def refresh(self):
+        self.model.set_filter(self.name_filter.text().strip() or None, True if self.converged_only.isChecked() else None)
+        self.lbl_count.setText("{} runs in the database".format(len(self.history)))
+        self.table.resizeColumnsToContents()
+
+    def plot_selected(self, index=None):
+        rows = self.table.selectionModel().selectedRows()
+        if rows:
+            self.plot_requested.emit(self.model.run_id(rows[0].row()))
@@ -0,0 +1,216 @@
+# Copyright (c) 2022 Kanishka Jayawardane [kanishkagj@yahoo.com]
+# Copyright (c) 2022 Michael Selig
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Headless batch runner.
+# Re-runs every *.in file found under a directory (recursively) with PROFOIL, spread over all the cores.
+# This module does not import PyQt5 or matplotlib so it can be run on machines without a display.
+
+# Each file is run by a worker process in the process' own warm worker slot (see profoil_pool.py),
+# and the results are written into the output directory mirroring the input directory layout.
+
+# +------------------------+----------------------------------------------------+
+# | Output                 | Content                                            |
+# +------------------------+----------------------------------------------------+
+# | <name>.json            | status, convergence flag, airfoil name, STATISTICS |
+# |                        | (numbers), Newton iterations, log errors/warnings, |
+# |                        | peak v/v_inf and its phi for every AoA             |
+# |                        | and the per-job timings                            |
+# | <name>.xy              | airfoil coordinates (converged runs only)          |
+# | <name>.log             | profoil.log of the run                             |
+# | report.csv/report.json | one row per input file + throughput                |
+# +------------------------+----------------------------------------------------+
+
+# Usage (from the ui folder, same as profoil_ui.py):
+#   python profoil_batch.py ../runs -o ../batch
+
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from preferences import PROFOIL_TIMEOUT
+from profoil_interface import EXEC_ABS_PATH, iter_vel_blocks
+from profoil_pool import process_slot, TIMINGS
+
+def find_in_files(in_dir, pattern="*.in"):
+    return sorted(Path(in_dir).rglob(pattern))
+
+def run_in_file(in_file, out_file_stem, timeout=PROFOIL_TIMEOUT, command=None):
+    """
+    Runs a single .in file in the worker slot of the process and writes the per-file outputs
+    next to out_file_stem. Returns the summary dict, which is also saved as <stem>.json
+    This is the function executed in the worker processes, so it must stay importable at the module level.
+    """
+    in_file, out_file_stem = Path(in_file), Path(out_file_stem)
+    out_file_stem.parent.mkdir(parents=True, exist_ok=True)
+
+    summary = {"file": str(in_file), "status": None, "converged": False,
+               "airfoil_name": None, "elapsed": None, "stats": {}, "error": None}
+
+    slot = process_slot()
+    ctx  = slot.ctx
+    with slot.job():
+        process = slot.run(in_file.read_text(), timeout=timeout, command=command)
+        summary["status"]  = process.status
+        summary["elapsed"] = round(process.elapsed, 4)
+        summary["error"]   = process.error
+        if process.failure:
+            summary["failure"] = process.failure
+
+        if ctx.log_file.is_file():
+            shutil.copy(ctx.log_file, out_file(out_file_stem, ".log"))
+            log = ctx.log
+            summary["converged"]         = process.succeeded and log.converged
+            summary["airfoil_name"]      = log.airfoil_name
+            summary["log_errors"]        = log.errors
+            summary["log_warnings"]      = log.warnings
+            summary["newton_iterations"] = len(log.residuals)
+
+        if summary["converged"]:
+            summary["stats"] = log.stats
+            summary["vel_peaks"] = vel_peaks(ctx.vel_file)
+            shutil.copy(ctx.xy_file, out_file(out_file_stem, ".xy"))
+
+    summary["timing"] = {name: round(t, 6) for name, t in slot.last_job.items()}
+    out_file(out_file_stem, ".json").write_text(json.dumps(summary, indent=2))
+    return summary
+
+def out_file(out_file_stem, suffix):
+    # appended rather than with_suffix(...), which would replace the ".v2" of "ex1.v2"
+    return out_file_stem.with_name(out_file_stem.name + suffix)
+
+def out_file_stems(in_files, in_dir, out_dir):
+    """
+    Output stem of every input file, mirroring in_dir under out_dir.
+    Raises ValueError when two inputs would write the same outputs (ex1.in and ex1.dat with -p "ex1.*").
+    """
+    stems, seen = [], {}
+    for f in in_files:
+        stem = out_dir/f.relative_to(in_dir).with_suffix("")
+        key  = os.path.normcase(str(stem))
+        if key in seen:
+            raise ValueError("{} and {} would write the same outputs {}.*".format(seen[key], f, stem))
+        seen[key] = f
+        stems.append(stem)
+    return stems
+
+def vel_peaks(vel_file):
+    """
+    Peak v/v_inf and its phi for every AoA of a .vel file, streamed one AoA at a time.
+    """
+    peaks = []
+    for phi, v_vinf in iter_vel_blocks(vel_file):
+        i = v_vinf.argmax()
+        peaks.append({"phi": float(phi[i]), "v_vinf": float(v_vinf[i])})
+    return peaks
+
+def run_batch(in_files, in_dir, out_dir, jobs=None, timeout=PROFOIL_TIMEOUT, command=None, verbose=True):
+    """
+    Fans the in_files out on a process pool and returns the list of summaries
+    (in the same order as in_files) along with the wall-clock time taken.
+    """
+    in_dir, out_dir = Path(in_dir), Path(out_dir)
+    stems = out_file_stems(in_files, in_dir, out_dir)
+    summaries = [None]*len(in_files)
+
+    t_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        futures = {pool.submit(run_in_file, f, stem, timeout, command): i
+                   for i, (f, stem) in enumerate(zip(in_files, stems))}
+        for n, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            try:
+                summaries[i] = future.result()
+            except Exception as e:
+                # anything which is not a PROFOIL failure (unreadable input, disk full etc..)
+                summaries[i] = {"file": str(in_files[i]), "status": "error", "converged": False,
+                                "airfoil_name": None, "elapsed": None, "stats": {}, "error": str(e)}
+            if verbose:
+                print("[{:4d}/{:4d}] {:9s} {}".format(n, len(in_files), summaries[i]["status"], in_files[i]))
+    elapsed = time.perf_counter() - t_start
+    return summaries, elapsed
+
+def write_report(summaries, elapsed, out_dir):
+    """
+    Writes report.json (everything) and report.csv (one row per file, STATISTICS flattened into columns)
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    throughput = len(summaries)/elapsed if elapsed else 0.0
+    timings = [s["timing"] for s in summaries if s.get("timing")]
+
+    report = {"files": len(summaries),
+              "converged": sum(s["converged"] for s in summaries),
+              "elapsed": round(elapsed, 4),
+              "files_per_sec": round(throughput, 4),
+              "mean_timing": {name: round(sum(t[name] for t in timings)/len(timings), 6) if timings else None
+                              for name in TIMINGS},
+              "runs": summaries}
+    (out_dir/"report.json").write_text(json.dumps(report, indent=2))
+
+    stat_names = list(dict.fromkeys(name for s in summaries for name in s["stats"]))
+    with (out_dir/"report.csv").open("w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["file", "status", "converged", "airfoil_name", "elapsed", "error", "newton_iterations"] + stat_names)
+        for s in summaries:
+            writer.writerow([s["file"], s["status"], s["converged"], s["airfoil_name"], s["elapsed"], s.get("error") or "",
+                             s.get("newton_iterations", "")] +
+                            [s["stats"].get(name, "") for name in stat_names])
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs PROFOIL on every .in file in a directory tree.")
+    parser.add_argument("in_dir", help="directory searched recursively for input files")
+    parser.add_argument("-o", "--out-dir", default="../batch", help="directory for the results (default: ../batch)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of worker processes (default: all cores)")
+    parser.add_argument("-p", "--pattern", default="*.in", help="glob pattern of the input files (default: *.in)")
+    parser.add_argument("-t", "--timeout", type=float, default=PROFOIL_TIMEOUT, help="wall-clock limit per run in seconds, 0 disables")
+    parser.add_argument("--profoil", default=EXEC_ABS_PATH, help="PROFOIL executable (default: the one in BIN_DIR)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no per-file progress lines")
+    args = parser.parse_args(argv)
+
+    in_files = find_in_files(args.in_dir, args.pattern)
+    if not in_files:
+        print("No {} files found in {}".format(args.pattern, args.in_dir))
+        return 1
+
+    try:
+        summaries, elapsed = run_batch(in_files, args.in_dir, args.out_dir, args.jobs,
+                                       args.timeout, [str(Path(args.profoil).resolve())], not args.quiet)
+    except ValueError as e:
+        print(e)
+        return 1
+    report = write_report(summaries, elapsed, args.out_dir)
+
+    print("{} files, {} converged in {:.2f} s ({:.2f} files/sec)".format(
+          report["files"], report["converged"], elapsed, report["files_per_sec"]))
+    print("mean per-job overhead {:.2f} ms (PROFOIL itself {:.2f} ms)".format(
+          1e3*(report["mean_timing"]["overhead"] or 0), 1e3*(report["mean_timing"]["profoil"] or 0)))
+    print("Report written to {}".format(Path(args.out_dir).resolve()/"report.csv"))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+# Copyright (c) 2022 Kanishka Jayawardane [kanishkagj@yahoo.com]
+# Copyright (c) 2022 Michael Selig
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Content addressed cache of PROFOIL outputs.
+# PROFOIL is deterministic, so the outputs of a run are fully defined by the profoil.in text
+# and the PROFOIL executable itself. A run is keyed on the hash of both,
+
+#   key = sha256( sha256(executable) + normalized profoil.in )
+
+# and its output files are kept in RESULT_CACHE_DIR/<key>/ so that running the same input again
+# (Revert, toggling back and forth between designs, re-opening a file) restores the outputs
+# instead of re-running PROFOIL. Normalization drops trailing white spaces and line ending differences
+# so that saving the file from the File View does not invalidate the entry.
+
+# Entries are evicted in least recently used order once the cache grows over RESULT_CACHE_SIZE_MB.
+# The last use of an entry is tracked through the mtime of its directory.
+
+# The cache directory is shared by the worker threads of a process and by other processes (UI instances,
+# the profoil server), so an entry can be evicted at any time: an entry which disappears while being
+# restored is a miss, and the outputs are only moved into the workdir once all of them have been copied.
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+from preferences import RESULT_CACHE_DIR, RESULT_CACHE_SIZE_MB
+from profoil_interface import EXEC_ABS_PATH
+from profoil_sidecar import SIDECAR_NAME, is_sidecar_file, sidecar_files
+
+CACHED_FILES = ["profoil.xy", "profoil.dmp", "profoil.vel", "profoil.log"]
+
+# the sidecar files (profoil_sidecar.py) are added to an entry once available,
+# and restored along with the outputs when present
+
+def normalize_input(text):
+    return "\n".join(line.rstrip() for line in text.splitlines()).strip() + "\n"
+
+def hash_file(filename, chunk_size=1<<20):
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ResultCache:
+
+    def __init__(self, cache_dir=RESULT_CACHE_DIR, max_size_mb=RESULT_CACHE_SIZE_MB, executable=EXEC_ABS_PATH):
+        self.cache_dir  = Path(cache_dir).resolve()
+        self.max_bytes  = int((max_size_mb or 0) * 1024 * 1024)
+        self.executable = Path(executable)
+
+        self.hits   = 0
+        self.misses = 0
+        self._lock  = threading.Lock()   # hits/misses and the executable hash, shared by worker threads
+
+        # executable hash is only re-computed when the executable changes on the disk
+        self._exec_stamp = None
+        self._exec_hash  = None
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def executable_hash(self):
+        try:
+            stat = self.executable.stat()
+        except OSError:
+            return "missing-executable"
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if stamp != self._exec_stamp:
+                self._exec_hash, self._exec_stamp = hash_file(self.executable), stamp
+            return self._exec_hash
+
+    def key(self, in_text):
+        return hashlib.sha256((self.executable_hash() + normalize_input(in_text)).encode()).hexdigest()
+
+    def __contains__(self, in_text):
+        return self.enabled and (self.cache_dir/self.key(in_text)).is_dir()
+
+    def restore(self, in_text, workdir):
+        """
+        Copies the cached outputs for the given input into the workdir.
+        Returns True on a hit, False on a miss.
+        The files are copied under temporary names first and renamed once all of them are there,
+        so a workdir never ends up with a mix of files from different runs.
+        """
+        if not self.enabled: return False
+        entry = self.cache_dir/self.key(in_text)
+        workdir = Path(workdir)
+        names = CACHED_FILES + [f.name for f in sidecar_files(entry/SIDECAR_NAME)]
+        staged = []
+        try:
+            for name in names:
+                shutil.copy(entry/name, workdir/(".restore_" + name))
+                staged.append(name)
+            os.utime(entry)  # mark as recently used
+        except OSError:
+            # missing, or evicted by another thread/process while being copied
+            for name in staged:
+                os.unlink(workdir/(".restore_" + name))
+            self.count(misses=1)
+            return False
+        for name in staged:
+            os.replace(workdir/(".restore_" + name), workdir/name)
+        with os.scandir(workdir) as files:
+            for f in files:
+                if is_sidecar_file(f.name) and f.name not in staged:
+                    os.unlink(f.path)   # left over from another run
+        self.count(hits=1)
+        return True
+
+    def count(self, hits=0, misses=0):
+        with self._lock:
+            self.hits   += hits
+            self.misses += misses
+
+    def attach(self, in_text, filename):
+        """
+        Adds the sidecar (given by its header file) to the existing entry of the given input.
+        The header is copied last, so the entry only lists the sidecar once it is complete.
+        """
+        if not self.enabled: return
+        entry = self.cache_dir/self.key(in_text)
+        filename = Path(filename)
+        if filename.name != SIDECAR_NAME or not entry.is_dir() or (entry/filename.name).is_file(): return
+        try:
+            for f in sidecar_files(filename):
+                staging = entry/(".staging_" + f.name)
+                shutil.copy(f, staging)
+                os.replace(staging, entry/f.name)
+        except OSError:
+            pass   # entry evicted in the meantime
+
+    def store(self, in_text, workdir):
+        """
+        Adds the outputs in the workdir to the cache under the given input.
+        Files are first copied into a temporary directory which is then renamed into place,
+        so an interrupted store never leaves a half written entry behind.
+        """
+        if not self.enabled: return
+        if not all((Path(workdir)/name).is_file() for name in CACHED_FILES): return
+        entry = self.cache_dir/self.key(in_text)
+        try:
+            os.utime(entry)   # already stored
+            return
+        except OSError:
+            pass
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=".staging_", dir=self.cache_dir))
+        try:
+            for name in CACHED_FILES:
+                shutil.copy(Path(workdir)/name, staging/name)
+        except OSError:
+            # outputs removed by a new run or disk full, nothing is cached for this input
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        try:
+            staging.rename(entry)
+        except OSError:
+            # same entry has been stored in the meantime (another UI instance for ex:)
+            shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        """
+        list of (last_used, size_in_bytes, path) of all the entries
+        """
+        if not self.cache_dir.is_dir(): return []
+        entries = []
+        for entry in self.cache_dir.iterdir():
+            if entry.name.startswith("."): continue
+            try:
+                if entry.is_dir():
+                    entries.append((entry.stat().st_mtime, sum(f.stat().st_size for f in entry.iterdir()), entry))
+            except OSError:
+                pass   # evicted by another thread/process in the meantime
+        return entries
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in max_bytes
+        """
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes: break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def __repr__(self):
+        return "ResultCache(hits={}, misses={})".format(self.hits, self.misses)
@@ -29,27 +29,31 @@
 # Concept inventory
 # =================
 
-# +------------------------------------+--------------------------+
-# |              Concept               |      Implementation      |
-# +------------------------------------+--------------------------+
-# | GUI-Window                         | matplotlib figure        |
-# | Graphs                             | matplotlib axes          |
-# | Plots                              | matplotlib Line2D object |
-# | Previous plots                     | matplotlib Line2D object |
-# | All plots in an axis               | list                     |
-# | Previous phi-alpha* distribution   | matplotlib Line2D object |
-# | Current phi-alpha* distribution    | matplotlib Line2D object |
-# | Prescribed phi-alpha* distribution | matplotlib Line2D object |
-# | Modifiable phi-alpha* distribution | matplotlib Line2D object |
-# +------------------------------------+--------------------------+
+# +------------------------------------+------------------------------------------------+
+# |              Concept               |                 Implementation                 |
+# +------------------------------------+------------------------------------------------+
+# | GUI-Window                         | matplotlib figure                              |
+# | Graphs                             | matplotlib axes                                |
+# | Plots                              | matplotlib Line2D object                       |
+# | Velocity plots of a run            | matplotlib LineCollection (one line per alpha) |
+# | Phi markers of a run               | matplotlib PathCollection (one per surface)    |
+# | Previous plots                     | same objects, greyed out                       |
+# | All plots of a run in an axis      | tuple in axes.run_plots                        |
+# | Previous phi-alpha* distribution   | matplotlib Line2D object                       |
+# | Current phi-alpha* distribution    | matplotlib Line2D object                       |
+# | Prescribed phi-alpha* distribution | matplotlib Line2D object                       |
+# | Modifiable phi-alpha* distribution | matplotlib Line2D object                       |
+# +------------------------------------+------------------------------------------------+
 
 # Initial development started with the spline_editor module which allows users to prescribe phi-alpha* distribution using mouse clicks
 # and cursor edits. The main functionalities related to interactive graph were implemented through this module and 
 # profoil_ui module with extends the above as the main class Profoil_UI(...).
 
-# For velocity and x,y graphs, axes.plot(...) function is used to plot lines, just as in any other matplotlib based program. 
-# axes.lines which holds a list of all plots are represented in the below manner for ease of changing their appearance 
-# when new plots being added in.
+# For the x,y graph, axes.plot(...) function is used to plot lines, just as in any other matplotlib based program. 
+# The velocity graph puts the distributions of all alphas of a run in one LineCollection, so that the number of artists
+# (and the time to draw them) does not grow with the number of alphas. On both graphs the artists of each run are kept
+# together in axes.run_plots as (plot, upper markers, lower markers), represented in the below manner for ease of
+# changing their appearance when new plots being added in.
 
 # +-------------------+----------------+-----------+
 # | untouchable plots | previous plots | new plots |
@@ -67,9 +71,17 @@
 # These line will always be there with the same ids which was created at the startup. 
 # Only the data which these lines represent, is altered in subsequent plotting actions. 
 
+# Drawing the figure is left to a RenderScheduler: the plotting functions only mark the figure as dirty,
+# and the figure is drawn once per event loop turn through canvas.draw_idle(). Compound actions (Run, Revert, Undo,
+# surface switching ...) run inside batch_render(...) so that they render exactly once, whatever they call.
+# The scheduler counts the full draws of each action (shown in the status bar with SHOW_RENDER_COUNTS),
+# a count above 1 is a regression.
+
 # More in-depth implementation details follows in each functions doc-strings. 
 
 import numpy as np
+from collections import deque
+from contextlib import contextmanager
 from pathlib import Path
 
 from preferences import *
@@ -80,9 +92,84 @@ import matplotlib
 matplotlib.use('Qt5Agg', force=True)
 import matplotlib.pyplot as plt
 from matplotlib.figure import Figure
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba_array
 
 from PyQt5 import QtCore
 
+class RenderScheduler:
+    """
+    Coalesces the draws of a figure.
+    mark_dirty() records that the figure changed and asks for a draw with canvas.draw_idle(), which the
+    event loop performs once however many times it was asked. Inside batch(...) nothing is requested
+    until the outermost block ends, so a compound action renders once.
+    Every full draw is counted against the action being rendered: actions holds the last (name, draws)
+    and on_action, when set, is called with them as each action finishes (SHOW_RENDER_COUNTS).
+    """
+    def __init__(self, figure, keep=100):
+        self.figure     = figure
+        self.dirty      = False              # figure changed since the last full draw
+        self.depth      = 0                  # nesting of batch(...) blocks
+        self.action     = None               # [name, full draws] of the action being rendered
+        self.actions    = deque(maxlen=keep) # rendered actions, oldest first
+        self.full_draws = 0                  # all full draws, including resize/zoom/pan
+        self.on_action  = None               # callback(name, full draws) of every finished action
+        figure.canvas.mpl_connect('draw_event', self.on_draw)
+
+    def mark_dirty(self):
+        """
+        Records that artists of the figure changed and schedules a draw
+        """
+        self.dirty = True
+        if not self.depth:
+            self.figure.canvas.draw_idle()
+
+    @contextmanager
+    def batch(self, action=None):
+        """
+        Defers the draws requested inside the block to its end. Nested blocks join the outermost one,
+        whose action name the full draws are counted against.
+        """
+        if not self.depth and action is not None:
+            self.start_action(action)
+        self.depth += 1
+        try:
+            yield self
+        finally:
+            self.depth -= 1
+            if not self.depth:
+                if self.dirty:
+                    self.figure.canvas.draw_idle()
+                else:
+                    self.finish_action()
+
+    def start_action(self, name):
+        self.finish_action()
+        self.action = [name, 0]
+
+    def finish_action(self):
+        if self.action is not None:
+            self.actions.append(tuple(self.action))
+            self.action = None
+            if self.on_action: self.on_action(*self.actions[-1])
+
+    def on_draw(self, event=None):
+        """
+        Called at the end of every full draw. The action is done once drawn outside of its batch block.
+        """
+        self.dirty = False
+        self.full_draws += 1
+        if self.action is not None:
+            self.action[1] += 1
+            if not self.depth:
+                self.finish_action()
+
+    def report(self):
+        """
+        Full draws of the recent actions, one per line
+        """
+        return "\n".join("{:20s} {:3d} full draw(s)".format(name, draws) for name, draws in self.actions)
+
 class ProfoilCanvas:
 
     def __init__(self):
@@ -92,7 +179,6 @@ class ProfoilCanvas:
         self.SHOW_PREV_LINES          = True  # Show previous plots on the Velocity and x,y plots.
         
         self.active_surface = "Upper"
-        self.n_held_history_lines = 0
 
         self.upper_xlim =AN_PLOT_XLIMITS_UPPER
         self.upper_ylim =AN_PLOT_YLIMITS
@@ -101,6 +187,10 @@ class ProfoilCanvas:
 
         # Creating the matplotlib figure containing all 3 plots.
         self.gen_gui_fig()
+        self.render_scheduler = RenderScheduler(self.gui_fig)
+
+        # Small figure following the Newton iteration residuals while PROFOIL is running.
+        self.gen_residual_fig()
         
         # Upper Surface Lines in the phi-alpha* distribution plot
         # during the program execution these lines will not be re-plotted.
@@ -121,6 +211,12 @@ class ProfoilCanvas:
         # cursor edit line
         self.cursor_edit_line, = self.an_ax.plot([], [], AN_SPLN_LINE_LINESTYLE, picker=True, color=AN_SPLN_LINE_COLOR, linewidth=AN_PLOT_LINEWIDTH)
 
+        # The cursor edit line is an animated artist: full draws leave it out and each click only blits it
+        # over a cached background of an_ax. The background is taken again after every full draw (resize, zoom, new plots).
+        self.an_ax_background = None
+        self.gui_fig.canvas.mpl_connect('draw_event', self.on_draw)
+        self.set_cursor_edit_blit(CURSOR_EDIT_BLIT)
+
         # DAT Overlay line. Matplotlib versions >3.5 has ArtistList class in-place of generic list
         # which does not support alterations matplotlib previously supported. so a Line2D object is added to the xy_ax
         # axis which will be updated when a DAT file is loaded. Initially this line is set to be not visible.
@@ -165,6 +261,28 @@ class ProfoilCanvas:
 
         self.setup_axes()
 
+    def gen_residual_fig(self):
+        """
+        Residual plot is kept in its own figure so that live updates during a run
+        only redraw this small figure, not the 3 main axes.
+        """
+        self.res_fig = Figure(figsize=(2, 1.6))
+        self.res_ax = self.res_fig.add_subplot(1, 1, 1)
+        self.res_ax.set_yscale('log')
+        self.res_ax.set_title(r'$Residual$', fontsize='small')
+        self.res_ax.tick_params(labelsize='x-small')
+        self.res_line, = self.res_ax.plot([], [], RES_PLOT_LINESTYLE, color=RES_PLOT_COLOR, lw=1, markersize=3)
+        self.res_fig.subplots_adjust(left=0.25, right=0.95, top=0.85, bottom=0.2)
+
+    def plot_residuals(self, iterations, residuals):
+        """
+        Updates the residual plot with the iterations parsed so far.
+        """
+        self.res_line.set_data(iterations, residuals)
+        self.res_ax.relim()
+        self.res_ax.autoscale_view()
+        self.res_fig.canvas.draw_idle()
+
     def setup_axes(self):
         """
         initializes the axes
@@ -173,6 +291,12 @@ class ProfoilCanvas:
         self.xy_ax.n_untouch = 1 # DAT overlay line has to be untouchable to not to get overwritten in each run.
         self.an_ax.n_untouch = 1 # cursor edit spline has to be untouchable
 
+        # artists of the runs plotted so far, (plot, upper markers, lower markers) per run
+        for ax in [self.ue_ax, self.xy_ax]:
+            ax.run_plots = []
+            ax.preserved_plots = []
+            ax.preserved_markers = []
+
         self.ue_ax.set_title(r'$Velocity\ Distribution$')
         self.ue_ax.set_ylabel(r'$V/V_{\infty}$')
 
@@ -265,7 +389,47 @@ class ProfoilCanvas:
         self.cancel_cursor_inputs()
         self.nu_alfa = line
         self.nu_alfa_points = self.nu_alfa.get_xydata().tolist()
-        self.gui_fig.canvas.draw()
+        self.request_render()
+
+    def set_cursor_edit_blit(self, enabled):
+        """
+        Switches between blitting the cursor edit line on each click and drawing the whole figure
+        """
+        self.cursor_edit_line.set_animated(enabled)
+        self.an_ax_background = None
+
+    def on_draw(self, event=None):
+        """
+        Called at the end of every full draw of gui_fig: caches the background of an_ax
+        and draws the animated cursor edit line back on top of it.
+        Only on-screen draws count; savefig draws (on a temporary canvas or this one) are left alone.
+        """
+        if not self.cursor_edit_line.get_animated(): return
+        canvas = self.gui_fig.canvas
+        if event is not None and event.canvas is not canvas: return
+        if canvas.is_saving(): return
+        if not canvas.supports_blit:
+            # nothing to blit onto, the line becomes a plain artist drawn with the whole figure on each click
+            self.set_cursor_edit_blit(False)
+            self.request_render()
+            return
+        self.an_ax_background = canvas.copy_from_bbox(self.an_ax.bbox)
+        self.an_ax.draw_artist(self.cursor_edit_line)
+
+    def blit_cursor_edit_line(self):
+        """
+        Redraws the cursor edit line alone over the cached background of an_ax.
+        Falls back to a full draw (which caches the background) when there is none yet or it is outdated.
+        """
+        canvas = self.gui_fig.canvas
+        # a pending draw brings the line back anyway and may change the background; joining it
+        # (instead of canvas.draw(), which leaves it pending) keeps the click at one full draw
+        if self.an_ax_background is None or self.render_scheduler.dirty:
+            self.request_render()
+            return
+        canvas.restore_region(self.an_ax_background)
+        self.an_ax.draw_artist(self.cursor_edit_line)
+        canvas.blit(self.an_ax.bbox)
 
     def on_click(self, event=None):
         """
@@ -281,7 +445,7 @@ class ProfoilCanvas:
             self.cursor_edit_line_points.sort()
             self.cursor_edit_line.set_data(*list(zip(*self.cursor_edit_line_points)))
 
-            self.gui_fig.canvas.draw()
+            self.blit_cursor_edit_line()
             # Ensure cursor remains a crosshair during the edit process
             self.canvas.setCursor(QtCore.Qt.CrossCursor)
 
@@ -291,7 +455,19 @@ class ProfoilCanvas:
             # Reset to default cursor after applying edits
             self.setCursor(QtCore.Qt.ArrowCursor)
 
-            self.gui_fig.canvas.draw()
+            self.request_render()
+
+    def request_render(self):
+        """
+        Marks the figure to be drawn again on the next event loop turn
+        """
+        self.render_scheduler.mark_dirty()
+
+    def batch_render(self, action=None):
+        """
+        Context manager rendering the figure once at the end of a compound action
+        """
+        return self.render_scheduler.batch(action)
 
     def bkp_an_ax_zoomed_limits(self, event):
         """
@@ -356,7 +532,7 @@ class ProfoilCanvas:
             # in the interactive plot.
 
             self.load_line(self.lower_nu_alfa_modi)
-        self.gui_fig.canvas.draw()
+        self.request_render()
 
     def checkbox_toggle(self, label):
         self.reset_toolbar()
@@ -372,7 +548,7 @@ class ProfoilCanvas:
         """
         grid_on = bool(event)
         self.xy_ax.grid(grid_on)
-        self.gui_fig.canvas.draw()
+        self.request_render()
         
     def toggle_previous_plots(self, event=None):
         """
@@ -393,7 +569,7 @@ class ProfoilCanvas:
         self.upper_nu_alfa_previous.set_visible(self.SHOW_PREV_LINES)
         self.lower_nu_alfa_previous.set_visible(self.SHOW_PREV_LINES)
 
-        self.gui_fig.canvas.draw()
+        self.request_render()
 
     def toggle_grid_lines(self, event=None):
         """
@@ -402,50 +578,43 @@ class ProfoilCanvas:
         """
         self.GRID_ON = bool(event)
         self.an_ax.grid(self.GRID_ON)
-        self.gui_fig.canvas.draw()
+        self.request_render()
 
-    def proc_make_ax_old(self, ax, preserve_lines=1):
+    def proc_make_ax_old(self, ax, preserve_runs=1):
         """
         This function accepts an axes object and applies the settings for previous plot.
-        1. Keep only last few lines on the axes given by preserve_lines and purges away the rest
+        The artists of each plotted run are kept together in ax.run_plots as (plot, upper markers, lower markers)
+        1. Keep only last few runs on the axes given by preserve_runs and purges away the rest
         2. Greys/blacks out the lines/markers
         3. Make the lines dashed
         4. Removes the legend
         5. Sets visibility
-        6. Makes a list of preserved lines and collections to set the visibility later on through "History" check-box
+        6. Makes a list of preserved plots and markers to set the visibility later on through "History" check-box
         """
-        plots = ax.lines
+        for plot in ax.lines[:ax.n_untouch]:
+            plot.set_label('_nolegend_')
+
+        # remove old plots except the ones from the last runs
+        n_purged = max(len(ax.run_plots) - preserve_runs, 0)
+        for artists in ax.run_plots[:n_purged]:
+            for artist in artists:
+                artist.remove()
+        ax.run_plots = ax.run_plots[n_purged:]
 
         ax.preserved_plots   = []  # list of references for preserved plots will be stored for clearing history
         ax.preserved_markers = []  # list of references for preserved plots will be stored for clearing history
 
-        untouch_plots  = plots[:ax.n_untouch]
-        preserved_plots = plots[ax.n_untouch:][-preserve_lines:]
-        
-        for plot in untouch_plots:
-            plot.set_label('_nolegend_')
-
-        for plot in preserved_plots:
+        # Line2D and LineCollection take the same styling calls
+        for plot, *markers in ax.run_plots:
             plot.set_color(UE_PLOT_OLD_LINE_COLOR)
             plot.set_linestyle(UE_PLOT_OLD_LINE_STYLE)
             plot.set_label('_nolegend_')
             plot.set_visible(self.SHOW_PREV_LINES)
-
-        markers = ax.collections[-2* preserve_lines:]
-        for marker in markers:
-            marker.set_color(UE_PLOT_OLD_MARKER_COLOR)
-            marker.set_visible(self.SHOW_PREV_LINES)
-
-        ax.preserved_plots = preserved_plots.copy() # list of references for clearing history
-        ax.preserved_markers = markers.copy()       # list of references for clearing history
-
-        # remove old plots except the untouchable and the ones from last run
-        for line in ax.lines[ax.n_untouch:-preserve_lines]: 
-            line.remove()
-
-        # remove markers except the markers of last run
-        for marker in ax.collections[:-2* preserve_lines]:
-            marker.remove()
+            for marker in markers:
+                marker.set_color(UE_PLOT_OLD_MARKER_COLOR)
+                marker.set_visible(self.SHOW_PREV_LINES)
+            ax.preserved_plots.append(plot)
+            ax.preserved_markers.extend(markers)
 
         ax.set_prop_cycle(None)
 
@@ -453,44 +622,65 @@ class ProfoilCanvas:
         """ 
         Plots airfoil contour
         """
-        n_xy_preserve = n_prev_plots
-
         # make the previous plots "old" [greyed out and dashed etc]
-        self.proc_make_ax_old(self.xy_ax, n_xy_preserve)
+        self.proc_make_ax_old(self.xy_ax, n_prev_plots)
 
         # plots the airfoil contour
         # color of the original plot is extracted back to make the upper and lower markers.
 
-        p = self.xy_ax.plot(self.x, self.y, lw=XY_PLOT_LINEWIDTH, color=XY_PLOT_COLOR, clip_on=False)
-        self.xy_ax.scatter(self.xy_marker_upper['x'], self.xy_marker_upper['y'], color=p[-1].get_color(), marker=UPPER_SURFACE_PHI_MARKER, s=UPPER_SURFACE_PHI_MARKER_SIZE, clip_on=False)
-        self.xy_ax.scatter(self.xy_marker_lower['x'], self.xy_marker_lower['y'], color=p[-1].get_color(), marker=LOWER_SURFACE_PHI_MARKER, s=LOWER_SURFACE_PHI_MARKER_SIZE, clip_on=False)
+        run = self.run_result
+        p, = self.xy_ax.plot(run.x, run.y, lw=XY_PLOT_LINEWIDTH, color=XY_PLOT_COLOR, clip_on=False)
+        upper = self.xy_ax.scatter(run.xy_marker_upper['x'], run.xy_marker_upper['y'], color=p.get_color(), marker=UPPER_SURFACE_PHI_MARKER, s=UPPER_SURFACE_PHI_MARKER_SIZE, clip_on=False)
+        lower = self.xy_ax.scatter(run.xy_marker_lower['x'], run.xy_marker_lower['y'], color=p.get_color(), marker=LOWER_SURFACE_PHI_MARKER, s=LOWER_SURFACE_PHI_MARKER_SIZE, clip_on=False)
+        self.xy_ax.run_plots.append((p, upper, lower))
 
-        self.gui_fig.canvas.draw()
+        self.request_render()
 
+    def ue_colors(self, n_alphas):
+        """
+        RGBA colors of the velocity distributions: UE_PLOT_COLOR, or the color cycle of the axes
+        (restarted on every run) when it is None, the colors ax.plot(...) would give one line per alpha.
+        """
+        if UE_PLOT_COLOR is not None:
+            return to_rgba_array([UE_PLOT_COLOR]*n_alphas)
+        cycle = plt.rcParams['axes.prop_cycle'].by_key()['color']
+        return to_rgba_array([cycle[i % len(cycle)] for i in range(n_alphas)])
 
     def plot_ue(self, n_prev_plots =1):
         """ 
-        Plots velocity distribution data
+        Plots velocity distribution data.
+        The distributions of all alphas are a single LineCollection and the phi markers one scatter
+        collection per surface, so that a run adds 3 artists to the axes whatever the number of alphas.
         """
-        n_ue_preserve = self.n_held_history_lines * n_prev_plots # alphas give the number of lines
-
         # make the previous plots "old" [greyed out and dashed etc]
-        self.proc_make_ax_old(self.ue_ax, n_ue_preserve)
+        self.proc_make_ax_old(self.ue_ax, n_prev_plots)
     
         # plots the velocity distribution
-        # color of the original plot is extracted back to make the upper and lower markers.
-        for alpha in sorted(self.ue_lines.keys(), key=float):
-            p = self.ue_ax.plot(self.ue_lines[alpha]['x'], self.ue_lines[alpha]['v_vinf'], label = "{:5.2f}".format(alpha), lw=UE_PLOT_LINEWIDTH, color=UE_PLOT_COLOR, clip_on=False)
-            self.ue_ax.scatter(self.upper_vel_markers[alpha]['x'], self.upper_vel_markers[alpha]['v_vinf'], color=p[-1].get_color(), marker=UPPER_SURFACE_PHI_MARKER, s=UPPER_SURFACE_PHI_MARKER_SIZE, clip_on=False)
-            self.ue_ax.scatter(self.lower_vel_markers[alpha]['x'], self.lower_vel_markers[alpha]['v_vinf'], color=p[-1].get_color(), marker=LOWER_SURFACE_PHI_MARKER, s=LOWER_SURFACE_PHI_MARKER_SIZE, clip_on=False)
-
-        self.n_held_history_lines = len(self.ue_lines.keys())
+        # each alpha has its own color, its markers take the color of its line.
+        run = self.run_result
+        alphas = sorted(run.ue_lines.keys(), key=float)
+        colors = self.ue_colors(len(alphas))
+
+        def marker_data(vel_markers):
+            x = np.concatenate([vel_markers[alpha]['x'] for alpha in alphas])
+            v = np.concatenate([vel_markers[alpha]['v_vinf'] for alpha in alphas])
+            c = np.repeat(colors, [len(vel_markers[alpha]['x']) for alpha in alphas], axis=0)
+            return x, v, c
+
+        lines = LineCollection([np.column_stack((run.ue_lines[alpha]['x'], run.ue_lines[alpha]['v_vinf'])) for alpha in alphas],
+                               colors=colors, linewidths=UE_PLOT_LINEWIDTH, clip_on=False)
+        self.ue_ax.add_collection(lines)
+        x, v, c = marker_data(run.upper_vel_markers)
+        upper = self.ue_ax.scatter(x, v, color=c, marker=UPPER_SURFACE_PHI_MARKER, s=UPPER_SURFACE_PHI_MARKER_SIZE, clip_on=False)
+        x, v, c = marker_data(run.lower_vel_markers)
+        lower = self.ue_ax.scatter(x, v, color=c, marker=LOWER_SURFACE_PHI_MARKER, s=LOWER_SURFACE_PHI_MARKER_SIZE, clip_on=False)
+        self.ue_ax.run_plots.append((lines, upper, lower))
 
         # legend is not used in the current implementation because Alphas are just dummy variables.
         # can modify easily in the future if Alphas to be read from the .in file.
         # self.ue_ax.legend(fontsize ='small', frameon = False, loc="upper right")
 
-        self.gui_fig.canvas.draw()
+        self.request_render()
 
     def bkp_previous_line(self):
         """
@@ -511,6 +701,7 @@ class ProfoilCanvas:
             line.remove()
         for c in ax.collections: 
             c.remove()
+        ax.run_plots = []
 
     def plot_nu_alfa(self):
         """
@@ -519,13 +710,15 @@ class ProfoilCanvas:
         The state of these 8 lines will be maintained with the same ID by changing 
         the data these lines hold. This method vastly eases off the surface switching.
         """
-        self.upper_nu_alfa_prescribed.set_data(self.nu_upper, self.alfa_upper)
-        self.upper_nu_alfa_modi.set_data(self.nu_upper, self.alfa_upper)
-        self.upper_nu_alfa_converged.set_data(self.nu_conv_upper, self.alfa_conv_upper)
+        run = self.run_result
+        self.upper_nu_alfa_prescribed.set_data(run.nu_upper, run.alfa_upper)
+        self.upper_nu_alfa_modi.set_data(run.nu_upper, run.alfa_upper)
+        self.upper_nu_alfa_converged.set_data(run.nu_conv_upper, run.alfa_conv_upper)
 
-        self.lower_nu_alfa_prescribed.set_data(self.nu_lower, self.alfa_lower)
-        self.lower_nu_alfa_modi.set_data(self.nu_lower, self.alfa_lower)
-        self.lower_nu_alfa_converged.set_data(self.nu_conv_lower, self.alfa_conv_lower)
+        self.lower_nu_alfa_prescribed.set_data(run.nu_lower, run.alfa_lower)
+        self.lower_nu_alfa_modi.set_data(run.nu_lower, run.alfa_lower)
+        self.lower_nu_alfa_converged.set_data(run.nu_conv_lower, run.alfa_conv_lower)
+        self.request_render()
 
     def overlay_dat(self, filename, skiprows):
         """
@@ -540,7 +733,7 @@ class ProfoilCanvas:
 
         self.overlay_line.set_data(x,y)
         self.overlay_line.set_visible(True)
-        self.gui_fig.canvas.draw()
+        self.request_render()
 
     def clear_overlay(self):
         """ 
@@ -550,4 +743,4 @@ class ProfoilCanvas:
         """
         self.overlay_line.set_data([],[])
         self.overlay_line.set_visible(False)
-        self.gui_fig.canvas.draw()
+        self.request_render()
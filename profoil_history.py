@@ -0,0 +1,238 @@
+# Copyright (c) 2022 Kanishka Jayawardane [kanishkagj@yahoo.com]
+# Copyright (c) 2022 Michael Selig
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Design history database.
+# Every PROFOIL run of the UI is recorded in a local SQLite database (HISTORY_DB) so that earlier designs,
+# of this session or of last week, can be browsed, compared and re-plotted without running PROFOIL again.
+# This module does not import PyQt5, the browser dialog lives in history_browser.py.
+
+# +--------+---------------------------------------------------------------------------------+
+# | Table  | Columns                                                                         |
+# +--------+---------------------------------------------------------------------------------+
+# | runs   | id, created (unix time), airfoil_name, status, converged, elapsed,              |
+# |        | input_sha (sha256 of profoil.in), input (zlib), log (zlib)                      |
+# | stats  | run_id, name, value, line : STATISTICS block, one row per number               |
+# | arrays | run_id, data : RunResult raw arrays as a compressed npz, converged runs only    |
+# +--------+---------------------------------------------------------------------------------+
+
+# Indexes: runs(created), runs(airfoil_name, created), runs(input_sha), stats(name, value).
+# Pages are read with keyset pagination on the run id (WHERE id < last id of the previous page),
+# so that paging stays fast whatever the number of runs, and the large columns (input, log, arrays)
+# are only read for the run that is opened.
+
+import hashlib
+import io
+import sqlite3
+import time
+import zlib
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+from preferences import HISTORY_DB, HISTORY_PAGE_SIZE
+from profoil_interface import RunResult, LogModel
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id           INTEGER PRIMARY KEY,
+    created      REAL    NOT NULL,
+    airfoil_name TEXT,
+    status       TEXT,
+    converged    INTEGER NOT NULL,
+    elapsed      REAL,
+    input_sha    TEXT    NOT NULL,
+    input        BLOB    NOT NULL,
+    log          BLOB
+);
+CREATE TABLE IF NOT EXISTS stats (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    name   TEXT    NOT NULL,
+    value  REAL    NOT NULL,
+    line   INTEGER NOT NULL,
+    PRIMARY KEY (run_id, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS arrays (
+    run_id INTEGER PRIMARY KEY REFERENCES runs(id) ON DELETE CASCADE,
+    data   BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_created      ON runs(created);
+CREATE INDEX IF NOT EXISTS runs_airfoil_name ON runs(airfoil_name, created);
+CREATE INDEX IF NOT EXISTS runs_input_sha    ON runs(input_sha);
+CREATE INDEX IF NOT EXISTS stats_name_value  ON stats(name, value);
+"""
+
+# raw arrays of a RunResult stored in the arrays table, ile and phis are stored along as arrays
+RESULT_ARRAYS = ["x", "y", "phi", "v_vinf", "nu_spec", "alfa_spec", "nu_conv", "alfa_conv", "ile", "phis"]
+
+# one row of a history page, stats holds the STATISTICS numbers of the run
+RunRow = namedtuple("RunRow", ["id", "created", "airfoil_name", "status", "converged", "elapsed", "stats"])
+
+def input_sha(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def pack_text(text):
+    return zlib.compress(text.encode(), 6)
+
+def unpack_text(blob):
+    return zlib.decompress(blob).decode() if blob is not None else ""
+
+def pack_result(run_result):
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **{name: np.asarray(getattr(run_result, name)) for name in RESULT_ARRAYS})
+    return buffer.getvalue()
+
+def unpack_result(blob):
+    with np.load(io.BytesIO(blob)) as data:
+        arrays = {name: data[name] for name in RESULT_ARRAYS}
+    arrays["ile"] = int(arrays["ile"])
+    arrays["phis"] = arrays["phis"].tolist()
+    return RunResult(**arrays)
+
+class HistoryDB:
+    """
+    with HistoryDB() as history:
+        run_id = history.record(in_text, ctx.log, "finished", elapsed, run_result)
+        page   = history.page()                        # newest HISTORY_PAGE_SIZE runs
+        page   = history.page(before=page[-1].id)      # the next page
+        run_result = history.load_result(run_id)
+    """
+
+    def __init__(self, filename=HISTORY_DB):
+        self.filename = Path(filename).resolve() if str(filename) != ":memory:" else filename
+        if self.filename != ":memory:":
+            self.filename.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.filename))
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        if self.filename != ":memory:":
+            # batch runs and several UI instances may write at the same time
+            self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def __repr__(self):
+        return "HistoryDB({}, runs={})".format(self.filename, len(self))
+
+    def close(self):
+        self.connection.close()
+
+    def record(self, in_text, log, status, elapsed=None, run_result=None, created=None):
+        """
+        Stores one run and returns its id.
+        log        : LogModel of the run (LogModel("") when there is no log)
+        run_result : RunResult of a converged run, None otherwise
+        """
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (created, airfoil_name, status, converged, elapsed, input_sha, input, log) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (created or time.time(), log.airfoil_name, status, int(log.converged and status == "finished"),
+                 elapsed, input_sha(in_text), pack_text(in_text), pack_text(log.text)))
+            run_id = cursor.lastrowid
+            self.connection.executemany("INSERT INTO stats (run_id, name, value, line) VALUES (?, ?, ?, ?)",
+                                        [(run_id, name, value, line) for line, (name, value) in enumerate(log.stats.items())])
+            if run_result is not None:
+                self.connection.execute("INSERT INTO arrays (run_id, data) VALUES (?, ?)",
+                                        (run_id, pack_result(run_result)))
+        return run_id
+
+    def has_input(self, in_text, status=None):
+        """
+        Whether a run of in_text is already stored, with the given status if any
+        """
+        sql, args = "SELECT 1 FROM runs WHERE input_sha = ?", [input_sha(in_text)]
+        if status is not None:
+            sql += " AND status = ?"; args.append(status)
+        return self.connection.execute(sql + " LIMIT 1", args).fetchone() is not None
+
+    def page(self, before=None, limit=HISTORY_PAGE_SIZE, airfoil_name=None, converged=None):
+        """
+        Newest runs first, limit runs with an id smaller than before (None for the first page).
+        airfoil_name filters with a LIKE pattern (ex: "%SD7037%"), converged on the flag.
+        """
+        where, args = [], []
+        if before is not None:
+            where.append("id < ?"); args.append(before)
+        if airfoil_name:
+            where.append("airfoil_name LIKE ?"); args.append(airfoil_name)
+        if converged is not None:
+            where.append("converged = ?"); args.append(int(converged))
+        sql = ("SELECT id, created, airfoil_name, status, converged, elapsed FROM runs" +
+               (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY id DESC LIMIT ?")
+        rows = self.connection.execute(sql, args + [limit]).fetchall()
+
+        stats = {row[0]: {} for row in rows}
+        if rows:
+            marks = ",".join("?" * len(rows))
+            for run_id, name, value in self.connection.execute(
+                    "SELECT run_id, name, value FROM stats WHERE run_id IN ({}) ORDER BY run_id, line".format(marks), list(stats)):
+                stats[run_id][name] = value
+        return [RunRow(*row[:4], bool(row[4]), row[5], stats[row[0]]) for row in rows]
+
+    def get(self, run_id):
+        """
+        RunRow of a single run, None if there is no such run
+        """
+        rows = self.page(before=run_id + 1, limit=1)
+        return rows[0] if rows and rows[0].id == run_id else None
+
+    def query_stat(self, name, low=None, high=None, limit=HISTORY_PAGE_SIZE):
+        """
+        [(run_id, value), ...] of the runs whose STATISTICS value of name is within [low, high], by value
+        """
+        where, args = ["name = ?"], [name]
+        if low is not None:
+            where.append("value >= ?"); args.append(low)
+        if high is not None:
+            where.append("value <= ?"); args.append(high)
+        return self.connection.execute(
+            "SELECT run_id, value FROM stats WHERE {} ORDER BY value LIMIT ?".format(" AND ".join(where)),
+            args + [limit]).fetchall()
+
+    def stat_names(self):
+        return [row[0] for row in self.connection.execute("SELECT DISTINCT name FROM stats")]
+
+    def load_input(self, run_id):
+        row = self.connection.execute("SELECT input FROM runs WHERE id = ?", (run_id,)).fetchone()
+        return unpack_text(row[0]) if row else None
+
+    def load_log(self, run_id):
+        row = self.connection.execute("SELECT log FROM runs WHERE id = ?", (run_id,)).fetchone()
+        return LogModel(unpack_text(row[0])) if row else None
+
+    def load_result(self, run_id):
+        """
+        RunResult of a converged run, None when the run has no arrays
+        """
+        row = self.connection.execute("SELECT data FROM arrays WHERE run_id = ?", (run_id,)).fetchone()
+        return unpack_result(row[0]) if row else None
+
+    def delete(self, run_id):
+        with self.connection:
+            self.connection.execute("DELETE FROM runs WHERE id = ?", (run_id,))
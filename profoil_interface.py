@@ -40,15 +40,29 @@
 # |             | v/v_inf       | numpy_array    |
 # +-------------+---------------+----------------+
 
-# As for the input, the main functionality is encapsulated into gen_input_template(...), and gen_input_file(...) functions. 
-# The first one creates a substitutable string by de-voiding FOIL and ILE lines mainly.
+# As for the input, profoil.in is parsed into an InputDocument (lines + positions of the keyword records and the FOIL block),
+# gen_input_file(...) rewrites the FOIL block and the ILE/VELDIST records of it and leaves every other line untouched.
 # Please note – All the FOIL lines are supposed to be placed in one place without empty lines.
 
+# Every function here takes the file (or the directory) it works on as an argument defaulting to the WORKDIR.
+# RunContext bundles all the file names of one run so that several runs can live side by side,
+# each in its own directory, without overwriting each other's files.
+
+# +---------------------+---------------------------------------------+
+# | RunContext()        | owns a fresh temporary directory            |
+# |                     | which is deleted on cleanup()               |
+# +---------------------+---------------------------------------------+
+# | RunContext(WORKDIR) | uses the given directory, nothing's deleted |
+# +---------------------+---------------------------------------------+
+
+import hashlib
 import re
+import threading
 import numpy as np
-from io import StringIO
 from scipy.interpolate import interp1d
 import os
+import subprocess
+import tempfile
 
 
 from preferences import *
@@ -56,6 +70,8 @@ from preferences import *
 from pathlib import Path
 import shutil
 
+from profoil_sidecar import SIDECAR_NAME, is_sidecar_file, read_sidecar, write_sidecar
+
 WORKDIR = Path(WORK_DIR).resolve()   # using absolute paths
 BINDIR  = Path(BIN_DIR).resolve()    # using absolute paths
 EXEC_ABS_PATH = str(BINDIR/"{}".format("profoil.exe" if os.name == "nt" else "./profoil"))
@@ -77,11 +93,112 @@ def extract_alphas(filename=WORKDIR/"profoil.in"):
     assert len(alphas) == n
     return alphas
 
+def set_alphas(text, alphas):
+    """
+    Replaces the ALFASP block (ALFASP n followed by n lines of alphas)
+    of the given profoil.in text with the given list of alphas.
+    """
+    document = InputDocument(text)
+    document.set_alphas(alphas)
+    return document.text
+
+FIXED_WIDTH_MIN_BYTES = 1 << 16   # break even is around 2000 lines of two columns
+
+def load_columns(filename, ncols):
+    """
+    Reads a whitespace separated numeric table with ncols columns in one go.
+    The whole file is read as bytes; PROFOIL's fixed width Fortran output is decoded with
+    vectorized column arithmetic (parse_fixed_width), anything else is converted with a single
+    np.array(...) call over all the tokens. Fortran "D" exponents are accepted.
+    Raises ValueError naming the offending line if a row does not have ncols values.
+    """
+    with open(filename, "rb") as f:
+        return parse_columns(f.read(), ncols, filename)
+
+def parse_columns(data, ncols, name="<bytes>"):
+    """
+    Bytes counterpart of load_columns, also used on the chunks of iter_vel_blocks.
+    data has to end at a line boundary; name only shows up in the error messages.
+    """
+    # per column numpy calls only pay off once there are enough lines
+    values = parse_fixed_width(data, ncols) if len(data) > FIXED_WIDTH_MIN_BYTES else None
+    if values is not None:
+        return values
+
+    if b"D" in data or b"d" in data:
+        data = data.replace(b"D", b"E").replace(b"d", b"e")
+    tokens = data.split()
+    n_rows = data.count(b"\n") + (not data.endswith(b"\n"))
+    if len(tokens) != n_rows*ncols:
+        # blank lines are fine, anything else is reported with its line number
+        for i, line in enumerate(data.splitlines(), start=1):
+            fields = line.split()
+            if fields and len(fields) != ncols:
+                raise ValueError("{}:{}: expected {} columns, found {}".format(name, i, ncols, len(fields)))
+    return np.array(tokens, dtype=float).reshape(-1, ncols)
+
+def parse_fixed_width(data, ncols):
+    """
+    Decodes a table of F format numbers (all lines of the same length, one decimal point
+    per column at the same position on every line) without converting token by token:
+    the bytes are viewed as a (lines x characters) array and each column is accumulated
+    digit by digit across all the lines at once. As long as a column has at most 15 digits,
+    the digit string and the power of 10 are exact doubles and their correctly rounded
+    quotient equals float(text); wider columns are left to the fallback.
+    Returns None when the data does not follow that layout, so that the caller can fall back.
+    """
+    line_length = data.find(b"\n") + 1
+    if line_length <= 1 or len(data) % line_length: return None
+    lines = np.frombuffer(data, np.uint8).reshape(-1, line_length)
+    first = lines[0]
+    width = line_length - 1 - (first[line_length-2] == 13)  # CRLF
+    if (lines[:, -1] != 10).any(): return None
+
+    points = np.flatnonzero(first[:width] == 46)
+    if len(points) != ncols: return None
+    chars = np.ascontiguousarray(lines[:, :width].T)   # one contiguous array per character position
+
+    n = len(lines)
+    values = np.empty((n, ncols))
+    start = 0
+    for k, point in enumerate(points):
+        if (chars[point] != 46).any(): return None
+        end = points[k+1] if k+1 < ncols else width
+        stop = point + 1
+        while stop < end and 48 <= first[stop] <= 57: stop += 1
+        if stop - start - 1 > 15: return None   # no longer exact in a double
+
+        number   = np.zeros(n)
+        negative = np.zeros(n, dtype=bool)
+        started  = np.zeros(n, dtype=bool)
+        for c in range(start, stop):
+            if c == point: continue
+            digit = chars[c] - np.uint8(48)
+            is_digit = digit < 10
+            if c < point:
+                minus = chars[c] == 45
+                if not (is_digit | minus | (chars[c] == 32)).all(): return None
+                if (started & ~is_digit).any(): return None   # sign or blank after the first digit
+                negative |= minus
+                started  |= is_digit
+            elif not is_digit.all():
+                return None
+            number *= 10
+            number += np.where(is_digit, digit, 0)
+        values[:, k] = number / 10.0**(stop - point - 1)
+        values[negative, k] *= -1
+        start = stop
+
+    if (chars[start:] != 32).any(): return None
+    return values
+
 def extract_xy(filename=WORKDIR/"profoil.xy"):
     """
     Extracts  x,y data from profoil.xy file
+    Stays on np.loadtxt: the file is short and load_columns only pays off on it
+    well beyond the usual size (benchmarks/bench_loaders.py times it at parity).
     """
-    x,y = np.loadtxt(filename).T
+    x,y = np.loadtxt(filename, ndmin=2).T
     return x,y
 
 def extract_vel(filename=WORKDIR/"profoil.vel"):
@@ -90,22 +207,48 @@ def extract_vel(filename=WORKDIR/"profoil.vel"):
     First column is expected to carry "phi" data
     generated with VELDIST 60
     """
-    phi, v_vinf= np.loadtxt(filename).T
+    phi, v_vinf= load_columns(filename, 2).T
     return phi, v_vinf
 
 def extract_dmp(filename=WORKDIR/"profoil.dmp"):
     """
     Extracts the converged nu-alpha* pairs, LE index,
     and recovery parameters from the profoil.dump file.
-    regex is used exclusively for all extractions
-    with multi-line flag.
+    Works on profoil.in as well, which carries the prescribed values.
     """
-    text = open(filename).read()
-    foil_section = re.findall(r"^FOIL.*(?:\nFOIL.*)*$", text, flags = re.M)[0]
-    nu, alfa = np.loadtxt(StringIO(foil_section), usecols=(1,2)).T
-    ile = int(re.findall(r"^ILE\s+(\d+)", text, flags=re.M)[0])
-    phis = [float(i) for i in re.findall(r"^PHIS\s+(.*)", text, flags=re.M)[0].split()]
-    return nu, alfa, ile, phis
+    with open(filename) as f:
+        return parse_dmp_text(f.read())
+
+def parse_dmp_text(text):
+    """
+    Single pass over the lines of a profoil.dmp/profoil.in text picking up
+    the FOIL block, ILE and PHIS lines at once.
+    Only the first contiguous block of FOIL lines is taken; ILE and PHIS are
+    taken from their first occurrence.
+    """
+    nu, alfa = [], []
+    ile = phis = None
+    foil_block = None   # None: not reached yet, True: inside, False: passed
+
+    for line in text.splitlines():
+        if line.startswith("FOIL"):
+            if foil_block is not False:
+                fields = line.split()
+                nu.append(float(fields[1]))
+                alfa.append(float(fields[2]))
+                foil_block = True
+            continue
+        if foil_block:
+            foil_block = False
+        if ile is None and line.startswith("ILE") and line[3:4].isspace():
+            digits = re.match(r"\d+", line[3:].lstrip())
+            if digits: ile = int(digits.group())
+        elif phis is None and line.startswith("PHIS") and line[4:5].isspace():
+            phis = [float(i) for i in line[4:].split()]
+
+    if not nu or ile is None or phis is None:
+        raise ValueError("FOIL, ILE or PHIS lines not found")
+    return np.array(nu), np.array(alfa), ile, phis
 
 def split_vel(phi, v_vinf):
     """
@@ -118,18 +261,89 @@ def split_vel(phi, v_vinf):
     on the placement of the LE stagnation point, an additional point may or
     may not be added in to the stream.
     """
-    breaks  = np.argwhere(phi==0).flatten()[1:]
+    breaks  = vel_offsets(phi)[1:-1]
     phi_list= np.split(phi, breaks)
     vel_list= np.split(v_vinf, breaks)
     return phi_list, vel_list
 
-def gen_vel_splines(phi_list, vel_list):
+VEL_CHUNK_BYTES = 1 << 20
+
+def iter_vel_blocks(filename=WORKDIR/"profoil.vel", chunk_bytes=VEL_CHUNK_BYTES):
     """
-    Takes a list of phi-v/v_inf pairs and creates a spline for each
-    phi-v/v_inf distribution. These splines will be used to locate the 
-    phi markers on the upper and lower surfaces.
+    Streaming counterpart of extract_vel + split_vel: yields (phi, v_vinf) of one AoA at a time
+    while reading the file in chunks of about chunk_bytes, so that memory stays bounded by
+    the chunk plus the longest AoA whatever the length of the file.
+    Blocks are split on phi==0 the same way as vel_offsets.
+
+    The arrays are views into a single buffer that is reused for the following blocks:
+    they are only valid until the next iteration, copy them to keep them around.
+    """
+    buf = np.empty((0, 2))
+    n_pending = 0           # rows of the current, not yet terminated, AoA at the front of buf
+    first_row = True        # the very first phi==0 starts the first AoA, it is not a break
+    tail = b""
+    with open(filename, "rb") as f:
+        while True:
+            chunk = f.read(chunk_bytes)
+            data = tail + chunk
+            if chunk:
+                cut = data.rfind(b"\n") + 1
+                data, tail = data[:cut], data[cut:]
+            else:
+                tail = b""
+            if data.strip():
+                rows = parse_columns(data, 2, filename)
+                n = n_pending + len(rows)
+                if n > len(buf):
+                    grown = np.empty((max(n, 2*len(buf)), 2))
+                    grown[:n_pending] = buf[:n_pending]
+                    buf = grown
+                buf[n_pending:n] = rows
+                breaks = n_pending + np.flatnonzero(rows[:, 0] == 0)
+                if first_row:
+                    breaks = breaks[breaks > 0]
+                    first_row = False
+                start = 0
+                for stop in breaks:
+                    yield buf[start:stop, 0], buf[start:stop, 1]
+                    start = stop
+                n_pending = n - start
+                buf[:n_pending] = buf[start:n]
+            if not chunk:
+                break
+    if n_pending:
+        yield buf[:n_pending, 0], buf[:n_pending, 1]
+
+def vel_offsets(phi):
+    """
+    Ragged layout of the continuous phi stream: AoA k spans phi[offsets[k]:offsets[k+1]]
+    """
+    return np.r_[0, np.flatnonzero(phi==0)[1:], len(phi)]
+
+def interp_blocks(x_new, x, y, offsets):
+    """
+    Linear interpolation of x_new on every block x[offsets[k]:offsets[k+1]] -> y in one vectorized pass.
+    Beyond the ends of a block the end segments are extrapolated, which gives the same numbers as
+    interp1d(x_block, y_block, fill_value='extrapolate') per block.
+    x has to increase within each block.
+
+    x_new   : (m,) query points shared by all the blocks, or (n_blocks, m)
+    returns : (n_blocks, m)
     """
-    return [interp1d(phi,v, fill_value='extrapolate') for phi,v in zip(phi_list, vel_list)]
+    x, y, offsets = np.asarray(x, dtype=float), np.asarray(y, dtype=float), np.asarray(offsets)
+    n_blocks = len(offsets) - 1
+    x_new = np.broadcast_to(np.asarray(x_new, dtype=float), (n_blocks, np.shape(x_new)[-1]))
+
+    # shifting every block into its own band turns the per-block searches into one searchsorted call
+    band  = max(x.max(), x_new.max(initial=-np.inf)) - min(x.min(), x_new.min(initial=np.inf)) + 1
+    shift = band * np.repeat(np.arange(n_blocks), np.diff(offsets))
+    block = np.arange(n_blocks)[:, None]
+    hi = np.searchsorted(x + shift, x_new + band*block)
+    hi = np.clip(hi, offsets[:-1, None] + 1, offsets[1:, None] - 1)
+    lo = hi - 1
+
+    slope = (y[hi] - y[lo]) / (x[hi] - x[lo])
+    return slope*(x_new - x[lo]) + y[lo]
 
 def gen_phi2xy_splines(x, y):
     """
@@ -141,7 +355,34 @@ def gen_phi2xy_splines(x, y):
     phis = np.linspace(0,360, len(x))
     return interp1d(phis,x, fill_value='extrapolate'), interp1d(phis,y, fill_value='extrapolate')
 
-def extract_all_data():
+# files the parsed arrays of a run come from, see profoil_sidecar.py
+SIDECAR_SOURCES = ["profoil.xy", "profoil.vel", "profoil.in", "profoil.dmp"]
+
+def extract_raw_data(workdir=WORKDIR):
+    """
+    Parsed arrays of a finished run as a dict. They are mapped from the sidecar files
+    when it is up to date with the text outputs; otherwise the text outputs are parsed
+    and the sidecar is (re)written for the next time.
+    """
+    workdir = Path(workdir)
+    sources = [workdir/name for name in SIDECAR_SOURCES]
+    cached  = read_sidecar(workdir/SIDECAR_NAME, sources)
+    if cached is not None:
+        arrays, values = cached
+        return dict(arrays, **values)
+
+    x, y = extract_xy(workdir/"profoil.xy")
+    phi, v_vinf = extract_vel(workdir/"profoil.vel")
+    nu_spec, alfa_spec, ile, phis = extract_dmp(workdir/"profoil.in")
+    nu_conv, alfa_conv, *_ = extract_dmp(workdir/"profoil.dmp")
+
+    arrays = {"x": x, "y": y, "phi": phi, "v_vinf": v_vinf,
+              "nu_spec": nu_spec, "alfa_spec": alfa_spec, "nu_conv": nu_conv, "alfa_conv": alfa_conv}
+    values = {"ile": ile, "phis": phis}
+    write_sidecar(workdir/SIDECAR_NAME, sources, arrays, values)
+    return dict(arrays, **values)
+
+def extract_all_data(workdir=WORKDIR):
     """
     This lengthy function could be somewhat problematic to understand at the first glance;
     hence the below diagram for better clarity.
@@ -162,7 +403,7 @@ def extract_all_data():
     |          |           |   |        |          |
     |          v        +--v---v------+ |          v
     |    +-----------+  |lower_markers| | +------------------+
-    |    | xy_markers|  |upper_markers| | | phi2v_spline_list|
+    |    | xy_markers|  |upper_markers| | | interp_blocks(...)|
     |    +-----------+  +-------------+ | +------------------+
     |                                   |          |
     |                                   |          v
@@ -175,84 +416,276 @@ def extract_all_data():
     is used here which appears to work without any issue given phi increases monotonically.
     Additionally, for the airfoil contour, x(phi) and y(phi) has to be constructed because
     the markers are given in phi. 
+
+    All the products of the diagram are computed lazily by RunResult on first access,
+    so consumers which only need a part of them (batch runs, one view of the GUI) only pay for that part.
     """
+    return RunResult(**extract_raw_data(workdir))
+
+# degrees around the circle / nu_max in the FOIL lines which is 60.
+NU2PHI = 6
+
+class RunResult:
+    """
+    Outputs of a converged run. Holds the raw arrays parsed from the output files
+    and derives the plotting products (see extract_all_data) on first access, caching them.
+
+    Unpacking a RunResult gives the 16 values extract_all_data used to return, in the same order.
+    """
+
+    __slots__ = ("x", "y", "phi", "v_vinf", "nu_spec", "alfa_spec", "ile", "phis",
+                 "nu_conv", "alfa_conv", "_derived")
+
+    def __init__(self, x, y, phi, v_vinf, nu_spec, alfa_spec, ile, phis, nu_conv, alfa_conv):
+        self.x, self.y           = x, y
+        self.phi, self.v_vinf    = phi, v_vinf
+        self.nu_spec, self.alfa_spec = nu_spec, alfa_spec
+        self.ile, self.phis      = ile, phis
+        self.nu_conv, self.alfa_conv = nu_conv, alfa_conv
+        self._derived = {}
+
+    def __repr__(self):
+        return "RunResult(points={}, alphas={}, foils={}, ile={})".format(
+               len(self.x), len(self.phi_list), len(self.nu_spec), self.ile)
 
-    # extract row data from output files
-    phi, vel = extract_vel()
-    nu_spec, alfa_spec, ile, (phis_upper, phis_lower) = extract_dmp(WORKDIR/"profoil.in")
-    x,y = extract_xy()
+    def __iter__(self):
+        return iter((self.x, self.y, self.xy_marker_upper, self.xy_marker_lower,
+                     self.ue_lines, self.upper_vel_markers, self.lower_vel_markers,
+                     self.nu_upper, self.alfa_upper, self.nu_lower, self.alfa_lower, self.ile,
+                     self.nu_conv_upper, self.alfa_conv_upper, self.nu_conv_lower, self.alfa_conv_lower))
 
-    # create splines
-    phi2x_spline, phi2y_spline = gen_phi2xy_splines(x,y)
-    phi_list, vel_list = split_vel(phi, vel)
-    phi2v_spline_list = gen_vel_splines(phi_list, vel_list)
+    def _lazy(self, name, compute):
+        try:
+            return self._derived[name]
+        except KeyError:
+            value = self._derived[name] = compute()
+            return value
 
-    design_alphas = range(len(phi_list))
-    # design_alphas is just a dummy alpha list.
-    # this can be replaced with extract_alphas() if needed
-    # but this will place a constraint on having alphas listed in the .in file.
-    # since listing alphas in the plot is not mandatory, a simple range would work here
+    # ---------------------------------------- splines ----------------------------------------
 
-    # creates x-v/v_inf distribution from phi-v/v_inf distribution using phi2x_spline.
-    ue_lines =  {alfa:{"x": phi2x_spline(phi), "v_vinf": spl(phi)} 
-                 for alfa, phi, spl 
-                 in zip(design_alphas, phi_list, phi2v_spline_list)}
+    @property
+    def phi2xy_splines(self):
+        return self._lazy("phi2xy_splines", lambda: gen_phi2xy_splines(self.x, self.y))
 
-    # creates a list of phi values corresponding to FOIL lines.
-    # This is done by transforming the FOIL line phi by a constant factor NU2PHI
+    @property
+    def phi_vel_lists(self):
+        return self._lazy("phi_vel_lists", lambda: split_vel(self.phi, self.v_vinf))
+
+    @property
+    def phi_list(self):
+        return self.phi_vel_lists[0]
+
+    @property
+    def vel_list(self):
+        return self.phi_vel_lists[1]
+
+    @property
+    def vel_offsets(self):
+        return self._lazy("vel_offsets", lambda: vel_offsets(self.phi))
+
+    def vel_at(self, markers_phi):
+        """
+        v/v_inf of every design alpha at the given phi values, shape (n_alphas, len(markers_phi))
+        """
+        return interp_blocks(markers_phi, self.phi, self.v_vinf, self.vel_offsets)
+
+    @property
+    def design_alphas(self):
+        # design_alphas is just a dummy alpha list.
+        # this can be replaced with extract_alphas() if needed
+        # but this will place a constraint on having alphas listed in the .in file.
+        # since listing alphas in the plot is not mandatory, a simple range would work here
+        return range(len(self.vel_offsets) - 1)
+
+    # -------------------------------------- nu-alpha* ----------------------------------------
+
+    @property
+    def nu_upper(self):
+        return self._lazy("nu_upper", lambda: self.nu_spec[:self.ile].tolist())
+
+    @property
+    def alfa_upper(self):
+        return self._lazy("alfa_upper", lambda: self.alfa_spec[:self.ile].tolist())
+
+    @property
+    def nu_lower(self):
+        return self._lazy("nu_lower", lambda: self.nu_spec[self.ile:].tolist())
+
+    @property
+    def alfa_lower(self):
+        return self._lazy("alfa_lower", lambda: self.alfa_spec[self.ile:].tolist())
+
+    @property
+    def nu_conv_upper(self):
+        return self._lazy("nu_conv_upper", lambda: self.nu_conv[:self.ile].tolist())
+
+    @property
+    def alfa_conv_upper(self):
+        return self._lazy("alfa_conv_upper", lambda: self.alfa_conv[:self.ile].tolist())
+
+    @property
+    def nu_conv_lower(self):
+        return self._lazy("nu_conv_lower", lambda: self.nu_conv[self.ile:].tolist())
+
+    @property
+    def alfa_conv_lower(self):
+        return self._lazy("alfa_conv_lower", lambda: self.alfa_conv[self.ile:].tolist())
+
+    # ---------------------------------------- markers ----------------------------------------
+
+    # phi values corresponding to FOIL lines, the FOIL line nu transformed by a constant factor NU2PHI
     # caution; these markers are not sorted - since they will be plotted as scatter.
 
-    NU2PHI = 6 # degrees around the circle / nu_max in the FOIL lines which is 60.
+    @property
+    def upper_markers_phi(self):
+        return self._lazy("upper_markers_phi", lambda: np.array([self.phis[0]] + self.nu_upper) * NU2PHI)
 
-    nu_spec_upper = nu_spec[:ile].tolist()
-    alfa_spec_upper = alfa_spec[:ile].tolist()
-    upper_markes_phi = np.array([phis_upper] + nu_spec_upper) * NU2PHI
+    @property
+    def lower_markers_phi(self):
+        return self._lazy("lower_markers_phi", lambda: np.array(self.nu_lower + [self.phis[1]]) * NU2PHI)
 
-    nu_spec_lower = nu_spec[ile:].tolist()
-    alfa_spec_lower = alfa_spec[ile:].tolist()
-    lower_markes_phi = np.array(nu_spec_lower + [phis_lower]) * NU2PHI
+    @property
+    def xy_marker_upper(self):
+        phi2x, phi2y = self.phi2xy_splines
+        return self._lazy("xy_marker_upper", lambda: {"x": phi2x(self.upper_markers_phi), "y": phi2y(self.upper_markers_phi)})
 
-    # converged nu-alfa pairs
-    nu_conv, alfa_conv, *_ = extract_dmp(WORKDIR/"profoil.dmp")
-    
-    nu_conv_upper = nu_conv[:ile].tolist()
-    alfa_conv_upper = alfa_conv[:ile].tolist()
+    @property
+    def xy_marker_lower(self):
+        phi2x, phi2y = self.phi2xy_splines
+        return self._lazy("xy_marker_lower", lambda: {"x": phi2x(self.lower_markers_phi), "y": phi2y(self.lower_markers_phi)})
 
-    nu_conv_lower = nu_conv[ile:].tolist()
-    alfa_conv_lower = alfa_conv[ile:].tolist()
+    def _vel_markers(self, markers_phi):
+        phi2x = self.phi2xy_splines[0]
+        x = phi2x(markers_phi)
+        return {alfa: {"x": x, "v_vinf": v_vinf}
+                for alfa, v_vinf in zip(self.design_alphas, self.vel_at(markers_phi))}
 
-    # Triangular marker positions on upper and lower surfaces are determined using the previously
-    # transformed phi values. This is done on upper and lower surface velocity distributions
-    # and upper and lower x,y coordinates.
+    @property
+    def upper_vel_markers(self):
+        return self._lazy("upper_vel_markers", lambda: self._vel_markers(self.upper_markers_phi))
 
-    upper_vel_markers = {alfa:{"x": phi2x_spline(upper_markes_phi), "v_vinf": spl(upper_markes_phi)} 
-                    for alfa, spl 
-                    in zip(design_alphas, phi2v_spline_list)}
+    @property
+    def lower_vel_markers(self):
+        return self._lazy("lower_vel_markers", lambda: self._vel_markers(self.lower_markers_phi))
 
-    lower_vel_markers = {alfa:{"x": phi2x_spline(lower_markes_phi), "v_vinf": spl(lower_markes_phi)} 
-                    for alfa, spl 
-                    in zip(design_alphas, phi2v_spline_list)}
+    # ---------------------------------- velocity distributions ----------------------------------
 
-    xy_marker_upper = {"x" : phi2x_spline(upper_markes_phi) , "y": phi2y_spline(upper_markes_phi)}
-    xy_marker_lower = {"x" : phi2x_spline(lower_markes_phi) , "y": phi2y_spline(lower_markes_phi)}
+    @property
+    def ue_lines(self):
+        """
+        x-v/v_inf distribution of each design alpha from the phi-v/v_inf distribution using phi2x_spline.
+        The velocities are the PROFOIL outputs themselves, only x is interpolated (once for all alphas).
+        """
+        def compute():
+            x = self.phi2xy_splines[0](self.phi)
+            return {alfa: {"x": x[start:end], "v_vinf": self.v_vinf[start:end]}
+                    for alfa, start, end
+                    in zip(self.design_alphas, self.vel_offsets[:-1], self.vel_offsets[1:])}
+        return self._lazy("ue_lines", compute)
 
-    return  x,y, xy_marker_upper, xy_marker_lower, \
-            ue_lines, upper_vel_markers, lower_vel_markers, \
-            nu_spec_upper, alfa_spec_upper, nu_spec_lower, alfa_spec_lower, ile, \
-            nu_conv_upper, alfa_conv_upper, nu_conv_lower, alfa_conv_lower
+KEYWORD_REGEX = r"([A-Za-z][A-Za-z0-9]*)"
 
-def gen_input_template(filename=WORKDIR/"profoil.in"):
+class InputDocument:
     """
-    Takes profoil.in file and devoid the FOIL section containing
-    nu-alpha* block along with ILE line so that these 2 sections
-    can then be filled up by profoil-ui data
-    As a precautionary measure, VELDIST will be set to 60 as well.
+    profoil.in as a list of lines (line endings included) with the position of the keyword records
+    and of the FOIL block, so that the FOIL block and the ILE/VELDIST/ALFASP records can be patched in place
+    while every other byte of the file is written back as it was read.
+
+    lines      : lines of the file, "".join(lines) gives the text back
+    records    : {keyword: index of its first line}, ex: {"ILE": 14, "VELDIST": 20, ...}
+    foil_block : (start, stop) line indices of the first contiguous block of FOIL lines
     """
-    file_content            = open(filename).read()
-    foils_blk_devoided      = re.sub(r"^FOIL.*(?:\nFOIL.*)*$", r"{}",   file_content,       flags=re.M, count=1)
-    foils_ile_devoided      = re.sub(r"(^ILE\s+)\d+",          r"\1{}", foils_blk_devoided, flags=re.M, count=1)
-    foils_ile_vdist_fixed   = re.sub(r"^VELDIST\s+\d+",  r"VELDIST 60", foils_ile_devoided, flags=re.M, count=1)
-    return foils_ile_vdist_fixed
+
+    def __init__(self, text):
+        self.lines = text.splitlines(keepends=True)
+        self.records = {}
+        self.foil_block = None
+        for i, line in enumerate(self.lines):
+            if line.startswith("FOIL"):
+                if self.foil_block is None:
+                    self.foil_block = (i, i + 1)
+                elif self.foil_block[1] == i:
+                    self.foil_block = (self.foil_block[0], i + 1)
+            match = re.match(KEYWORD_REGEX, line)
+            if match:
+                self.records.setdefault(match.group(1), i)
+
+    @classmethod
+    def from_file(cls, filename=WORKDIR/"profoil.in"):
+        # newline="" keeps the line endings of the file as they are
+        with open(filename, newline="") as f:
+            return cls(f.read())
+
+    @property
+    def text(self):
+        return "".join(self.lines)
+
+    def copy(self):
+        document = InputDocument.__new__(InputDocument)
+        document.lines, document.records, document.foil_block = list(self.lines), dict(self.records), self.foil_block
+        return document
+
+    def newline(self, i):
+        """
+        Line ending of line i, the ending of the first line if line i has none (last line of the file)
+        """
+        line = self.lines[i]
+        ending = line[len(line.rstrip("\r\n")):]
+        return ending or (self.newline(0) if i else "\n")
+
+    def replace_lines(self, start, stop, new_lines):
+        """
+        Replaces lines[start:stop] with new_lines (given without line endings), keeping the line ending
+        style of the replaced lines. The record and FOIL block positions after stop are shifted accordingly.
+        """
+        newline = self.newline(start) if start < len(self.lines) else "\n"
+        last    = self.lines[stop-1][len(self.lines[stop-1].rstrip("\r\n")):] if stop > start else newline
+        new_lines = [line + newline for line in new_lines]
+        if new_lines: new_lines[-1] = new_lines[-1][:-len(newline)] + last
+        self.lines[start:stop] = new_lines
+
+        shift = len(new_lines) - (stop - start)
+        if shift:
+            self.records = {key: i + shift if i >= stop else i for key, i in self.records.items()}
+            if self.foil_block and self.foil_block[0] >= stop:
+                self.foil_block = (self.foil_block[0] + shift, self.foil_block[1] + shift)
+
+    def patch_record(self, keyword, pattern, replacement):
+        """
+        re.sub(pattern, replacement) on the first line of the keyword, a missing record is left alone
+        """
+        i = self.records.get(keyword)
+        if i is not None:
+            self.lines[i] = re.sub(pattern, replacement, self.lines[i], count=1)
+
+    def set_foils(self, nu_list, alpha_list, ile):
+        """
+        Writes the nu-alpha* pairs into the FOIL block and the LE segment into the ILE record.
+        As a precautionary measure, VELDIST is set to 60 as well.
+        """
+        if self.foil_block is None:
+            raise ValueError("No FOIL lines found")
+        start, stop = self.foil_block
+        foils = [gen_foil_line(nu, alpha, i, ile) for i, (nu, alpha) in enumerate(zip(nu_list, alpha_list), start=1)]
+        self.replace_lines(start, stop, foils)
+        self.foil_block = (start, start + len(foils))
+
+        self.patch_record("ILE", r"^(ILE\s+)\d+", r"\g<1>{}".format(ile))
+        self.patch_record("VELDIST", r"^VELDIST\s+\d+", "VELDIST 60")
+
+    def set_alphas(self, alphas):
+        """
+        Replaces the ALFASP block (ALFASP n followed by n lines of alphas) with the given list of alphas.
+        """
+        i = self.records.get("ALFASP")
+        match = re.match(r"ALFASP\s+(\d+)", self.lines[i]) if i is not None else None
+        if not match:
+            raise ValueError("No ALFASP line found")
+        n = int(match.group(1))
+        self.replace_lines(i, i+n+1, ["ALFASP {}".format(len(alphas))] + [" {}".format(alpha) for alpha in alphas])
+
+    def save(self, filename=WORKDIR/"profoil.in"):
+        save2profoil_in(self.text, filename, newline="")
 
 def gen_foil_line(nu, alpha, i, ile, delta_alpha=0):
     """
@@ -261,33 +694,108 @@ def gen_foil_line(nu, alpha, i, ile, delta_alpha=0):
     return "FOIL{:12.5f}{:12.5f}{:5d}{:4d}{}".format(nu, alpha, i, delta_alpha, 
                                                     "  <--- ILE" if i == ile else "")
 
-def gen_input_file(nu_list, alpha_list, ile):
+def gen_input_file(nu_list, alpha_list, ile, filename=WORKDIR/"profoil.in", document=None):
     """
     Generates profoil.in file using passed nu-alpha pairs and LE seg.
     Only the FOIL section and ILE will be updated 
     while keeping the rest of the original profoil.in file intact.
+    An InputDocument of the file can be passed in to save parsing it again; it is patched in place.
+    """
+    document = document or InputDocument.from_file(filename)
+    document.set_foils(nu_list, alpha_list, ile)
+    document.save(filename)
+
+def atomic_write(filename, data, newline=None):
+    """
+    Writes data (str or bytes) into a temporary file next to filename and renames it over filename,
+    so that readers (and a crash half way) only ever see the old or the new file, never a truncated one.
+    The permissions of an existing file are kept.
+    """
+    filename = Path(filename)
+    binary   = isinstance(data, bytes)
+    fd, tmp_name = tempfile.mkstemp(prefix="." + filename.name + "_", suffix=".tmp", dir=filename.parent)
+    try:
+        with os.fdopen(fd, "wb" if binary else "w", newline=None if binary else newline) as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if filename.is_file():
+            os.chmod(tmp_name, filename.stat().st_mode & 0o7777)
+        else:
+            umask = os.umask(0); os.umask(umask)
+            os.chmod(tmp_name, 0o666 & ~umask)
+        os.replace(tmp_name, filename)
+    except BaseException:
+        if os.path.exists(tmp_name): os.unlink(tmp_name)
+        raise
+
+class InputWriter:
     """
-    file_template = gen_input_template()
-    foils_section = "\n".join([gen_foil_line(nu, alpha, i, ile) 
-                                for i, (nu, alpha) 
-                                in  enumerate(zip(nu_list,alpha_list), start=1)])
+    Change aware writer of profoil.in files.
+    The digest of the last text written to each file is kept in memory together with the file's
+    (mtime, size) right after the write. As long as the file still has that (mtime, size), an unchanged
+    text is recognized from the digest alone and the write is skipped without reading the file.
+    A file changed behind the writer's back (or never written by it) is read once to compare.
 
-    save2profoil_in(file_template.format(foils_section, ile))
+    written : number of writes performed
+    skipped : number of writes skipped because the content was unchanged
+    """
+
+    def __init__(self):
+        self.files   = {}   # path: (digest, mtime_ns, size)
+        self.written = 0
+        self.skipped = 0
+        self.lock    = threading.Lock()
+
+    def __repr__(self):
+        return "InputWriter(written={}, skipped={})".format(self.written, self.skipped)
+
+    @staticmethod
+    def digest(text, newline):
+        return hashlib.sha1("{!r}\0{}".format(newline, text).encode("utf-8", "surrogatepass")).digest()
+
+    def is_unchanged(self, text, path, newline, digest):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return False
+        if self.files.get(path) == (digest, stat.st_mtime_ns, stat.st_size):
+            return True
+        # unknown state of the file, compare the contents the old way
+        with path.open("r", newline=newline) as f:
+            return f.read() == text
 
-def save2profoil_in(text, filename=WORKDIR/"profoil.in"):
+    def write(self, text, filename, newline=None):
+        """
+        Writes text into filename unless the file already holds it. Returns True if the file was written.
+        """
+        path   = Path(filename).resolve()
+        digest = self.digest(text, newline)
+        with self.lock:
+            if self.is_unchanged(text, path, newline, digest):
+                self.skipped += 1
+                return False
+            atomic_write(path, text, newline)
+            stat = path.stat()
+            self.files[path] = (digest, stat.st_mtime_ns, stat.st_size)
+            self.written += 1
+            return True
+
+INPUT_WRITER = InputWriter()
+
+def save2profoil_in(text, filename=WORKDIR/"profoil.in", newline=None):
     """
     saves changes to the profoil.in file if the contents were actually altered.
+    The write is atomic and unchanged contents are detected without reading the file, see InputWriter.
     """
 
     # bug fix -- 26/Jul/2024
     # https://www.rcgroups.com/forums/showpost.php?p=52737531&postcount=95
-    # could have used 'a+' flag for edge case of non-existing file with one open call 
-    # but seek(0) would make it vulnerable in some unix based systems.
+    # a missing file is simply written.
 
-    f_handle = Path(filename)
-    if (f_handle.is_file() and f_handle.open('r').read() == text): return
-    with f_handle.open("w") as f:
-        f.write(text)   
+    # newline="" reads/writes the line endings as they are in text (used by InputDocument)
+
+    INPUT_WRITER.write(text, filename, newline)
 
 def is_design_converged(filename=WORKDIR/"profoil.log"):
     """
@@ -298,42 +806,115 @@ def is_design_converged(filename=WORKDIR/"profoil.log"):
     Because there could be errors in calculations in VELDIST for ex:
     even after the design is converged
     """
-    return "AIRFOIL DESIGN IS FINISHED" in open(filename).read()
+    return LogModel.from_file(filename).converged
 
-def exec_profoil():
+def exec_profoil(workdir=WORKDIR, timeout=None):
     """
-    Executes PROFOIL.exe located in the BINDIR
-    chdir found to be required to do this without using subprocess.
+    Executes PROFOIL.exe located in the BINDIR from the given work directory
+    and blocks until it returns. subprocess is given the work directory through cwd
+    so the working directory of the calling process is left untouched.
+    Non-blocking runs with cancellation are handled by profoil_runner.ProfoilProcess.
     """
-    os.chdir(WORKDIR)
-    os.system("{} > profoil.log".format(EXEC_ABS_PATH))
+    with open(Path(workdir)/"profoil.log", "w") as log:
+        subprocess.run([EXEC_ABS_PATH], cwd=workdir, stdout=log, timeout=timeout or None)
+
+STATS_REGEX        = r'\*+\s*STATISTICS\s*\*+\n((?:.*\n){14})'
+AIRFOIL_NAME_REGEX = r"(?:Airfoil Name:|Airfoil/Comment:)\s*(.*)"
+STAT_FIELD_REGEX   = r"^\s*(.*?)\s*[=:]\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[EeDd][-+]?\d+)?)"
 
 def extract_summary(filename=WORKDIR/"profoil.log"):
     """
     Extracts the summary portion from the log file. 
     If airfoil name is prescribed in the *.in file the name will be extracted too
     """
-    text = open(filename).read()
-    stats = re.findall(r'\*+\s*STATISTICS\s*\*+\n((?:.*\n){14})', text)[0]
-    airfoil_name_match = re.findall(r"(?:Airfoil Name:|Airfoil/Comment:)\s*(.*)", text)
-    airfoil_name = airfoil_name_match[0].strip() if airfoil_name_match else "Unnamed Airfoil"
-    
-    # Strip spaces from each line of stats
-    stripped_stats = "\n".join(line.strip() for line in stats.splitlines())
-    return f"{airfoil_name}\n\n{stripped_stats}"
-
-"""
-Below utility functions are self explanatory. 
-They just move the files from BIN directory to WORK directory and vise versa.
-shutil is used to keep the generality between platforms.
-"""
-def gen_buffer():
-    shutil.copy(WORKDIR/"profoil.in", WORKDIR/"buffer.in")
-
-def swap_buffer():
-    shutil.copy(WORKDIR/"profoil.in", WORKDIR/"temp.in")
-    shutil.copy(WORKDIR/"buffer.in",  WORKDIR/"profoil.in")
-    shutil.copy(WORKDIR/"temp.in",    WORKDIR/"buffer.in")
+    return LogModel.from_file(filename).summary
+
+def find_airfoil_name(text):
+    airfoil_name_match = re.findall(AIRFOIL_NAME_REGEX, text)
+    return airfoil_name_match[0].strip() if airfoil_name_match else "Unnamed Airfoil"
+
+# Newton iteration lines of the log, ex: " ITERATION  3   RESIDUAL = 1.2345E-04"
+# The whole line has to match: the ITERATION keyword and the iteration number at the start, and the residual
+# after its RESIDUAL label at the end, so echoed input records (ITERATIONS 20 ... 1.0E-06) are not taken.
+RESIDUAL_REGEX     = r"^\s*ITERATION\s+(\d+)\s+RESIDUAL\s*=\s*([-+]?\d*\.?\d+(?:[EeDd][-+]?\d+)?)\s*$"
+
+def parse_residual(line):
+    """
+    Returns (iteration, residual) of a Newton iteration line of the log or None for any other line.
+    Used to follow the convergence while PROFOIL is still running.
+    """
+    match = re.match(RESIDUAL_REGEX, line)
+    if not match: return None
+    return int(match.group(1)), float(match.group(2).replace("D", "E").replace("d", "e"))
+
+def extract_stats(filename=WORKDIR/"profoil.log"):
+    """
+    Extracts the STATISTICS block of the log file as a {name: value} dict
+    so that the numbers can be compared across runs.
+    Only the first number on each "name = value" (or "name: value") line is taken.
+    An empty dict is returned when there is no STATISTICS block, ie: failed runs.
+    """
+    return LogModel.from_file(filename).stats
+
+def parse_stats(stats):
+    fields = {}
+    for line in stats.splitlines():
+        match = re.match(STAT_FIELD_REGEX, line)
+        if match and match.group(1):
+            fields[match.group(1)] = float(match.group(2).replace("D", "E").replace("d", "e"))
+    return fields
+
+ERROR_REGEX   = r"(?i)\b(?:error|fatal)\b"
+WARNING_REGEX = r"(?i)\bwarning\b"
+
+class LogModel:
+    """
+    profoil.log of a run parsed once, so that the convergence check, the summary label,
+    the STATISTICS numbers and the File View all work on the same read of the file.
+
+    text         : full log text (File View)
+    converged    : "AIRFOIL DESIGN IS FINISHED" was reached
+    airfoil_name : Airfoil Name/Comment line or "Unnamed Airfoil"
+    stats_text   : STATISTICS block as printed, "" for failed runs
+    stats        : {name: float} of the STATISTICS block, {} for failed runs
+    errors       : stripped lines mentioning an error
+    warnings     : stripped lines mentioning a warning
+    residuals    : [(iteration, residual), ...] of the Newton iterations
+    """
+
+    def __init__(self, text):
+        self.text         = text
+        self.converged    = "AIRFOIL DESIGN IS FINISHED" in text
+        self.airfoil_name = find_airfoil_name(text)
+        stats = re.findall(STATS_REGEX, text)
+        self.stats_text   = stats[0] if stats else ""
+        self.stats        = parse_stats(self.stats_text)
+
+        self.errors, self.warnings, self.residuals = [], [], []
+        for line in text.splitlines():
+            residual = parse_residual(line)
+            if residual:
+                self.residuals.append(residual)
+            elif re.search(ERROR_REGEX, line):
+                self.errors.append(line.strip())
+            elif re.search(WARNING_REGEX, line):
+                self.warnings.append(line.strip())
+
+    @classmethod
+    def from_file(cls, filename=WORKDIR/"profoil.log"):
+        return cls(Path(filename).read_text(errors="replace"))
+
+    def __repr__(self):
+        return "LogModel({!r}, converged={}, {} stats, {} iterations)".format(
+            self.airfoil_name, self.converged, len(self.stats), len(self.residuals))
+
+    @property
+    def summary(self):
+        """
+        Airfoil name followed by the STATISTICS block with the lines stripped, as shown in the summary label
+        """
+        stripped_stats = "\n".join(line.strip() for line in self.stats_text.splitlines())
+        return f"{self.airfoil_name}\n\n{stripped_stats}"
 
 def catfile(filename, tail=0):
     """
@@ -343,3 +924,114 @@ def catfile(filename, tail=0):
     """
     lines = Path(filename).open().readlines()
     return "".join(lines[-tail:])
+
+class RunContext:
+    """
+    Bundles the files of a single PROFOIL run.
+    Without a workdir a fresh temporary directory is created and owned by the context;
+    it is removed on cleanup() or when leaving a with-block.
+    Given a workdir (typically WORKDIR for the interactive session), the directory is used as is.
+
+    with RunContext() as ctx:
+        ctx.save_input(text)
+        ctx.exec_profoil()
+        if ctx.is_design_converged():
+            data = ctx.extract_all_data()
+    """
+
+    def __init__(self, workdir=None):
+        self.owns_workdir = workdir is None
+        self.workdir  = Path(tempfile.mkdtemp(prefix="profoil_") if workdir is None else workdir).resolve()
+
+        self.in_file     = self.workdir/"profoil.in"
+        self.xy_file     = self.workdir/"profoil.xy"
+        self.dmp_file    = self.workdir/"profoil.dmp"
+        self.vel_file    = self.workdir/"profoil.vel"
+        self.log_file    = self.workdir/"profoil.log"
+        self.sidecar_file = self.workdir/SIDECAR_NAME
+        self._log, self._log_key = None, None
+        self._input, self._input_key = None, None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cleanup()
+
+    def __repr__(self):
+        return "RunContext({!r})".format(str(self.workdir))
+
+    def cleanup(self):
+        """
+        Removes the directory if it is owned by this context.
+        """
+        if self.owns_workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def save_input(self, text):
+        save2profoil_in(text, self.in_file)
+
+    def clear_outputs(self):
+        """
+        Removes the output files (and the sidecar) of the last run, profoil.in is kept
+        """
+        for filename in self.workdir.iterdir():
+            if filename.name in ("profoil.xy", "profoil.dmp", "profoil.vel", "profoil.log", "profoil.fail.json") or \
+               is_sidecar_file(filename.name):
+                filename.unlink()
+
+    @property
+    def input_document(self):
+        """
+        InputDocument of profoil.in, re-parsed only when the file changed on disk since it was last read or written here
+        """
+        stat = self.in_file.stat()
+        key  = (stat.st_mtime_ns, stat.st_size)
+        if self._input_key != key:
+            self._input, self._input_key = InputDocument.from_file(self.in_file), key
+        return self._input
+
+    def gen_input_file(self, nu_list, alpha_list, ile):
+        try:
+            gen_input_file(nu_list, alpha_list, ile, self.in_file, self.input_document)
+        except Exception:
+            self._input_key = None   # the cached document may have been patched without being saved
+            raise
+        stat = self.in_file.stat()
+        self._input_key = (stat.st_mtime_ns, stat.st_size)
+
+    def exec_profoil(self, timeout=None):
+        exec_profoil(self.workdir, timeout)
+
+    @property
+    def log(self):
+        """
+        LogModel of the last run, re-parsed only when profoil.log changed on disk
+        """
+        stat = self.log_file.stat()
+        key  = (stat.st_mtime_ns, stat.st_size)
+        if self._log_key != key:
+            self._log, self._log_key = LogModel.from_file(self.log_file), key
+        return self._log
+
+    def is_design_converged(self):
+        return self.log.converged
+
+    def extract_summary(self):
+        return self.log.summary
+
+    def extract_stats(self):
+        return self.log.stats
+
+    def extract_dmp(self, converged=False):
+        """
+        FOIL/ILE/PHIS data from profoil.in (prescribed) or profoil.dmp (converged)
+        """
+        return extract_dmp(self.dmp_file if converged else self.in_file)
+
+    def iter_vel_blocks(self, chunk_bytes=VEL_CHUNK_BYTES):
+        return iter_vel_blocks(self.vel_file, chunk_bytes)
+
+    def extract_all_data(self):
+        return extract_all_data(self.workdir)
+
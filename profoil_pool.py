@@ -0,0 +1,288 @@
+# Copyright (c) 2022 Kanishka Jayawardane [kanishkagj@yahoo.com]
+# Copyright (c) 2022 Michael Selig
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Warm worker slots for repeated PROFOIL invocations.
+# A slot owns a scratch directory which is created once (on tmpfs when available) and reused
+# job after job, along with the resolved path of the PROFOIL executable. Compared to a fresh
+# RunContext per run this saves the mkdtemp/rmtree pair and keeps all the PROFOIL file I/O in RAM.
+
+#                 acquire()                 run(text)                      release()
+#   +------+  ------------------>  +------+ --------->  +---------+  ------------------>  +------+
+#   | idle |                       | busy |             | outputs |   (read by the job)   | idle |
+#   +------+  <------------------  +------+             +---------+                       +------+
+#      |       idle > WORKER_IDLE_TEARDOWN_S
+#      +-----> torn down (directory removed) on the next acquire()/release()
+
+# WorkerPool hands out slots to threads (GUI background runs), process_slot() gives every worker
+# process of a ProcessPoolExecutor (batch runs, sweeps) its own slot.
+
+# Every job is timed, so that the per-job overhead (everything but PROFOIL itself) can be compared
+# against the RunContext based runs.
+
+# +----------+-----------------------------------------------------------+
+# | Timing   | Meaning                                                   |
+# +----------+-----------------------------------------------------------+
+# | wait     | time spent waiting for an idle slot                       |
+# | prepare  | clearing the outputs of the previous job, writing the .in |
+# | profoil  | ProfoilProcess.elapsed (spawn + PROFOIL + log streaming)  |
+# | total    | wait + the whole job block including reading the outputs  |
+# | overhead | total - profoil                                           |
+# +----------+-----------------------------------------------------------+
+
+import multiprocessing.util
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from preferences import SCRATCH_DIR, WORKER_POOL_SIZE, WORKER_IDLE_TEARDOWN_S
+from profoil_interface import RunContext, EXEC_ABS_PATH
+from profoil_runner import ProfoilProcess
+
+TIMINGS = ["wait", "prepare", "profoil", "total", "overhead"]
+
+def scratch_root(root=SCRATCH_DIR):
+    """
+    Directory holding the slot directories. Without an explicit SCRATCH_DIR, /dev/shm is used
+    when it is available (Linux), otherwise the system temporary directory.
+    """
+    if root:
+        return Path(root)
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return Path("/dev/shm")
+    return Path(tempfile.gettempdir())
+
+class JobStats:
+    """
+    Thread safe accumulator of the per-job timings
+    """
+
+    def __init__(self):
+        self.jobs   = 0
+        self.totals = dict.fromkeys(TIMINGS, 0.0)
+        self._lock  = threading.Lock()
+
+    def add(self, timing):
+        with self._lock:
+            self.jobs += 1
+            for name in TIMINGS:
+                self.totals[name] += timing.get(name, 0.0)
+
+    def means(self):
+        with self._lock:
+            return {name: total/self.jobs if self.jobs else 0.0 for name, total in self.totals.items()}
+
+    def __repr__(self):
+        return "JobStats(jobs={}, {})".format(self.jobs, ", ".join("{}={:.4f}s".format(name, mean)
+                                                                   for name, mean in self.means().items()))
+
+class WorkerSlot:
+    """
+    One reusable scratch directory for PROFOIL runs.
+
+    with slot.job():
+        process = slot.run(text)
+        if process.succeeded and slot.ctx.is_design_converged():
+            data = slot.ctx.extract_all_data()
+    print(slot.last_job)
+    """
+
+    def __init__(self, root=None, command=None, stats=None):
+        root = scratch_root(root)
+        root.mkdir(parents=True, exist_ok=True)
+        self.ctx       = RunContext(tempfile.mkdtemp(prefix="profoil_slot_", dir=root))
+        self.command   = command or [str(Path(EXEC_ABS_PATH).resolve())]
+        self.stats     = stats or JobStats()
+        self.last_used = time.monotonic()
+        self.last_job  = None
+        self._timing   = None
+
+    def __repr__(self):
+        return "WorkerSlot({!r})".format(str(self.ctx.workdir))
+
+    @property
+    def workdir(self):
+        return self.ctx.workdir
+
+    @contextmanager
+    def job(self, wait=0.0):
+        """
+        Times everything done with the slot inside the with-block as one job.
+        """
+        self.start_job(wait)
+        try:
+            yield self
+        finally:
+            self.finish_job()
+
+    def start_job(self, wait=0.0):
+        """
+        start_job()/finish_job() time a job which does not fit in a with-block (a run on a QThread for ex:)
+        """
+        self._timing  = {"wait": wait, "prepare": 0.0, "profoil": 0.0}
+        self._t_start = time.perf_counter()
+
+    def finish_job(self, process=None):
+        """
+        process : a ProfoilProcess started outside of run(), its elapsed time is counted as PROFOIL time.
+        """
+        timing, self._timing = self._timing, None
+        if process is not None:
+            timing["profoil"] += process.elapsed
+        timing["total"]    = timing["wait"] + time.perf_counter() - self._t_start
+        timing["overhead"] = timing["total"] - timing["profoil"]
+        self.last_job  = timing
+        self.last_used = time.monotonic()
+        self.stats.add(timing)
+
+    def prepare(self, in_text):
+        """
+        Removes whatever the previous job left behind and writes the new profoil.in
+        """
+        t_start = time.perf_counter()
+        with os.scandir(self.workdir) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    os.unlink(entry.path)
+        self.ctx.in_file.write_text(in_text)
+        if self._timing is not None:
+            self._timing["prepare"] += time.perf_counter() - t_start
+
+    def run(self, in_text, on_start=None, **kwargs):
+        """
+        Runs PROFOIL on in_text in the slot directory and returns the finished ProfoilProcess.
+        on_start is called with the process just before it is started (to be able to cancel it).
+        kwargs are passed on to ProfoilProcess (timeout, command, on_line, limits..)
+        """
+        self.prepare(in_text)
+        kwargs["command"] = kwargs.get("command") or self.command
+        process = ProfoilProcess(self.workdir, **kwargs)
+        if on_start: on_start(process)
+        process.run()
+        if self._timing is not None:
+            self._timing["profoil"] += process.elapsed
+        return process
+
+    def teardown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+class WorkerPool:
+    """
+    Hands out up to size slots to concurrent jobs. Slots are created on demand and torn down
+    lazily once they have been idle for idle_teardown seconds.
+
+    pool = WorkerPool()
+    with pool.job() as slot:
+        process = slot.run(text)
+    """
+
+    def __init__(self, size=WORKER_POOL_SIZE, root=SCRATCH_DIR, idle_teardown=WORKER_IDLE_TEARDOWN_S, command=None):
+        self.size          = size or os.cpu_count()
+        self.root          = scratch_root(root)
+        self.idle_teardown = idle_teardown
+        self.command       = command
+        self.stats         = JobStats()
+        self._slots        = set()
+        self._idle         = []   # used as a stack, so the most recently used (warm) slot is reused first
+        self._cond         = threading.Condition()
+
+    def __repr__(self):
+        return "WorkerPool(size={}, slots={}, idle={}, {!r})".format(self.size, len(self._slots), len(self._idle), self.stats)
+
+    def acquire(self, block=True, timeout=None):
+        """
+        Returns an idle slot, a new one if the pool is not full yet.
+        Returns None if no slot became available (block=False or timeout).
+        """
+        with self._cond:
+            self._reap()
+            while not self._idle and len(self._slots) >= self.size:
+                if not block or not self._cond.wait(timeout):
+                    return None
+            if self._idle:
+                return self._idle.pop()
+            slot = WorkerSlot(self.root, self.command, self.stats)
+            self._slots.add(slot)
+            return slot
+
+    def release(self, slot):
+        with self._cond:
+            if slot not in self._slots: return   # pool closed in the meantime
+            slot.last_used = time.monotonic()
+            self._idle.append(slot)
+            self._reap()
+            self._cond.notify()
+
+    @contextmanager
+    def job(self, block=True, timeout=None):
+        """
+        Acquires a slot for the duration of the with-block, timing the whole job.
+        """
+        t_start = time.perf_counter()
+        slot = self.acquire(block, timeout)
+        if slot is None:
+            raise TimeoutError("no idle PROFOIL worker slot")
+        try:
+            with slot.job(wait=time.perf_counter() - t_start):
+                yield slot
+        finally:
+            self.release(slot)
+
+    def _reap(self):
+        """
+        Tears down the slots which have been idle for too long. Called with the lock held.
+        """
+        if not self.idle_teardown: return
+        now = time.monotonic()
+        for slot in [s for s in self._idle if now - s.last_used > self.idle_teardown]:
+            self._idle.remove(slot)
+            self._slots.discard(slot)
+            slot.teardown()
+
+    def close(self):
+        """
+        Tears down all the slots. Meant for shutdown, once no job is running anymore.
+        """
+        with self._cond:
+            for slot in self._slots:
+                slot.teardown()
+            self._slots.clear()
+            self._idle.clear()
+
+_process_slot = None
+
+def process_slot(command=None):
+    """
+    The slot of the current process, created on the first call and removed when the process exits.
+    Meant for the workers of a ProcessPoolExecutor, where every worker runs one job at a time.
+    """
+    global _process_slot
+    if _process_slot is None or _process_slot[0] != os.getpid():
+        # a forked child must not share the directory of its parent
+        slot = WorkerSlot(command=command)
+        multiprocessing.util.Finalize(slot, slot.teardown, exitpriority=0)
+        _process_slot = (os.getpid(), slot)
+    return _process_slot[1]
@@ -0,0 +1,185 @@
+# Copyright (c) 2022 Kanishka Jayawardane [kanishkagj@yahoo.com]
+# Copyright (c) 2022 Michael Selig
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# In-memory history of the profoil.in versions of a session.
+# Every version the UI writes (applied edits, File View saves, loaded files, runs) becomes a revision,
+# linked to the revision it was derived from. Undo walks back one revision, Revert walks back
+# to the last revision that was run successfully, as many steps back as needed.
+
+# Texts are stored as line deltas against the revision they were derived from, so that the memory
+# stays flat over a long session: an edit of a design only changes a few FOIL lines of its parent.
+
+#   keyframe  : full list of lines
+#   revision  : base[:prefix] + middle + base[len(base)-suffix:]     (base is the parent revision)
+
+# A revision is rebuilt by walking its deltas back to a keyframe and splicing forward. A new keyframe is
+# started for the first revision, every KEYFRAME_INTERVAL deltas along a chain (bounds the rebuild cost)
+# and when the delta would hold more than half of the text. The lines of the last rebuilt revision are
+# kept, so committing the next edit of the head does not rebuild anything.
+
+# +----------+-------------------------------------------------------------------+
+# | Revision | Content                                                           |
+# +----------+-------------------------------------------------------------------+
+# | parent   | revision it was derived from, None for the first one              |
+# | delta    | (base, prefix, suffix, middle) lines, base is None for keyframes  |
+# | depth    | number of deltas down to the keyframe                             |
+# | digest   | of the text, identical texts are stored once                      |
+# | result   | RunResult of the run of this text, only kept for the last         |
+# |          | REVISION_RESULTS runs, the result cache has the outputs of others |
+# | converged| whether the text has been run to a converged design               |
+# +----------+-------------------------------------------------------------------+
+
+import hashlib
+from collections import OrderedDict
+
+from preferences import REVISION_RESULTS
+
+KEYFRAME_INTERVAL = 32
+
+class Revision:
+    __slots__ = ("parent", "base", "prefix", "suffix", "middle", "depth", "digest", "converged")
+
+    def __init__(self, parent, base, prefix, suffix, middle, depth, digest):
+        self.parent    = parent
+        self.base      = base
+        self.prefix    = prefix
+        self.suffix    = suffix
+        self.middle    = middle
+        self.depth     = depth
+        self.digest    = digest
+        self.converged = False
+
+class RevisionStore:
+
+    def __init__(self, max_results=REVISION_RESULTS):
+        self.revisions   = []
+        self.keyframes   = []   # revision numbers stored as full texts
+        self.by_digest   = {}
+        self.results     = OrderedDict()   # revision: RunResult, least recently attached first
+        self.max_results = max_results
+        self.head        = None
+        self._last_lines = (None, None)   # (revision, lines) of the last rebuilt revision
+
+    def __len__(self):
+        return len(self.revisions)
+
+    def __repr__(self):
+        return "RevisionStore(revisions={}, keyframes={}, results={}, head={})".format(
+                len(self.revisions), len(self.keyframes), len(self.results), self.head)
+
+    @staticmethod
+    def normalize(text):
+        # texts are kept as read in text mode, so that the same file read with or without
+        # universal newlines ends up in the same revision
+        return text.replace("\r\n", "\n")
+
+    def commit(self, text, parent=None):
+        """
+        Records text as the head revision and returns its number.
+        A text which is already in the store becomes the head again without a new revision.
+        parent defaults to the current head.
+        """
+        text   = self.normalize(text)
+        digest = hashlib.sha1(text.encode("utf-8", "surrogatepass")).digest()
+        if digest in self.by_digest:
+            self.head = self.by_digest[digest]
+            return self.head
+
+        parent = self.head if parent is None else parent
+        lines  = text.splitlines(keepends=True)
+        delta  = self.delta(lines, parent)
+        revision = len(self.revisions)
+        if delta is None:
+            self.keyframes.append(revision)
+            delta = (None, 0, 0, tuple(lines), 0)
+
+        self.revisions.append(Revision(parent, *delta, digest))
+        self.by_digest[digest] = revision
+        self._last_lines = (revision, lines)
+        self.head = revision
+        return revision
+
+    def delta(self, lines, base):
+        """
+        (base, prefix, suffix, middle, depth) of lines against the base revision, None when there is
+        no base, the chain is KEYFRAME_INTERVAL deltas long or the delta would hold more than half of the text.
+        """
+        if base is None or self.revisions[base].depth + 1 >= KEYFRAME_INTERVAL: return None
+        base_lines = self.lines(base)
+        n = min(len(lines), len(base_lines))
+        prefix = 0
+        while prefix < n and lines[prefix] == base_lines[prefix]: prefix += 1
+        suffix = 0
+        while suffix < n - prefix and lines[-1-suffix] == base_lines[-1-suffix]: suffix += 1
+        middle = lines[prefix:len(lines)-suffix]
+        if 2*sum(map(len, middle)) > sum(map(len, lines)): return None
+        return base, prefix, suffix, tuple(middle), self.revisions[base].depth + 1
+
+    def lines(self, revision):
+        """
+        Lines of revision, rebuilt from its keyframe
+        """
+        if self._last_lines[0] == revision: return self._last_lines[1]
+        chain = []
+        r = revision
+        while r is not None:
+            chain.append(self.revisions[r])
+            r = chain[-1].base
+        lines = []
+        for r in reversed(chain):
+            lines = lines[:r.prefix] + list(r.middle) + lines[len(lines)-r.suffix:]
+        self._last_lines = (revision, lines)
+        return lines
+
+    def text(self, revision):
+        return "".join(self.lines(revision))
+
+    def checkout(self, revision):
+        """
+        Makes revision the head and returns its text
+        """
+        self.head = revision
+        return self.text(revision)
+
+    def parent(self, revision):
+        return self.revisions[revision].parent
+
+    def attach(self, revision, result):
+        """
+        Pairs the RunResult of a converged run with its revision
+        """
+        self.revisions[revision].converged = True
+        self.results.pop(revision, None)
+        self.results[revision] = result
+        while len(self.results) > self.max_results:
+            self.results.popitem(last=False)
+
+    def result(self, revision):
+        return self.results.get(revision)
+
+    def last_converged(self, revision):
+        """
+        Closest ancestor of revision (revision itself excluded) that has been run to a converged design
+        """
+        revision = self.parent(revision)
+        while revision is not None and not self.revisions[revision].converged:
+            revision = self.parent(revision)
+        return revision
@@ -0,0 +1,324 @@
+# Copyright (c) 2022 Kanishka Jayawardane [kanishkagj@yahoo.com]
+# Copyright (c) 2022 Michael Selig
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# This module runs PROFOIL without blocking the caller.
+# exec_profoil() in profoil_interface used to os.chdir(...) into the work directory and
+# block on os.system(...) until PROFOIL returned, freezing the Qt event loop for the whole run.
+# ProfoilProcess wraps a subprocess.Popen call which is started in the work directory through
+# the cwd argument, so the working directory of the UI process is never touched.
+
+# A run goes through the following states.
+
+# +---------+     +---------+     +-----------+
+# | pending +---->+ running +--+->+ finished  |   PROFOIL returned by itself
+# +---------+     +---------+  |  +-----------+
+#                              +->+ cancelled |   cancel() was called
+#                              |  +-----------+
+#                              +->+ timeout   |   wall-clock limit exceeded           -+
+#                              |  +-----------+                                        |
+#                              +->+ cpu_limit |   CPU time limit exceeded              |
+#                              |  +-----------+                                        | watchdog kills
+#                              +->+ log_limit |   profoil.log grew over the size cap   |
+#                              |  +-----------+                                        |
+#                              +->+ diverged  |   residual kept growing                -+
+#                              |  +-----------+
+#                              +->+ error     |   PROFOIL could not be started
+#                                 +-----------+
+
+# Whenever the watchdog (or cancel()) kills PROFOIL, the reason and the state of the run at that point
+# are written into profoil.fail.json in the work directory and kept in ProfoilProcess.failure,
+# so that batch runs and sweeps can report pathological cases instead of stalling on them.
+# CPU time is limited through RLIMIT_CPU on POSIX systems and additionally polled from /proc on Linux.
+
+# PROFOIL's stdout is read through a pipe on a reader thread, written into profoil.log line by line
+# and handed to the optional on_line callback while PROFOIL is still running, so the log can be followed live.
+
+# run() blocks the calling thread and is what batch style consumers want.
+# start() does the same on a daemon thread so that the caller can carry on and wait() or poll later.
+# The Qt side of this (signals to the main window) lives in run_thread.py
+# so that this module can be imported without PyQt5.
+
+import json
+import os
+import signal
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+from preferences import PROFOIL_TIMEOUT, PROFOIL_CPU_LIMIT, PROFOIL_MAX_LOG_MB, PROFOIL_DIVERGENCE_ITERATIONS
+from profoil_interface import WORKDIR, EXEC_ABS_PATH, parse_residual
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+POLL_INTERVAL = 0.05 # seconds between checks for cancel/timeout while PROFOIL is running
+
+# gfortran buffers stdout when it is not a terminal, which would hold the log back until PROFOIL exits.
+UNBUFFERED_ENV = {"GFORTRAN_UNBUFFERED_PRECONNECTED": "y"}
+
+# statuses of the runs killed by the watchdog
+TERMINATED = ("timeout", "cpu_limit", "log_limit", "diverged")
+
+def cpu_seconds(pid):
+    """
+    user+system CPU time of a running process, read from /proc. None where /proc is not available.
+    """
+    try:
+        fields = Path("/proc/{}/stat".format(pid)).read_text().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError, AttributeError):
+        return None
+
+def is_diverging(residuals, n):
+    """
+    True when the residual has grown on each of the last n iterations.
+    """
+    return n > 0 and len(residuals) > n and all(a < b for a, b in zip(residuals[-n-1:], residuals[-n:]))
+
+class ProfoilProcess:
+
+    def __init__(self, workdir=WORKDIR, timeout=PROFOIL_TIMEOUT, command=None, on_line=None,
+                 cpu_limit=PROFOIL_CPU_LIMIT, max_log_mb=PROFOIL_MAX_LOG_MB,
+                 divergence_iterations=PROFOIL_DIVERGENCE_ITERATIONS):
+        """
+        workdir    : directory holding profoil.in, all outputs including profoil.log will be written here.
+        timeout    : wall-clock limit in seconds. 0 or None disables the limit.
+        command    : command line to run, defaults to the PROFOIL executable in the BINDIR.
+        on_line    : called with each line of the log as PROFOIL writes it, from the reader thread.
+        cpu_limit  : CPU time limit in seconds. 0 or None disables the limit.
+        max_log_mb : size cap of profoil.log in MB. 0 or None disables the cap.
+        divergence_iterations : kills the run when the residual grows on this many consecutive
+                                Newton iterations. 0 or None disables the rule.
+        """
+        self.workdir   = Path(workdir)
+        self.timeout   = timeout or None
+        self.command   = command or [EXEC_ABS_PATH]
+        self.on_line   = on_line
+
+        self.cpu_limit     = cpu_limit or None
+        self.max_log_bytes = int((max_log_mb or 0) * 1024 * 1024) or None
+        self.divergence_iterations = divergence_iterations or 0
+
+        self.status     = "pending"
+        self.returncode = None
+        self.error      = None   # human readable reason of an error or a watchdog kill
+        self.failure    = None   # contents of profoil.fail.json once PROFOIL is killed
+        self.elapsed    = 0.0
+        self.cpu_time   = None
+        self.n_lines    = 0
+        self.log_bytes  = 0
+        self.residuals  = []
+        self.iterations = []
+
+        self._proc      = None
+        self._thread    = None
+        self._cancelled = threading.Event()
+        self._done      = threading.Event()
+        self._tripped   = None   # (status, reason) set by the log reader when a log based limit is hit
+
+    @property
+    def log_file(self):
+        return self.workdir/"profoil.log"
+
+    @property
+    def fail_file(self):
+        return self.workdir/"profoil.fail.json"
+
+    def run(self):
+        """
+        Runs PROFOIL to completion (or until cancelled/timed out) and returns the final status.
+        stdout ends up in profoil.log just as the shell redirection used to do.
+        """
+        t_start = time.perf_counter()
+        self.status = "running"
+        if self.fail_file.is_file(): self.fail_file.unlink()
+        try:
+            # newline="" keeps the line endings written by PROFOIL as they are
+            with self.log_file.open("w", newline="") as log:
+                if self._cancelled.is_set():
+                    self.status = "cancelled"
+                    return self.status
+                self._proc = subprocess.Popen(self.command, cwd=self.workdir, stdout=subprocess.PIPE,
+                                              env=dict(os.environ, **UNBUFFERED_ENV))
+                if self.cpu_limit: self._limit_cpu()
+                reader = threading.Thread(target=self._pump_log, args=(log,), daemon=True)
+                reader.start()
+                self.status = self._supervise(t_start)
+                reader.join()
+        except OSError as e:
+            self.error  = str(e)
+            self.status = "error"
+        finally:
+            self.elapsed = time.perf_counter() - t_start
+            if self.status in TERMINATED + ("cancelled",):
+                self.write_failure()
+            self._done.set()
+        return self.status
+
+    def _limit_cpu(self):
+        """
+        Sets RLIMIT_CPU of the started PROFOIL, the kernel sends SIGXCPU once the soft limit is reached.
+        prlimit(...) is applied from the parent after Popen: a preexec_fn is not safe in a threaded
+        program (runs are started from QThreads and server workers). Where prlimit is not available
+        the cpu_time polling of _supervise(...) enforces the limit alone.
+        """
+        if not hasattr(resource, "prlimit"): return
+        limit = int(self.cpu_limit + 0.999)
+        try:
+            resource.prlimit(self._proc.pid, resource.RLIMIT_CPU, (limit, limit + 1))
+        except OSError:   # PROFOIL already exited
+            pass
+
+    def _supervise(self, t_start):
+        """
+        Waits on the child process in short slices so that cancel() and the timeout
+        can interrupt a run which would otherwise never return.
+        """
+        while True:
+            try:
+                self.returncode = self._proc.wait(timeout=POLL_INTERVAL)
+                return self._exit_status()
+            except subprocess.TimeoutExpired:
+                pass
+            self.cpu_time = cpu_seconds(self._proc.pid) or self.cpu_time
+            if self._cancelled.is_set():
+                return self._kill("cancelled", "cancelled by the user")
+            if self._tripped:
+                return self._kill(*self._tripped)
+            if self.timeout and time.perf_counter() - t_start > self.timeout:
+                return self._kill("timeout", "wall-clock limit of {} s exceeded".format(self.timeout))
+            if self.cpu_limit and self.cpu_time and self.cpu_time > self.cpu_limit:
+                return self._kill("cpu_limit", "CPU time limit of {} s exceeded".format(self.cpu_limit))
+
+    def _exit_status(self):
+        """
+        Status of a run which ended by itself, or through RLIMIT_CPU.
+        """
+        if self._cancelled.is_set():
+            return "cancelled"
+        if self._tripped:
+            self.error = self._tripped[1]
+            return self._tripped[0]
+        if self.cpu_limit and self._hit_cpu_limit():
+            self.error = "CPU time limit of {} s exceeded".format(self.cpu_limit)
+            return "cpu_limit"
+        return "finished"
+
+    def _hit_cpu_limit(self):
+        """
+        SIGXCPU comes from RLIMIT_CPU only. A SIGKILL may come from anywhere (OOM killer, kill -9),
+        it is taken as the hard RLIMIT_CPU only when the measured CPU time has reached the limit.
+        """
+        if hasattr(signal, "SIGXCPU") and self.returncode == -signal.SIGXCPU:
+            return True
+        return self.returncode == -signal.SIGKILL and self.cpu_time is not None and self.cpu_time >= self.cpu_limit
+
+    def _pump_log(self, log):
+        """
+        Copies PROFOIL's stdout into the log file as it comes. Ends when the pipe is closed,
+        ie: when PROFOIL exits or gets killed.
+        """
+        for raw_line in iter(self._proc.stdout.readline, b""):
+            if self._tripped: continue  # keep draining the pipe until PROFOIL is killed
+
+            self.log_bytes += len(raw_line)
+            if self.max_log_bytes and self.log_bytes > self.max_log_bytes:
+                self._tripped = ("log_limit", "profoil.log exceeded {:.1f} MB".format(self.max_log_bytes/1024/1024))
+                continue
+
+            line = raw_line.decode(errors="replace")
+            log.write(line)
+            log.flush()
+            self.n_lines += 1
+            if self.on_line: self.on_line(line)
+
+            residual = parse_residual(line)
+            if residual:
+                self.iterations.append(residual[0])
+                self.residuals.append(residual[1])
+                if is_diverging(self.residuals, self.divergence_iterations):
+                    self._tripped = ("diverged", "residual grew over {} consecutive iterations".format(self.divergence_iterations))
+        self._proc.stdout.close()
+
+    def _kill(self, status, reason):
+        self._proc.kill()
+        self.returncode = self._proc.wait()
+        self.error = reason
+        return status
+
+    def write_failure(self):
+        """
+        Leaves the reason and the state of a killed run in profoil.fail.json
+        """
+        self.failure = {
+            "status"        : self.status,
+            "reason"        : self.error,
+            "command"       : [str(c) for c in self.command],
+            "returncode"    : self.returncode,
+            "elapsed"       : round(self.elapsed, 4),
+            "cpu_time"      : self.cpu_time,
+            "log_lines"     : self.n_lines,
+            "log_bytes"     : self.log_bytes,
+            "last_iteration": self.iterations[-1] if self.iterations else None,
+            "last_residual" : self.residuals[-1] if self.residuals else None,
+            "limits"        : {"timeout": self.timeout, "cpu_limit": self.cpu_limit,
+                               "max_log_bytes": self.max_log_bytes,
+                               "divergence_iterations": self.divergence_iterations},
+        }
+        try:
+            self.fail_file.write_text(json.dumps(self.failure, indent=2))
+        except OSError:
+            pass
+
+    def start(self):
+        """
+        Runs PROFOIL on a daemon thread and returns straight away.
+        """
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """
+        Requests the run to be stopped. PROFOIL will be killed within POLL_INTERVAL.
+        Safe to call at any time, including before the run has started or after it has finished.
+        """
+        self._cancelled.set()
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the run is over. Returns False if the given timeout expired first.
+        """
+        return self._done.wait(timeout)
+
+    def is_running(self):
+        return self.status == "running"
+
+    @property
+    def succeeded(self):
+        """
+        True when PROFOIL returned by itself. This says nothing about the design convergence
+        which still has to be checked with profoil_interface.is_design_converged().
+        """
+        return self.status == "finished"
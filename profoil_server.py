@@ -0,0 +1,587 @@
+# Copyright (c) 2022 Kanishka Jayawardane [kanishkagj@yahoo.com]
+# Copyright (c) 2022 Michael Selig
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Local PROFOIL job server.
+# Several UI instances and scripts on one workstation can share a single bounded pool of PROFOIL
+# workers through this server, instead of each one spawning PROFOIL on its own.
+
+#   python profoil_server.py                  # serves on PROFOIL_SERVER_ADDRESS
+#   python profoil_server.py --status         # prints the queue of a running server
+
+# The server listens on a Unix socket, or on a loopback TCP port where Unix sockets are not
+# available (Windows). Messages are JSON objects, one per line, in both directions.
+
+# +-----------------------------------------------+------------------------------------------------+
+# | Request                                       | Replies                                        |
+# +-----------------------------------------------+------------------------------------------------+
+# | {"op": "run", "id": 1, "client": "kj@host",   | {"id": 1, "event": "queued", "position": 3,    |
+# |  "input": "<profoil.in>", "timeout": 300,     |  "deduplicated": false}                        |
+# |  "stream": true}                              | {"id": 1, "event": "log", "line": "..."}   *   |
+# |                                               | {"id": 1, "event": "done", "status": ...,      |
+# |                                               |  "converged", "airfoil_name", "stats",         |
+# |                                               |  "error", "failure", "elapsed", "cached",      |
+# |                                               |  "files": {"profoil.xy": "...", ...}}          |
+# | {"op": "cancel", "id": 1}                     | {"id": 1, "event": "done", "status":           |
+# |                                               |  "cancelled"}                                  |
+# | {"op": "status"}                              | {"event": "status", "workers", "running",      |
+# |                                               |  "queued": {client: n}, "counters"}            |
+# +-----------------------------------------------+------------------------------------------------+
+#   * only with "stream": true, the lines of profoil.log as PROFOIL writes them
+
+# Scheduling is round robin over the clients, each client having its own FIFO queue, so a client
+# submitting a large batch does not starve the others. Requests are keyed like the ResultCache
+# (normalized profoil.in + the --profoil executable), a request identical to a queued or running one
+# is attached to it instead of being run again, and finished inputs are served from the cache.
+
+import argparse
+import getpass
+import itertools
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+
+from preferences import PROFOIL_TIMEOUT, PROFOIL_SERVER_ADDRESS, PROFOIL_SERVER_WORKERS
+from profoil_interface import EXEC_ABS_PATH, LogModel
+from profoil_cache import ResultCache, CACHED_FILES
+from profoil_pool import WorkerPool
+
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+def parse_address(address):
+    """
+    "host:port" -> (host, port) for TCP, anything else is the path of a Unix socket.
+    Only loopback hosts are accepted, the server must never be reachable from the network.
+    """
+    host, _, port = str(address).rpartition(":")
+    if host and port.isdigit():
+        host = host.strip("[]")
+        if host not in LOOPBACK_HOSTS:
+            raise ValueError("PROFOIL server must listen on localhost only, got {}".format(host))
+        return host, int(port)
+    return str(Path(address).resolve())
+
+def connect(address, timeout=None):
+    address = parse_address(address)
+    if isinstance(address, tuple):
+        return socket.create_connection(address, timeout=timeout)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    sock.connect(address)
+    return sock
+
+def collect_result(ctx, status, error=None, failure=None):
+    """
+    Parsed summary and output file texts of a run, as sent back to the clients.
+    """
+    log       = ctx.log if ctx.log_file.is_file() else LogModel("")
+    converged = status == "finished" and log.converged
+    return {"status"      : status,
+            "error"       : error,
+            "failure"     : failure,
+            "converged"   : converged,
+            "airfoil_name": log.airfoil_name,
+            "stats"       : log.stats if converged else {},
+            "files"       : {name: (ctx.workdir/name).read_text(errors="replace")
+                             for name in CACHED_FILES if (ctx.workdir/name).is_file()}}
+
+class Subscriber:
+    """
+    One request waiting for a job, several requests can wait for the same (deduplicated) job.
+    """
+
+    def __init__(self, connection, request_id, stream=False):
+        self.connection = connection
+        self.request_id = request_id
+        self.stream     = stream
+        self.done       = False
+
+    def send(self, message):
+        self.connection.send(dict(message, id=self.request_id))
+
+    def finish(self, message):
+        """
+        Sends the final "done" message, the request is forgotten by its connection
+        """
+        self.connection.forget(self)
+        self.send(dict(message, event="done"))
+
+class Job:
+
+    def __init__(self, key, text, client, timeout):
+        self.key         = key
+        self.text        = text
+        self.client      = client
+        self.timeout     = timeout
+        self.subscribers = []
+        self.process     = None
+        self.cancelled   = False
+
+class Scheduler:
+    """
+    Per-client FIFO queues served round robin, with deduplication of identical inputs.
+    """
+
+    def __init__(self):
+        self.queues  = OrderedDict()   # client -> deque of jobs, only clients with queued jobs
+        self.jobs    = {}              # key -> queued or running job
+        self.running = set()
+        self.closed  = False
+        self.lock    = threading.Condition()
+
+    def submit(self, key, text, client, timeout, subscriber):
+        """
+        Returns the job the subscriber has been attached to and whether it was already there
+        """
+        with self.lock:
+            job = self.jobs.get(key)
+            deduplicated = job is not None and not job.cancelled
+            if not deduplicated:
+                job = self.jobs[key] = Job(key, text, client, timeout)
+                self.queues.setdefault(client, deque()).append(job)
+                self.lock.notify()
+            job.subscribers.append(subscriber)
+            return job, deduplicated
+
+    def position(self, job):
+        """
+        Number of jobs to be started before the given one, 0 once it is running.
+        """
+        with self.lock:
+            if job in self.running: return 0
+            clients = list(self.queues.values())
+            for depth in itertools.count():
+                if not any(len(queue) > depth for queue in clients): return None
+                for n, queue in enumerate(clients):
+                    if len(queue) > depth and queue[depth] is job:
+                        return depth*len(clients) + n + 1
+
+    def next(self):
+        """
+        Blocks until a job is available, returns None once closed.
+        """
+        with self.lock:
+            while not self.queues and not self.closed:
+                self.lock.wait()
+            if self.closed: return None
+            client = next(iter(self.queues))
+            queue  = self.queues[client]
+            job    = queue.popleft()
+            if queue:
+                self.queues.move_to_end(client)
+            else:
+                del self.queues[client]
+            self.running.add(job)
+            return job
+
+    def start(self, job, process):
+        """
+        Registers the process of a job, so that it can be cancelled. Returns False if already cancelled.
+        """
+        with self.lock:
+            job.process = process
+            if job.cancelled: process.cancel()
+            return not job.cancelled
+
+    def unsubscribe(self, job, subscriber):
+        """
+        Detaches a subscriber. A job nobody is waiting for anymore is dropped or cancelled.
+        """
+        with self.lock:
+            if subscriber in job.subscribers:
+                job.subscribers.remove(subscriber)
+            if job.subscribers or job.cancelled: return
+            job.cancelled = True
+            if self.jobs.get(job.key) is job:
+                del self.jobs[job.key]
+            queue = self.queues.get(job.client)
+            if queue is not None and job in queue:
+                queue.remove(job)
+                if not queue: del self.queues[job.client]
+            if job.process is not None:
+                job.process.cancel()
+
+    def finish(self, job):
+        """
+        Removes a finished job, returns the subscribers to be notified.
+        """
+        with self.lock:
+            self.running.discard(job)
+            if self.jobs.get(job.key) is job:
+                del self.jobs[job.key]
+            subscribers, job.subscribers = job.subscribers, []
+            return subscribers
+
+    def queued(self):
+        with self.lock:
+            return {client: len(queue) for client, queue in self.queues.items()}
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            for job in self.running:
+                if job.process is not None: job.process.cancel()
+            self.lock.notify_all()
+
+class Connection(socketserver.StreamRequestHandler):
+    """
+    One client connection, messages are handled one by one, replies may come from the worker threads.
+    """
+
+    def setup(self):
+        super().setup()
+        self.send_lock = threading.Lock()
+        self.requests  = {}   # request id -> (job, subscriber) of the requests not done yet
+        self.requests_lock = threading.Lock()
+
+    def forget(self, subscriber):
+        """
+        Marks the request of subscriber done and drops it, called from the worker threads too
+        """
+        with self.requests_lock:
+            subscriber.done = True
+            entry = self.requests.get(subscriber.request_id)
+            if entry is not None and entry[1] is subscriber:
+                del self.requests[subscriber.request_id]
+
+    def send(self, message):
+        try:
+            with self.send_lock:
+                self.wfile.write((json.dumps(message) + "\n").encode())
+                self.wfile.flush()
+        except (OSError, ValueError):
+            pass   # the client is gone, its requests are dropped in finish()
+
+    def handle(self):
+        for raw_line in self.rfile:
+            try:
+                message = json.loads(raw_line)
+                getattr(self, "op_" + message["op"])(message)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                self.send({"event": "error", "error": "bad request: {}".format(e)})
+
+    def finish(self):
+        with self.requests_lock:
+            requests, self.requests = list(self.requests.values()), {}
+        for job, subscriber in requests:
+            if not subscriber.done:
+                self.server.profoil.scheduler.unsubscribe(job, subscriber)
+        super().finish()
+
+    def op_run(self, message):
+        server = self.server.profoil
+        subscriber = Subscriber(self, message["id"], message.get("stream", False))
+        job, deduplicated = server.submit(message["input"], message.get("client") or str(self.client_address),
+                                          message.get("timeout"), subscriber)
+        with self.requests_lock:
+            # the job may be over already (cache hit on an idle worker)
+            if not subscriber.done:
+                self.requests[message["id"]] = (job, subscriber)
+        self.send({"id": message["id"], "event": "queued", "deduplicated": deduplicated,
+                   "position": server.scheduler.position(job)})
+
+    def op_cancel(self, message):
+        with self.requests_lock:
+            job, subscriber = self.requests.pop(message["id"], (None, None))
+            if job is None or subscriber.done: return
+            subscriber.done = True
+        self.server.profoil.scheduler.unsubscribe(job, subscriber)
+        subscriber.send({"event": "done", "status": "cancelled", "error": "cancelled by the client"})
+
+    def op_status(self, message):
+        self.send(dict(self.server.profoil.status(), event="status"))
+
+class ProfoilServer:
+    """
+    Runs the submitted inputs on a bounded WorkerPool.
+
+    server = ProfoilServer()
+    server.serve_forever()
+    """
+
+    def __init__(self, address=PROFOIL_SERVER_ADDRESS, workers=PROFOIL_SERVER_WORKERS, timeout=PROFOIL_TIMEOUT, command=None):
+        self.address   = parse_address(address)
+        self.pool      = WorkerPool(size=workers, idle_teardown=None, command=command)
+        self.workers   = self.pool.size
+        self.timeout   = timeout or None
+        # outputs are cached (and shared with the UI instances) under the binary the slots actually run
+        self.executable = Path(command[0] if command else EXEC_ABS_PATH)
+        self.cache     = ResultCache(executable=self.executable)
+        self.scheduler = Scheduler()
+        self.counters  = {"requests": 0, "runs": 0, "deduplicated": 0, "cache_hits": 0}
+        self.counters_lock = threading.Lock()   # updated from the connection and the worker threads
+        self.server    = None
+
+    def count(self, **increments):
+        with self.counters_lock:
+            for name, n in increments.items():
+                self.counters[name] += n
+
+    def submit(self, text, client, timeout, subscriber):
+        # a client can ask for a shorter limit, but never a longer one than the server's
+        limits = [t for t in (timeout, self.timeout) if t]
+        # identical inputs for the same PROFOIL binary share a job
+        key = "{}:{}".format(self.executable, self.cache.key(text))
+        job, deduplicated = self.scheduler.submit(key, text, client,
+                                                  min(limits) if limits else None, subscriber)
+        self.count(requests=1, deduplicated=int(deduplicated))
+        return job, deduplicated
+
+    def status(self):
+        return {"workers" : self.workers,
+                "running" : len(self.scheduler.running),
+                "queued"  : self.scheduler.queued(),
+                "counters": self.counter_values(),
+                "cache"   : {"hits": self.cache.hits, "misses": self.cache.misses},
+                "timing"  : self.pool.stats.means()}
+
+    def counter_values(self):
+        with self.counters_lock:
+            return dict(self.counters)
+
+    def work(self):
+        """
+        Worker thread, one per pool slot
+        """
+        while True:
+            job = self.scheduler.next()
+            if job is None: return
+            try:
+                result = self.run_job(job)
+            except Exception as e:
+                result = {"status": "error", "error": str(e), "converged": False, "files": {}}
+            for subscriber in self.scheduler.finish(job):
+                subscriber.finish(result)
+
+    def run_job(self, job):
+        t_start = time.perf_counter()
+        with self.pool.job() as slot:
+            if self.cache.restore(job.text, slot.workdir):
+                self.count(cache_hits=1)
+                result = collect_result(slot.ctx, "finished")
+                result["cached"] = True
+            else:
+                def on_line(line):
+                    for subscriber in list(job.subscribers):
+                        if subscriber.stream: subscriber.send({"event": "log", "line": line})
+
+                process = slot.run(job.text, timeout=job.timeout, on_line=on_line,
+                                   on_start=lambda process: self.scheduler.start(job, process))
+                self.count(runs=1)
+                if process.succeeded:
+                    self.cache.store(job.text, slot.workdir)
+                result = collect_result(slot.ctx, process.status, process.error, process.failure)
+                result["cached"] = False
+        result["elapsed"] = time.perf_counter() - t_start
+        return result
+
+    def serve_forever(self):
+        if isinstance(self.address, tuple):
+            server_class = socketserver.ThreadingTCPServer
+        else:
+            server_class = socketserver.ThreadingUnixStreamServer
+            if os.path.exists(self.address): os.unlink(self.address)   # stale socket of a killed server
+        server_class.allow_reuse_address = True
+        server_class.daemon_threads = True
+
+        self.server = server_class(self.address, Connection)
+        self.server.profoil = self
+        for _ in range(self.workers):
+            threading.Thread(target=self.work, daemon=True).start()
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.scheduler.close()
+            self.pool.close()
+            if not isinstance(self.address, tuple) and os.path.exists(self.address):
+                os.unlink(self.address)
+
+    def shutdown(self):
+        if self.server is not None: self.server.shutdown()
+
+class ProfoilClient:
+    """
+    Blocking client of the ProfoilServer. One run at a time per client,
+    cancel(...) may be called from another thread.
+
+    with ProfoilClient() as client:
+        result = client.run(open("profoil.in").read())
+    """
+
+    def __init__(self, address=PROFOIL_SERVER_ADDRESS, client=None, timeout=None):
+        self.sock  = connect(address, timeout)
+        self.sock.settimeout(None)
+        self.rfile = self.sock.makefile("rb")
+        self.name  = client or "{}@{}:{}".format(getpass.getuser(), socket.gethostname(), os.getpid())
+        self._ids  = itertools.count(1)
+        self._lock = threading.Lock()
+        self.request_id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def send(self, message):
+        with self._lock:
+            self.sock.sendall((json.dumps(message) + "\n").encode())
+
+    def receive(self):
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError("PROFOIL server closed the connection")
+        return json.loads(line)
+
+    def run(self, text, timeout=None, on_line=None, on_queued=None):
+        """
+        Returns the "done" reply of the server for the given profoil.in text
+        """
+        with self._lock:
+            self.request_id = next(self._ids)
+            self.sock.sendall((json.dumps({"op": "run", "id": self.request_id, "client": self.name, "input": text,
+                                           "timeout": timeout, "stream": on_line is not None}) + "\n").encode())
+        while True:
+            message = self.receive()
+            if message.get("id") != self.request_id:
+                continue
+            if message["event"] == "log" and on_line:
+                on_line(message["line"])
+            elif message["event"] == "queued" and on_queued:
+                on_queued(message)
+            elif message["event"] == "done":
+                with self._lock:
+                    self.request_id = None
+                return message
+
+    def cancel(self):
+        with self._lock:
+            if self.request_id is not None:
+                self.sock.sendall((json.dumps({"op": "cancel", "id": self.request_id}) + "\n").encode())
+
+    def status(self):
+        self.send({"op": "status"})
+        while True:
+            message = self.receive()
+            if message.get("event") == "status": return message
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+class RemoteProcess:
+    """
+    Drop-in replacement of ProfoilProcess running the profoil.in of the workdir on the ProfoilServer.
+    The outputs sent back by the server are written into the workdir just like a local run would.
+    """
+
+    def __init__(self, workdir, timeout=PROFOIL_TIMEOUT, on_line=None, address=PROFOIL_SERVER_ADDRESS):
+        self.workdir = Path(workdir)
+        self.timeout = timeout or None
+        self.on_line = on_line
+        self.address = address
+
+        self.status     = "pending"
+        self.returncode = None
+        self.error      = None
+        self.failure    = None
+        self.elapsed    = 0.0
+        self.cached     = False
+        self._client    = None
+        self._cancelled = threading.Event()
+
+    @property
+    def log_file(self):
+        return self.workdir/"profoil.log"
+
+    @property
+    def succeeded(self):
+        return self.status == "finished"
+
+    def run(self):
+        t_start = time.perf_counter()
+        self.status = "running"
+        try:
+            self._client = ProfoilClient(self.address, timeout=5)
+        except OSError as e:
+            self.status = "error"
+            self.error  = "PROFOIL server not reachable at {}\n{}".format(self.address, e)
+            return self.status
+        try:
+            if self._cancelled.is_set():
+                self.status = "cancelled"
+                return self.status
+            result = self._client.run(self.workdir.joinpath("profoil.in").read_text(), self.timeout, self.on_line)
+            for name in CACHED_FILES:
+                if (self.workdir/name).is_file(): os.unlink(self.workdir/name)
+            for name, text in result.get("files", {}).items():
+                with open(self.workdir/name, "w", newline="") as f:
+                    f.write(text)
+            self.status  = result["status"]
+            self.error   = result.get("error")
+            self.failure = result.get("failure")
+            self.cached  = result.get("cached", False)
+        except (OSError, ValueError) as e:
+            self.status = "error"
+            self.error  = "PROFOIL server connection lost\n{}".format(e)
+        finally:
+            self._client.close()
+            self.elapsed = time.perf_counter() - t_start
+        return self.status
+
+    def cancel(self):
+        self._cancelled.set()
+        if self._client is not None:
+            try:
+                self._client.cancel()
+            except OSError:
+                pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shares one bounded pool of PROFOIL workers between UI instances and scripts.")
+    parser.add_argument("--address", default=PROFOIL_SERVER_ADDRESS, help="Unix socket path or 127.0.0.1:<port>")
+    parser.add_argument("-j", "--workers", type=int, default=PROFOIL_SERVER_WORKERS, help="number of concurrent runs (default: all cores)")
+    parser.add_argument("-t", "--timeout", type=float, default=PROFOIL_TIMEOUT, help="wall-clock limit per run in seconds, 0 disables")
+    parser.add_argument("--profoil", default=EXEC_ABS_PATH, help="PROFOIL executable (default: the one in BIN_DIR)")
+    parser.add_argument("--status", action="store_true", help="print the status of a running server and exit")
+    args = parser.parse_args(argv)
+
+    if args.status:
+        with ProfoilClient(args.address, timeout=5) as client:
+            print(json.dumps(client.status(), indent=2))
+        return 0
+
+    server = ProfoilServer(args.address, args.workers, args.timeout, [str(Path(args.profoil).resolve())])
+    print("PROFOIL server on {} with {} workers (Ctrl+C to stop)".format(server.address, server.workers))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
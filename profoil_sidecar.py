@@ -0,0 +1,154 @@
+# Copyright (c) 2022 Kanishka Jayawardane [kanishkagj@yahoo.com]
+# Copyright (c) 2022 Michael Selig
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Sidecar of the parsed PROFOIL outputs.
+# Once the text outputs of a run have been parsed, the arrays are written next to them, so that
+# looking at the same run again (re-opening the airfoil, restoring it from the result cache) maps
+# the arrays straight from the files instead of parsing the text again.
+
+# +--------------------------------+----------------------------------------------------------+
+# | File                           | Content                                                  |
+# +--------------------------------+----------------------------------------------------------+
+# | profoil.arrays.<name>.npy      | one array, plain np.save format                          |
+# | profoil.arrays.json            | header, written last                                     |
+# |                                |   "sources": {name: {"size", "mtime_ns", "sha256"}}      |
+# |                                |   "arrays" : {name: {"dtype", "shape"}}                  |
+# |                                |   "values" : {name: plain JSON values (ints, short lists)}|
+# +--------------------------------+----------------------------------------------------------+
+
+# The sidecar is valid as long as its source files are unchanged. Size and mtime are checked first;
+# when only the mtime differs (files copied back from the cache for ex:) the sha256 decides.
+# Every file is replaced atomically and the header goes last (after the old one has been removed),
+# so a header never describes array files written for other sources.
+# Arrays are memory mapped read-only (np.load(mmap_mode="r"), zero copy) except on Windows, where
+# a mapped file could not be replaced by the next run, so they are read into memory there.
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+SIDECAR_NAME   = "profoil.arrays.json"
+SIDECAR_PREFIX = "profoil.arrays."
+USE_MMAP = os.name != "nt"
+
+def file_sha256(filename, chunk_size=1<<20):
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def describe_source(filename):
+    stat = os.stat(filename)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": file_sha256(filename)}
+
+def is_source_unchanged(filename, description):
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return False
+    if stat.st_size != description["size"]:
+        return False
+    if stat.st_mtime_ns == description["mtime_ns"]:
+        return True
+    return file_sha256(filename) == description["sha256"]
+
+def array_file(filename, name):
+    """
+    File of the array name next to the sidecar header filename
+    """
+    return Path(filename).with_name(SIDECAR_PREFIX + name + ".npy")
+
+def is_sidecar_file(name):
+    return name.startswith(SIDECAR_PREFIX)
+
+def sidecar_files(filename):
+    """
+    The array files listed in the sidecar header followed by the header itself (the order they
+    have to be copied in), or an empty list when there is no readable header.
+    """
+    filename = Path(filename)
+    try:
+        with open(filename, "rb") as f:
+            names = list(json.load(f)["arrays"])
+    except (OSError, ValueError, KeyError):
+        return []
+    return [array_file(filename, name) for name in names] + [filename]
+
+def replace_file(filename, write):
+    """
+    Calls write(f) on a temporary file which then replaces filename
+    """
+    fd, tmp_name = tempfile.mkstemp(prefix=".sidecar_", dir=filename.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_name, filename)
+    except BaseException:
+        if os.path.exists(tmp_name): os.unlink(tmp_name)
+        raise
+
+def write_sidecar(filename, sources, arrays, values=None):
+    """
+    Writes the arrays (dict of name -> numpy array) and the small plain values into the sidecar.
+    sources are the files the arrays have been parsed from.
+    Returns False if the sidecar could not be written, which only costs a text parse later on.
+    """
+    filename = Path(filename)
+    arrays = {name: np.asarray(a) for name, a in arrays.items()}
+    header = {"sources": {Path(s).name: describe_source(s) for s in sources},
+              "values" : values or {},
+              "arrays" : {name: {"dtype": a.dtype.str, "shape": list(a.shape)} for name, a in arrays.items()}}
+    try:
+        if filename.is_file(): filename.unlink()
+        for name, a in arrays.items():
+            replace_file(array_file(filename, name), lambda f: np.save(f, a, allow_pickle=False))
+        replace_file(filename, lambda f: f.write(json.dumps(header).encode()))
+        return True
+    except OSError:
+        return False
+
+def read_sidecar(filename, sources):
+    """
+    Returns (arrays, values) from the sidecar if it is valid for the given source files, otherwise None.
+    Arrays are read-only memory maps of the .npy files.
+    """
+    filename = Path(filename)
+    try:
+        with open(filename, "rb") as f:
+            header = json.load(f)
+        descriptions = header["sources"]
+        if set(descriptions) != {Path(s).name for s in sources}: return None
+        if not all(is_source_unchanged(s, descriptions[Path(s).name]) for s in sources): return None
+
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            a = np.load(str(array_file(filename, name)), mmap_mode="r" if USE_MMAP else None, allow_pickle=False)
+            if a.dtype.str != spec["dtype"] or list(a.shape) != spec["shape"]: return None
+            a.flags.writeable = False
+            arrays[name] = a.view(np.ndarray)
+    except (OSError, ValueError, KeyError):
+        return None
+    return arrays, header["values"]
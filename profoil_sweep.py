@@ -0,0 +1,245 @@
+# Copyright (c) 2022 Kanishka Jayawardane [kanishkagj@yahoo.com]
+# Copyright (c) 2022 Michael Selig
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Parametric sweeps over the alpha* distribution and the design angles of attack.
+# A sweep takes a base .in file and generates one input per combination of
+
+#   alpha* offset  x  ALFASP list
+
+# where the offset is added to the alpha* of the chosen FOIL segments of one surface.
+# With per_segment=True each segment is offset on its own, giving
+#   segment  x  alpha* offset  x  ALFASP list
+# variants instead. Inputs are generated by patching an InputDocument of the base file
+# just like the GUI does on each save, and run in parallel on a process pool, each worker in its own warm worker slot.
+
+# Results are gathered into a single columnar SweepResult.
+
+# +------------------+------------------------------+------------------------------------+
+# | Column           | Shape                        | Content                            |
+# +------------------+------------------------------+------------------------------------+
+# | segment          | (n_variants,)                | offset segment, 0 when all at once |
+# | offset           | (n_variants,)                | alpha* offset                      |
+# | alfasp           | (n_variants, max_alphas)     | design alphas, nan padded          |
+# | converged        | (n_variants,)                | bool                               |
+# | x, y             | (n_variants, max_points)     | airfoil coordinates, nan padded    |
+# | phi, v_vinf      | (n_variants, max_alphas,     | velocity distributions per alpha   |
+# |                  |  max_vel_points)             | nan padded                         |
+# | stats/<name>     | (n_variants,)                | STATISTICS fields, nan if missing  |
+# | timing/<name>    | (n_variants,)                | per-job timings, see profoil_pool  |
+# +------------------+------------------------------+------------------------------------+
+
+# Usage (from the ui folder):
+#   python profoil_sweep.py ../runs/examples/example1.in --segments 3-7 --offsets=-1:1:0.25 \
+#                           --alfasp 2,6,10 --alfasp 4,8 -o ../sweep/example1.npz
+
+import argparse
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from preferences import PROFOIL_TIMEOUT
+import profoil_interface as p_intf
+from profoil_interface import EXEC_ABS_PATH
+from profoil_pool import process_slot, TIMINGS
+
+class Sweep:
+
+    def __init__(self, base_in_file, segments, offsets, alfasp_lists=None, surface="Upper", per_segment=False):
+        """
+        base_in_file : profoil.in file the variants are derived from
+        segments     : FOIL segment numbers counted from the start of the given surface (1 based)
+        offsets      : alpha* offsets in degrees
+        alfasp_lists : list of ALFASP lists, None keeps the ALFASP block of the base file
+        surface      : "Upper" or "Lower"
+        per_segment  : offset each segment on its own instead of all of them at once
+        """
+        self.base_in_file = Path(base_in_file)
+        self.document = p_intf.InputDocument.from_file(self.base_in_file)
+        self.nu, self.alfa, self.ile, _ = p_intf.extract_dmp(self.base_in_file)
+
+        first = 0 if surface == "Upper" else self.ile
+        last  = self.ile if surface == "Upper" else len(self.nu)
+        self.foil_indices = [first + s - 1 for s in segments]
+        if not all(first <= i < last for i in self.foil_indices):
+            raise ValueError("Segments {} are not on the {} surface".format(list(segments), surface))
+
+        self.segments     = list(segments)
+        self.offsets      = list(offsets)
+        self.alfasp_lists = alfasp_lists or [None]
+        self.per_segment  = per_segment
+
+    def variants(self):
+        """
+        yields (segment, offset, alfasp, profoil.in text) for every point of the sweep.
+        segment is 0 when all the segments are offset together.
+        """
+        groups = [(s, [i]) for s, i in zip(self.segments, self.foil_indices)] if self.per_segment \
+                 else [(0, self.foil_indices)]
+
+        for (segment, indices), offset, alfasp in itertools.product(groups, self.offsets, self.alfasp_lists):
+            alfa = self.alfa.copy()
+            alfa[indices] += offset
+            document = self.document.copy()
+            document.set_foils(self.nu, alfa, self.ile)
+            if alfasp is not None:
+                document.set_alphas(alfasp)
+            yield segment, offset, alfasp, document.text
+
+    def run(self, jobs=None, timeout=PROFOIL_TIMEOUT, command=None):
+        """
+        Runs all the variants in parallel and returns a SweepResult.
+        """
+        variants = list(self.variants())
+        t_start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+            outputs = list(pool.map(run_variant, [text for *_, text in variants],
+                                    itertools.repeat(timeout), itertools.repeat(command)))
+        return SweepResult(variants, outputs, time.perf_counter() - t_start)
+
+def run_variant(text, timeout=PROFOIL_TIMEOUT, command=None):
+    """
+    Runs one profoil.in text in the worker slot of the process and returns the parsed raw outputs.
+    Executed in the worker processes.
+    """
+    output = {"status": None, "converged": False, "stats": {}, "error": None}
+    slot = process_slot()
+    ctx  = slot.ctx
+    with slot.job():
+        process = slot.run(text, timeout=timeout, command=command)
+        output["status"] = process.status
+        output["error"]  = process.error
+        if process.succeeded and ctx.is_design_converged():
+            output["converged"] = True
+            output["stats"] = ctx.extract_stats()
+            output["x"], output["y"] = p_intf.extract_xy(ctx.xy_file)
+            blocks = [(phi.copy(), v_vinf.copy()) for phi, v_vinf in ctx.iter_vel_blocks()]
+            output["phi_list"] = [phi for phi, _ in blocks]
+            output["vel_list"] = [v_vinf for _, v_vinf in blocks]
+    output["timing"] = slot.last_job
+    return output
+
+def pad_stack(arrays, shape=None):
+    """
+    Stacks arrays of different lengths (or shapes) into one nan padded array.
+    """
+    if shape is None:
+        shape = tuple(np.max([np.shape(a) for a in arrays], axis=0)) if arrays else (0,)
+    stacked = np.full((len(arrays),) + tuple(shape), np.nan)
+    for row, a in zip(stacked, arrays):
+        a = np.asarray(a, dtype=float)
+        row[tuple(slice(0, n) for n in a.shape)] = a
+    return stacked
+
+class SweepResult:
+
+    def __init__(self, variants, outputs, elapsed):
+        self.elapsed = elapsed
+        self.texts   = [text for *_, text in variants]
+        self.status  = np.array([o["status"] for o in outputs])
+        self.errors  = np.array([o.get("error") or "" for o in outputs])
+
+        self.columns = {
+            "segment"   : np.array([segment for segment, *_ in variants]),
+            "offset"    : np.array([offset for _, offset, *_ in variants], dtype=float),
+            "alfasp"    : pad_stack([alfasp or [] for _, _, alfasp, _ in variants]),
+            "converged" : np.array([o["converged"] for o in outputs]),
+            "x"         : pad_stack([o.get("x", []) for o in outputs]),
+            "y"         : pad_stack([o.get("y", []) for o in outputs]),
+        }
+
+        # velocity distributions are ragged in two directions (alphas and points per alpha)
+        n_alphas = max([len(o.get("phi_list", [])) for o in outputs] + [0])
+        n_points = max([len(phi) for o in outputs for phi in o.get("phi_list", [])] + [0])
+        self.columns["phi"]    = pad_stack([pad_stack(o.get("phi_list", []), (n_points,)) for o in outputs], (n_alphas, n_points))
+        self.columns["v_vinf"] = pad_stack([pad_stack(o.get("vel_list", []), (n_points,)) for o in outputs], (n_alphas, n_points))
+
+        stat_names = list(dict.fromkeys(name for o in outputs for name in o["stats"]))
+        for name in stat_names:
+            self.columns["stats/"+name] = np.array([o["stats"].get(name, np.nan) for o in outputs])
+        for name in TIMINGS:
+            self.columns["timing/"+name] = np.array([o.get("timing", {}).get(name, np.nan) for o in outputs])
+
+    def __len__(self):
+        return len(self.status)
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def save(self, filename):
+        """
+        Saves all the columns (and the generated inputs) into a single .npz file
+        """
+        Path(filename).parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(filename, status=self.status, errors=self.errors, inputs=np.array(self.texts), **self.columns)
+
+def parse_range(text):
+    """
+    "3-7" -> [3, 4, 5, 6, 7]
+    "3,5,7" -> [3, 5, 7]
+    """
+    if "-" in text:
+        first, last = text.split("-")
+        return list(range(int(first), int(last)+1))
+    return [int(i) for i in text.split(",")]
+
+def parse_offsets(text):
+    """
+    "-1:1:0.25" -> [-1, -0.75, ... 1]
+    "-1,0,1"    -> [-1, 0, 1]
+    """
+    if ":" in text:
+        start, stop, step = [float(i) for i in text.split(":")]
+        return np.round(np.arange(start, stop + step/2, step), 10).tolist()
+    return [float(i) for i in text.split(",")]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweeps alpha* offsets of FOIL segments and ALFASP lists.")
+    parser.add_argument("in_file", help="base .in file")
+    parser.add_argument("-s", "--segments", required=True, type=parse_range, help="segments of the surface, ex: 3-7 or 3,5,7")
+    parser.add_argument("--offsets", required=True, type=parse_offsets, help="alpha* offsets, ex: --offsets=-1:1:0.25 or --offsets=-1,0,1")
+    parser.add_argument("--alfasp", action="append", type=lambda t: [float(a) for a in t.split(",")],
+                        help="comma separated ALFASP list, can be repeated (default: ALFASP of the base file)")
+    parser.add_argument("--surface", default="Upper", choices=["Upper", "Lower"])
+    parser.add_argument("--per-segment", action="store_true", help="offset each segment on its own")
+    parser.add_argument("-o", "--out-file", default="../sweep/sweep.npz", help="result file (default: ../sweep/sweep.npz)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of worker processes (default: all cores)")
+    parser.add_argument("-t", "--timeout", type=float, default=PROFOIL_TIMEOUT, help="wall-clock limit per run in seconds, 0 disables")
+    parser.add_argument("--profoil", default=EXEC_ABS_PATH, help="PROFOIL executable (default: the one in BIN_DIR)")
+    args = parser.parse_args(argv)
+
+    sweep = Sweep(args.in_file, args.segments, args.offsets, args.alfasp, args.surface, args.per_segment)
+    result = sweep.run(args.jobs, args.timeout, [str(Path(args.profoil).resolve())])
+    result.save(args.out_file)
+
+    print("{} variants, {} converged in {:.2f} s ({:.2f} runs/sec)".format(
+          len(result), result["converged"].sum(), result.elapsed, len(result)/result.elapsed))
+    print("mean per-job overhead {:.2f} ms (PROFOIL itself {:.2f} ms)".format(
+          1e3*np.nanmean(result["timing/overhead"]), 1e3*np.nanmean(result["timing/profoil"])))
+    print("Results written to {}".format(Path(args.out_file).resolve()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -38,7 +38,19 @@ from annotate import annotate_text
 
 import profoil_interface as p_intf
 from profoil_interface import WORKDIR, BINDIR
+from profoil_runner import ProfoilProcess, TERMINATED
+from profoil_cache import ResultCache
+from profoil_pool import WorkerPool
+from profoil_revisions import RevisionStore
+from profoil_history import HistoryDB
+from history_browser import HistoryBrowser
+from profoil_server import RemoteProcess
+from run_thread import ProfoilRunThread
 from pathlib import Path
+import shutil
+import sqlite3
+import os
+import datetime
 
 from scipy.interpolate import interp1d
 import numpy as np
@@ -65,6 +77,44 @@ class ProfoilUI(DragDropWindow, Ui_MainWindow, ProfoilCanvas):
         # this will be changed upon opening a file if KEEP_LAST_OPEN_PATH_AS_DEFAULT is set
         self.default_open_dir = '../runs'
 
+        # PROFOIL runs on a background thread, this holds the active ProfoilRunThread
+        # and is reset back to None once the run is finished.
+        self.run_thread = None
+        self.on_run_finished = None
+
+        # all the files of the interactive session live in the WORKDIR
+        self.run_ctx = p_intf.RunContext(WORKDIR)
+
+        # outputs of previous runs keyed on profoil.in, re-running the same input restores them instead.
+        # run_input holds the profoil.in text of the active run to store the outputs under.
+        self.run_result   = None
+        self.result_cache = ResultCache()
+        # speculative runs are solved in the scratch slots of the pool, interactive runs in the WORKDIR
+        # (PROFOIL may read other files there). One extra slot for a cancelled background run
+        # which has not finished winding down yet.
+        self.worker_pool  = WorkerPool(size=(WORKER_POOL_SIZE or os.cpu_count()) + 1)
+        self.run_input = None
+
+        # every profoil.in version of the session (Undo/Revert history), see profoil_revisions.py.
+        # run_revision is the revision of the active or the last run.
+        self.revisions    = RevisionStore()
+        self.run_revision = None
+
+        # every run is recorded in the design history database (HISTORY_DB), see profoil_history.py
+        self.history         = HistoryDB() if HISTORY_DB else None
+        self.history_browser = None
+
+        # background run of the latest edits (SPECULATIVE_RUNS), ProfoilRunThread or None
+        self.speculative_run = None
+
+        # log lines of the active run are gathered here and flushed into the File View
+        # and the residual plot every LIVE_LOG_REFRESH_MS, instead of on every single line.
+        self.live_log_lines = []
+        self.live_residuals = ([], [])
+        self.live_log_timer = QtCore.QTimer(self)
+        self.live_log_timer.setInterval(LIVE_LOG_REFRESH_MS)
+        self.live_log_timer.timeout.connect(self.flush_live_log)
+
 #========================================== EVENT TRIGGERS ==========================================
     def connect_widget_events(self):
         """
@@ -123,6 +173,11 @@ class ProfoilUI(DragDropWindow, Ui_MainWindow, ProfoilCanvas):
         self.revert_shortcut = QShortcut(QKeySequence(SHORTCUT_REVERT), self)
         self.revert_shortcut.activated.connect(self.activate_revert)
 
+        # ================================== CANCEL RUN ==================================
+        # --> KEYBOARD SHORTCUT : Kills a running PROFOIL
+        self.cancel_run_shortcut = QShortcut(QKeySequence(SHORTCUT_CANCEL_RUN), self)
+        self.cancel_run_shortcut.activated.connect(self.cancel_profoil_run)
+
         # ============================= [MENU] FILE -> OPEN ==============================
         # -->  MENU ACTION
         self.actionOpen.triggered.connect(self.menu_file_open)
@@ -164,6 +219,15 @@ class ProfoilUI(DragDropWindow, Ui_MainWindow, ProfoilCanvas):
         # --> SHORTCUT BUTTON : New connections for the "Clear Overlay"
         self.btn_overlay_clear.clicked.connect(self.clear_overlay)
 
+        # ============================ [MENU] FILE -> RUN HISTORY ============================
+        # -->  MENU ACTION : not part of GUI.ui, the action is added to the File menu here
+        self.actionRun_History = QtWidgets.QAction("Run History", self)
+        self.menuFile.addAction(self.actionRun_History)
+        self.actionRun_History.triggered.connect(self.menu_run_history)
+        # --> KEYBOARD SHORTCUT
+        self.run_history_shortcut = QShortcut(QKeySequence(SHORTCUT_RUN_HISTORY), self)
+        self.run_history_shortcut.activated.connect(self.menu_run_history)
+
         # ====================== [MENU] ABOUT -> PROFOIL/PROFOIL_UI ======================
         # -->  MENU ACTION
         self.actionPROFOIL.triggered.connect(self.menu_about_profoil)
@@ -273,6 +337,14 @@ class ProfoilUI(DragDropWindow, Ui_MainWindow, ProfoilCanvas):
         """ pops a Message box with convergence failure warning, without beep """
         self.message_box_without_beep(title="Error...", text="Design Failed - Please check the .in File")
 
+    def terminated_error_dialog(self, reason):
+        """ pops a Message box when the watchdog terminated the run, without beep """
+        self.message_box_without_beep(title="Error...", text="PROFOIL run terminated - {}".format(reason))
+
+    def exec_error_dialog(self, error):
+        """ pops a Message box when PROFOIL could not be started, without beep """
+        self.message_box_without_beep(title="Error...", text="PROFOIL could not be started\n{}".format(error))
+
     def overlay_error_dialog(self):
         """ pops a Message box with file loading error, without beep """
         self.message_box_without_beep(title="File loading Error...", text="Please check the .dat File")
@@ -302,6 +374,7 @@ class ProfoilUI(DragDropWindow, Ui_MainWindow, ProfoilCanvas):
         """
         opens profoil.in file, if a session is current, warning will be shown.
         """
+        if self.run_in_progress(): return
         if self.ready_to_interact:
             if self.loading_warning_dialog() != QMessageBox.Yes:
                 return
@@ -351,8 +424,10 @@ class ProfoilUI(DragDropWindow, Ui_MainWindow, ProfoilCanvas):
         """
         saves the profoil.in file view, in to the profoil.in file.
         """
-        p_intf.gen_buffer()
-        p_intf.save2profoil_in(self.plainTextEdit_profoil_in.toPlainText())
+        text = self.plainTextEdit_profoil_in.toPlainText()
+        self.run_ctx.save_input(text)
+        self.revisions.commit(text)
+        self.start_speculative_run()
 
         # upon saving change the save button color back to black
         self.btn_save_profoil_in.setStyleSheet('QPushButton {color: black; font-style: normal;}')
@@ -382,40 +457,51 @@ class ProfoilUI(DragDropWindow, Ui_MainWindow, ProfoilCanvas):
         self.cursor_edit_line_points = self.cursor_edit_line.get_xydata().tolist()
         self.set_edit_mode_off()
         self.canvas.setCursor(QtCore.Qt.ArrowCursor)  # Reset to default cursor on the canvas
-        self.gui_fig.canvas.draw()
+        self.request_render()
 
     def apply_edits(self, event=None):
         """
         Cursor edits are applied to the green line from the red line
         """
-        self.reset_toolbar()
-        # Better protection than if self.cursor_edit_line_points because one point cannot make spline 
-        if len(self.cursor_edit_line_points)>1: 
-            self.set_edit_mode_off()
-            x_data, y_data = self.nu_alfa.get_data()
-            spline = interp1d(*np.array(self.cursor_edit_line_points).T, 
-                               kind='linear', 
-                               bounds_error=False)
-            new_y = spline(x_data)
-            self.nu_alfa.set_ydata(np.where(np.isnan(new_y), y_data, new_y))
-        self.save_edits_to_file()
-        self.cancel_cursor_inputs()
-        self.canvas.setCursor(QtCore.Qt.ArrowCursor) # Reset to default cursor on the canvas
+        with self.batch_render("Apply edits"):
+            self.reset_toolbar()
+            # Better protection than if self.cursor_edit_line_points because one point cannot make spline 
+            if len(self.cursor_edit_line_points)>1: 
+                self.set_edit_mode_off()
+                x_data, y_data = self.nu_alfa.get_data()
+                spline = interp1d(*np.array(self.cursor_edit_line_points).T, 
+                                   kind='linear', 
+                                   bounds_error=False)
+                new_y = spline(x_data)
+                self.nu_alfa.set_ydata(np.where(np.isnan(new_y), y_data, new_y))
+            self.save_edits_to_file()
+            self.cancel_cursor_inputs()
+            self.canvas.setCursor(QtCore.Qt.ArrowCursor) # Reset to default cursor on the canvas
 
     def undo_edits(self, event=None):
         """
-        This callback function resets the modifiable phi-alpha* distribution
-        back to the current converged data from the most recent run. 
-        Typically used when the line edits
-        has to be reverted.
+        This callback function steps the profoil.in back to the revision it was derived from
+        and resets the modifiable phi-alpha* distribution to it.
+        Right after applying edits, this is the data of the most recent run;
+        pressing it again keeps going back through the edits applied since that run.
+        Undo stops at the input of the most recent run, going back further is Revert's job.
         """
-        self.reset_toolbar()
-        if not self.ready_to_interact: return
-        self.cancel_cursor_inputs()
-        self.upper_nu_alfa_modi.set_data(*self.upper_nu_alfa_prescribed.get_data())
-        self.lower_nu_alfa_modi.set_data(*self.lower_nu_alfa_prescribed.get_data())
-        self.save_edits_to_file()
-        self.gui_fig.canvas.draw()
+        with self.batch_render("Undo"):
+            self.reset_toolbar()
+            if not self.ready_to_interact: return
+            self.cancel_cursor_inputs()
+            if self.revisions.head is None: return
+            if self.revisions.head == self.run_revision:
+                self.statusbar.showMessage("Nothing to undo since the last run (Revert goes back to the previous run)")
+                return
+            parent = self.revisions.parent(self.revisions.head)
+            if parent is None: return
+            text = self.revisions.checkout(parent)
+            self.run_ctx.save_input(text)
+            nu, alfa, ile, phis = p_intf.parse_dmp_text(text)
+            self.set_modi_lines(nu, alfa, ile)
+            self.start_speculative_run()
+            self.request_render()
 
     def plot_from_file(self, event=None):
         """
@@ -423,8 +509,14 @@ class ProfoilUI(DragDropWindow, Ui_MainWindow, ProfoilCanvas):
         This action confirms any manual modifications if applicable
         """
         self.reset_toolbar()
-        nu, alfa, ile, phis = p_intf.extract_dmp(WORKDIR/"profoil.in")
+        nu, alfa, ile, phis = self.run_ctx.extract_dmp()
+        self.set_modi_lines(nu, alfa, ile)
+        self.request_render()
 
+    def set_modi_lines(self, nu, alfa, ile):
+        """
+        Sets the green (modifiable) lines of both surfaces from the FOIL lines
+        """
         nu_upper = nu[:ile]
         alfa_upper = alfa[:ile]
 
@@ -433,39 +525,52 @@ class ProfoilUI(DragDropWindow, Ui_MainWindow, ProfoilCanvas):
 
         self.upper_nu_alfa_modi.set_data(nu_upper,alfa_upper)
         self.lower_nu_alfa_modi.set_data(nu_lower,alfa_lower)
-        self.gui_fig.canvas.draw()
 
     def run_profoil(self, event=None):
         """
         Executes PROFOIL with the following steps.
         1. Backup the previous line.    # For reloading as required
         2. Resets the cursor edit line. # Because after the run cursor edit line should not be there.
-        3. Creates buffer.in from the existing profoil.in file.
+        3. Records the existing profoil.in as a new revision for Undo and Revert.
         4. Creates a new profoil.in file by replacing the FOIL lines with the data in the graph.
         5. Prints out the profoil.log file.
+        PROFOIL runs in the background, plots are updated once it is finished.
         """
-        if not self.ready_to_interact: return
-        self.reset_toolbar()
-        self.set_edit_mode_off()
-        self.bkp_previous_line()
-        self.cancel_cursor_inputs()
-        self.run_from_profoil_in()
-        self.gui_fig.canvas.draw()
+        with self.batch_render("Run"):
+            if not self.ready_to_interact: return
+            if self.run_in_progress(): return
+            self.reset_toolbar()
+            self.set_edit_mode_off()
+            self.bkp_previous_line()
+            self.cancel_cursor_inputs()
+            self.run_from_profoil_in()
 
     def revert(self, event=None):
         """
         This callback function loads the converged data from the previous run
         typically used when something goes wrong with the current run.
-        Equivalent to loading buffer.in instead of profoil.in in the work dir.
+        Pressing it again keeps going back through the converged runs of the session.
+        The profoil.in of that run is taken from the revision store and its outputs from the result cache.
         """
-        self.reset_toolbar()
-        if not self.ready_to_interact: return
-        if not self.upper_nu_alfa_previous.get_data()[0]: return
-        self.set_edit_mode_off()
-        self.cancel_cursor_inputs()
-        p_intf.swap_buffer()
-        self.run_profoil()
-        self.gui_fig.canvas.draw()
+        with self.batch_render("Revert"):
+            self.reset_toolbar()
+            if not self.ready_to_interact: return
+            if self.run_in_progress(): return
+            if self.run_revision is None: return
+            target = self.revisions.last_converged(self.run_revision)
+            if target is None: return
+            self.set_edit_mode_off()
+            self.cancel_cursor_inputs()
+            self.run_ctx.save_input(self.revisions.checkout(target))
+            self.run_profoil()
+
+    def cancel_profoil_run(self):
+        """
+        Kills the running PROFOIL if any. The plots are left as they were
+        and the partial profoil.log is shown in the File View.
+        """
+        if self.run_in_progress():
+            self.run_thread.cancel()
 
 #================================== CALLBACK FUNCTIONS [SHORTCUTS] ==================================
     def save_on_shortcut(self):
@@ -515,8 +620,9 @@ class ProfoilUI(DragDropWindow, Ui_MainWindow, ProfoilCanvas):
         nu_lower, alfa_lower = self.lower_nu_alfa_modi.get_data()
         nu_list = list(nu_upper) + list(nu_lower)
         alfa_list = list(alfa_upper) + list(alfa_lower)
-        p_intf.gen_buffer()
-        p_intf.gen_input_file(nu_list, alfa_list, len(nu_upper))
+        self.run_ctx.gen_input_file(nu_list, alfa_list, len(nu_upper))
+        self.revisions.commit(self.run_ctx.input_document.text)
+        self.start_speculative_run()
 
     def save_airfoil(self, out_file):
         """
@@ -526,7 +632,7 @@ class ProfoilUI(DragDropWindow, Ui_MainWindow, ProfoilCanvas):
         file_path = Path(out_file)
         file_path.parent.mkdir(parents=True, exist_ok=True)
         with file_path.open("w") as f:
-            f.write(Path(WORKDIR/"profoil.in").open().read())
+            f.write(self.run_ctx.in_file.open().read())
 
     def save_as_dat(self, header, out_file):
         """
@@ -536,7 +642,7 @@ class ProfoilUI(DragDropWindow, Ui_MainWindow, ProfoilCanvas):
         file_path = Path(out_file)
         file_path.parent.mkdir(parents=True, exist_ok=True)
         with file_path.open("w") as f:
-            f.write(f"{header}\n"+Path(WORKDIR/"profoil.xy").open().read())
+            f.write(f"{header}\n"+self.run_ctx.xy_file.open().read())
 
     def on_profoil_in_text_changed(self):
         """
@@ -570,6 +676,21 @@ class ProfoilUI(DragDropWindow, Ui_MainWindow, ProfoilCanvas):
         else:
             self.radio_upper_surface.setChecked(True)  
 
+    def closeEvent(self, event):
+        """
+        Makes sure a running PROFOIL does not outlive the window
+        """
+        if self.run_in_progress():
+            self.run_thread.cancel()
+            self.run_thread.wait()
+        if self.speculative_run is not None:
+            self.speculative_run.cancel()
+            self.speculative_run.wait()
+        self.worker_pool.close()
+        if self.history is not None:
+            self.history.close()
+        super().closeEvent(event)
+
 #======================================== UTILITY FUNCTIONS =========================================
     def load_canvas(self):
         """
@@ -581,6 +702,23 @@ class ProfoilUI(DragDropWindow, Ui_MainWindow, ProfoilCanvas):
         self.tool_bar = self.gen_toolbar()
         self.verticalLayout_canvas.addWidget(self.tool_bar)
 
+        # residual plot goes under the summary, just above the spacer at the bottom of the side panel
+        self.res_canvas = FigureCanvas(self.res_fig)
+        self.res_canvas.setMinimumHeight(140)
+        self.verticalLayout.insertWidget(self.verticalLayout.count()-1, self.res_canvas)
+
+        # full draws of the last action, on the right of the status bar
+        if SHOW_RENDER_COUNTS:
+            self.lbl_render_count = QtWidgets.QLabel()
+            self.statusbar.addPermanentWidget(self.lbl_render_count)
+            self.render_scheduler.on_action = self.show_render_count
+
+    def show_render_count(self, action, draws):
+        """
+        Shows how many times the figure was drawn for the last action (1 is expected)
+        """
+        self.lbl_render_count.setText("{}: {} full draw(s)".format(action, draws))
+
     def gen_toolbar(self):
         """
         creates a custom tool bar without unnecessary buttons to minimize confusion
@@ -599,74 +737,334 @@ class ProfoilUI(DragDropWindow, Ui_MainWindow, ProfoilCanvas):
         2. copies *.in file in to WORKDIR as profoil.in
         3. Runs PROFOIL
         """
-        self.ready_to_interact = True
-        if not KEEP_OLD_AIRFOIL_UPON_LOADING:
-            self.setup_axes_limits()
-            self.clear_axes()
+        with self.batch_render("Load"):
+            self.ready_to_interact = True
+            if not KEEP_OLD_AIRFOIL_UPON_LOADING:
+                self.setup_axes_limits()
+                self.clear_axes()
 
-        p_intf.save2profoil_in(Path(in_file).open().read())
-        self.run_from_profoil_in()
+            self.run_ctx.save_input(Path(in_file).open().read())
+            self.run_from_profoil_in(on_finished=self.reselect_surface)
 
-        # Keep the current state of the surface selection
+    def reselect_surface(self):
+        """
+        Keeps the current state of the surface selection
+        """
         if self.radio_upper_surface.isChecked():
             self.select_surface("Upper")
         else:
             self.select_surface("Lower")
 
-        self.gui_fig.canvas.draw()
+    def run_in_progress(self):
+        return self.run_thread is not None
 
-    def run_from_profoil_in(self):
+    def run_from_profoil_in(self, on_finished=None):
         """
-        Executes PROFOIL when the profoil.in file is ready in the WORKDIR
+        Starts PROFOIL in the background when the profoil.in file is ready in the WORKDIR.
+        The UI is updated by on_profoil_finished(...) once PROFOIL is done,
+        on_finished is called after that for any follow-up work of the caller.
+        If the same profoil.in has been run before, the outputs are restored from the cache
+        and the UI is updated straight away without running PROFOIL.
         """
-        # execute profoil
-        p_intf.exec_profoil()
+        if self.run_in_progress(): return
+        self.on_run_finished = on_finished
+        self.run_input = self.run_ctx.in_file.read_text()
+        self.run_revision = self.revisions.commit(self.run_input)
+
+        if self.speculative_run is not None:
+            if self.speculative_run.input == self.run_input:
+                # the same input is already being solved in the background, wait for it instead.
+                self.run_thread, self.speculative_run = self.speculative_run, None
+                self.btn_run_profoil.setEnabled(False)
+                self.statusbar.showMessage("Running PROFOIL ... ({} to cancel)".format(SHORTCUT_CANCEL_RUN))
+                self.start_live_log()
+                return
+            self.cancel_speculative_run()
 
-        # profoil run may or may not have been successful.
-        # either way, file view has to be updated.
-        # conditional logic follows for the graphics
+        if self.result_cache.restore(self.run_input, self.run_ctx.workdir):
+            self.statusbar.showMessage("PROFOIL outputs restored from cache (hits: {}, misses: {})".format(
+                                       self.result_cache.hits, self.result_cache.misses))
+            self.update_from_run("finished")
+            return
 
-        self.update_file_view()
-        self.update_converged_view()
-        
-        if p_intf.is_design_converged():
-            self.extract_all_profoil_data()
-            self.update_summary_text()
+        self.run_thread = ProfoilRunThread(self.new_process(self.run_ctx.workdir), parent=self)
+        self.run_thread.run_finished.connect(self.on_profoil_finished)
+
+        self.btn_run_profoil.setEnabled(False)
+        self.statusbar.showMessage("Running PROFOIL ... ({} to cancel)".format(SHORTCUT_CANCEL_RUN))
+        self.start_live_log()
+        self.run_thread.start()
+
+    def new_process(self, workdir, command=None):
+        """
+        With USE_PROFOIL_SERVER the run is handed to the shared profoil_server.py,
+        otherwise PROFOIL is started directly. Both run the profoil.in of the workdir.
+        """
+        if USE_PROFOIL_SERVER:
+            return RemoteProcess(workdir, timeout=PROFOIL_TIMEOUT)
+        return ProfoilProcess(workdir, timeout=PROFOIL_TIMEOUT, command=command)
+
+    def start_live_log(self):
+        """
+        Clears the log panel and the residual plot, and follows the log of the active run.
+        A speculative run promoted to the active run replays the lines it logged so far.
+        """
+        self.live_log_lines = []
+        self.live_residuals = ([], [])
+        self.plainTextEdit_profoil_log.clear()
+        self.plot_residuals(*self.live_residuals)
+        for line in self.run_thread.follow_log(self.on_log_line):
+            self.on_log_line(line)
+        self.live_log_timer.start()
+        self.flush_live_log()
+
+    def on_log_line(self, line):
+        """
+        Slot for ProfoilRunThread.log_line
+        """
+        self.live_log_lines.append(line)
+        residual = p_intf.parse_residual(line)
+        if residual:
+            self.live_residuals[0].append(residual[0])
+            self.live_residuals[1].append(residual[1])
+
+    def flush_live_log(self):
+        """
+        Pushes the log lines gathered since the last flush to the File View, status bar and residual plot
+        """
+        if not self.live_log_lines: return
+        self.plainTextEdit_profoil_log.appendPlainText("".join(self.live_log_lines).rstrip("\n"))
+        self.live_log_lines = []
+        if self.live_residuals[0]:
+            self.statusbar.showMessage("Running PROFOIL ... iteration {}, residual {:.3E} ({} to cancel)".format(
+                                       self.live_residuals[0][-1], self.live_residuals[1][-1], SHORTCUT_CANCEL_RUN))
+            self.plot_residuals(*self.live_residuals)
+
+    def stop_live_log(self):
+        self.live_log_timer.stop()
+        self.flush_live_log()
+
+    def on_profoil_finished(self, process):
+        """
+        Slot for ProfoilRunThread.run_finished, runs on the GUI thread.
+        """
+        self.run_thread.wait()
+        self.run_thread = None
+        self.stop_live_log()
+        self.btn_run_profoil.setEnabled(True)
+        self.statusbar.showMessage("PROFOIL {} in {:.2f} s".format(process.status, process.elapsed))
+
+        if process.succeeded:
+            self.result_cache.store(self.run_input, self.run_ctx.workdir)
+        self.update_from_run(process.status, process.error, process.elapsed)
+
+    def update_from_run(self, status, error=None, elapsed=None):
+        """
+        Updates the UI from the outputs in the WORKDIR according to the run status
+        elapsed is the run time of PROFOIL, None for outputs restored from the cache
+        """
+        with self.batch_render("Run finished"):
+            # profoil run may or may not have been successful.
+            # either way, file view has to be updated.
+            # conditional logic follows for the graphics
+
+            if status == "error":
+                self.exec_error_dialog(error)
+            else:
+                self.update_file_view()
+                self.update_converged_view()
+
+            if status in TERMINATED:
+                self.terminated_error_dialog(error)
+            elif status == "finished":
+                if self.run_ctx.is_design_converged():
+                    self.extract_all_profoil_data()
+                    self.result_cache.attach(self.run_input, self.run_ctx.sidecar_file)
+                    self.update_summary_text()
+                    self.plot_ue()
+                    self.plot_xy()
+                    self.plot_nu_alfa()
+                else:
+                    self.failure_error_dialog()
+
+            self.record_run(status, elapsed)
+
+            on_finished, self.on_run_finished = self.on_run_finished, None
+            if on_finished: on_finished()
+
+            self.request_render()
+
+    def record_run(self, status, elapsed=None):
+        """
+        Stores the run in the history database. Outputs restored from the cache (elapsed is None,
+        Revert etc.) are not recorded again when the database already has that run; every actual
+        PROFOIL run is recorded, even of an input that has been run before.
+        """
+        if self.history is None or not (status == "finished" or status in TERMINATED): return
+        try:
+            if elapsed is None and self.history.has_input(self.run_input, status): return
+            log = self.run_ctx.log if self.run_ctx.log_file.is_file() else p_intf.LogModel("")
+            run_result = self.run_result if status == "finished" and log.converged else None
+            self.history.record(self.run_input, log, status, elapsed, run_result)
+        except sqlite3.Error as e:
+            self.statusbar.showMessage("Run could not be recorded in the history database: {}".format(e))
+
+    def menu_run_history(self):
+        """
+        Opens the Run History browser of the history database
+        """
+        if self.history is None:
+            self.message_box_without_beep("Run History", "The run history is disabled (HISTORY_DB in preferences.py).")
+            return
+        if self.history_browser is None:
+            self.history_browser = HistoryBrowser(self.history, self)
+            self.history_browser.plot_requested.connect(self.plot_history_run)
+        else:
+            self.history_browser.refresh()
+        self.history_browser.show()
+        self.history_browser.raise_()
+        self.history_browser.activateWindow()
+
+    def plot_history_run(self, run_id):
+        """
+        Plots a run of the history database from its stored arrays, without running PROFOIL.
+        Its input becomes the profoil.in of the WORKDIR, so that it can be edited and run from there.
+        The output files are restored as well when the result cache still has them; otherwise the
+        outputs of the previous run are removed and profoil.log and profoil.xy (for Save DAT) are
+        written back from the database.
+        """
+        with self.batch_render("Plot history run"):
+            if self.run_in_progress(): return
+            run_result = self.history.load_result(run_id)
+            if run_result is None:
+                self.message_box_without_beep("Run History", "Run #{} did not converge, there is nothing to plot.".format(run_id))
+                return
+            in_text = self.history.load_input(run_id)
+            log = self.history.load_log(run_id)
+
+            self.reset_toolbar()
+            self.ready_to_interact = True
+            self.set_edit_mode_off()
+            self.cancel_cursor_inputs()
+            self.bkp_previous_line()
+
+            self.run_ctx.save_input(in_text)
+            self.run_input    = self.run_ctx.in_file.read_text()
+            self.run_revision = self.revisions.commit(self.run_input)
+            self.revisions.attach(self.run_revision, run_result)
+            self.run_result   = run_result
+            restored = self.result_cache.restore(self.run_input, self.run_ctx.workdir)
+            if restored:
+                self.update_converged_view()
+            else:
+                self.run_ctx.clear_outputs()
+                self.run_ctx.log_file.write_text(log.text)
+                np.savetxt(self.run_ctx.xy_file, np.column_stack((run_result.x, run_result.y)), fmt="%12.7f", delimiter="")
+                self.plainTextEdit_profoil_dmp.setPlainText("")
+                self.plainTextEdit_profoil_xy.setPlainText(p_intf.catfile(self.run_ctx.xy_file, tail=0))
+
+            self.update_file_view()
+            self.plainTextEdit_profoil_log.setPlainText(log.text)
+            self.lbl_summary.setText(log.summary)
             self.plot_ue()
             self.plot_xy()
             self.plot_nu_alfa()
-        else:
-            self.failure_error_dialog()
+
+            created = datetime.datetime.fromtimestamp(self.history.get(run_id).created)
+            self.statusbar.showMessage("Run #{} of {} plotted from the run history{}".format(
+                                       run_id, created.strftime("%Y-%m-%d %H:%M"),
+                                       "" if restored else " (output files are no longer in the result cache)"))
+
+    def start_speculative_run(self):
+        """
+        With SPECULATIVE_RUNS set, solves the freshly written profoil.in in a scratch directory
+        while the user is still looking at the edits. The outputs go into the result cache,
+        so pressing Run with the same input restores them instead of waiting for PROFOIL.
+        A background run of an older input is cancelled.
+        """
+        if not (SPECULATIVE_RUNS and self.result_cache.enabled): return
+        in_text = self.run_ctx.in_file.read_text()
+        if self.speculative_run is not None and self.speculative_run.input == in_text: return
+        self.cancel_speculative_run()
+        if in_text in self.result_cache: return
+
+        # speculation is optional, so it never waits for a busy pool
+        slot = self.worker_pool.acquire(block=False)
+        if slot is None: return
+        slot.start_job()
+        slot.prepare(in_text)
+        thread = ProfoilRunThread(self.new_process(slot.workdir, slot.command), parent=self)
+        thread.input, thread.slot = in_text, slot
+        thread.run_finished.connect(lambda process, thread=thread: self.on_speculative_finished(thread))
+        self.speculative_run = thread
+        thread.start()
+
+    def cancel_speculative_run(self):
+        """
+        Stale background runs are killed, their worker slot is released by on_speculative_finished(...)
+        """
+        if self.speculative_run is not None:
+            self.speculative_run.cancel()
+            self.speculative_run = None
+
+    def on_speculative_finished(self, thread):
+        """
+        Stores the outputs of a background run in the cache. If Run was pressed in the meantime
+        with the same input, the UI is updated from the cache as if PROFOIL was run directly.
+        """
+        thread.wait()
+        process = thread.process
+        slot = thread.slot
+        if process.succeeded:
+            self.result_cache.store(thread.input, slot.workdir)
+        elif thread is self.run_thread:
+            self.copy_slot_outputs(slot)
+        slot.finish_job(process)
+        self.worker_pool.release(slot)
+
+        if thread is self.speculative_run:
+            self.speculative_run = None
+
+        if thread is self.run_thread:
+            self.run_thread = None
+            self.stop_live_log()
+            self.btn_run_profoil.setEnabled(True)
+            if process.succeeded:
+                self.run_from_profoil_in(self.on_run_finished)
+            else:
+                self.statusbar.showMessage("PROFOIL {} in {:.2f} s".format(process.status, process.elapsed))
+                self.update_from_run(process.status, process.error, process.elapsed)
+
+    def copy_slot_outputs(self, slot):
+        """
+        Copies what PROFOIL wrote in a worker slot into the WORKDIR, as if it had been run there
+        """
+        workdir = self.run_ctx.workdir
+        with os.scandir(slot.workdir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name != slot.ctx.in_file.name:
+                    shutil.copy(entry.path, workdir/entry.name)
+        # ProfoilProcess removes the failure report of an earlier run from its own workdir only
+        fail_file = workdir/"profoil.fail.json"
+        if not (slot.workdir/fail_file.name).is_file() and fail_file.is_file():
+            fail_file.unlink()
 
     def extract_all_profoil_data(self):
         """
         Once the PROFOIL is finished running, the data will be in the WORKDIR.
-        This functions updates all the relevant fields in the UI
-        from the PROFOIL output files in one go
-        """
-        self.x,                \
-        self.y,                \
-        self.xy_marker_upper,  \
-        self.xy_marker_lower,  \
-        self.ue_lines,         \
-        self.upper_vel_markers,\
-        self.lower_vel_markers,\
-        self.nu_upper,         \
-        self.alfa_upper,       \
-        self.nu_lower,         \
-        self.alfa_lower,       \
-        self.ile,              \
-        self.nu_conv_upper,    \
-        self.alfa_conv_upper,  \
-        self.nu_conv_lower,    \
-        self.alfa_conv_lower = p_intf.extract_all_data()
+        The RunResult holds the raw arrays of the output files, the plotting
+        products are derived from them when the plots ask for them
+        """
+        run_result = self.revisions.result(self.run_revision)
+        self.run_result = run_result if run_result is not None else self.run_ctx.extract_all_data()
+        self.revisions.attach(self.run_revision, self.run_result)
 
     def update_file_view(self):
         """
         Updates the text boxes in the File View tab
         """
-        self.plainTextEdit_profoil_log.setPlainText(p_intf.catfile(WORKDIR/"profoil.log", tail=0))
-        self.plainTextEdit_profoil_in.setPlainText(p_intf.catfile(WORKDIR/"profoil.in", tail=0))
+        self.plainTextEdit_profoil_log.setPlainText(self.run_ctx.log.text)
+        self.plainTextEdit_profoil_in.setPlainText(p_intf.catfile(self.run_ctx.in_file, tail=0))
 
         # upon updating  plainTextEdit_profoil_in change the save button color back to black
         self.btn_save_profoil_in.setStyleSheet('QPushButton {color: black;}')
@@ -675,14 +1073,14 @@ class ProfoilUI(DragDropWindow, Ui_MainWindow, ProfoilCanvas):
         """
         Updates the text boxes in the File View tab
         """
-        self.plainTextEdit_profoil_dmp.setPlainText(p_intf.catfile(WORKDIR/"profoil.dmp", tail=0))
-        self.plainTextEdit_profoil_xy.setPlainText(p_intf.catfile(WORKDIR/"profoil.xy", tail=0))
+        self.plainTextEdit_profoil_dmp.setPlainText(p_intf.catfile(self.run_ctx.dmp_file, tail=0))
+        self.plainTextEdit_profoil_xy.setPlainText(p_intf.catfile(self.run_ctx.xy_file, tail=0))
 
     def update_summary_text(self):
         """
         updates the summary label in the design view
         """
-        self.lbl_summary.setText(p_intf.extract_summary(WORKDIR/"profoil.log"))
+        self.lbl_summary.setText(self.run_ctx.extract_summary())
 
     def annotate_profoil_in(self):
         """
@@ -713,6 +1111,7 @@ class ProfoilUI(DragDropWindow, Ui_MainWindow, ProfoilCanvas):
         MENU_TEXT_LENGTH = 24
         self.actionOpen.setText(f"{self.actionOpen.text().ljust(MENU_TEXT_LENGTH-len(SHORTCUT_OPEN))}({SHORTCUT_OPEN})")
         self.actionSave.setText(f"{self.actionSave.text().ljust(MENU_TEXT_LENGTH-len(SHORTCUT_SAVE_AS))}({SHORTCUT_SAVE_AS})")
+        self.actionRun_History.setText(f"{self.actionRun_History.text().ljust(MENU_TEXT_LENGTH-len(SHORTCUT_RUN_HISTORY))}({SHORTCUT_RUN_HISTORY})")
 
         # Design View buttons        
         self.btn_start_edits.setText(
@@ -0,0 +1,66 @@
+# Copyright (c) 2022 Kanishka Jayawardane [kanishkagj@yahoo.com]
+# Copyright (c) 2022 Michael Selig
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Qt front-end for profoil_runner.ProfoilProcess.
+# The process is supervised on a QThread and the outcome is handed back to the GUI thread
+# through the run_finished signal, so the main window stays responsive while PROFOIL is running.
+
+import threading
+
+from PyQt5 import QtCore
+
+from profoil_runner import ProfoilProcess
+
+class ProfoilRunThread(QtCore.QThread):
+
+    # emitted with the ProfoilProcess once the run is over in any way (finished/cancelled/timeout/error)
+    run_finished = QtCore.pyqtSignal(object)
+
+    # emitted with each line of profoil.log while PROFOIL is running
+    log_line = QtCore.pyqtSignal(str)
+
+    def __init__(self, process=None, parent=None):
+        super().__init__(parent)
+        self.process = process or ProfoilProcess()
+        self.process.on_line = self.on_line
+        # lines emitted so far, replayed to a slot connected after the run started (promoted speculative run)
+        self.log_lines = []
+        self.log_lock = threading.Lock()
+
+    def on_line(self, line):
+        with self.log_lock:
+            self.log_lines.append(line)
+            self.log_line.emit(line)
+
+    def follow_log(self, slot):
+        """
+        Connects slot to log_line and returns the lines emitted before, none is missed or repeated
+        """
+        with self.log_lock:
+            self.log_line.connect(slot)
+            return list(self.log_lines)
+
+    def run(self):
+        self.process.run()
+        self.run_finished.emit(self.process)
+
+    def cancel(self):
+        self.process.cancel()
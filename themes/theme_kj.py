@@ -31,6 +31,41 @@
 WORK_DIR                        = "../work"
 BIN_DIR                         = "../bin"
 
+#======================================== PROFOIL EXECUTION =========================================
+
+PROFOIL_TIMEOUT                 = 0                 # Wall-clock limit of a PROFOIL run in seconds
+                                                    # 0 or None disables the limit
+PROFOIL_CPU_LIMIT               = 0                 # CPU time limit of a PROFOIL run in seconds, 0 disables
+PROFOIL_MAX_LOG_MB              = 0                 # profoil.log size cap in MB, 0 disables
+PROFOIL_DIVERGENCE_ITERATIONS   = 0                 # Kills a run when the residual keeps growing over this
+                                                    # many consecutive Newton iterations, 0 disables
+
+RESULT_CACHE_DIR                = "../work/cache"   # Outputs of previous runs are kept here so that
+                                                    # re-running the same profoil.in is instant
+RESULT_CACHE_SIZE_MB            = 200               # Size cap of the cache, least recently used runs
+                                                    # are evicted first. 0 disables the cache
+SPECULATIVE_RUNS                = False             # Starts PROFOIL in the background as soon as edits are
+                                                    # applied, so that the results are ready when Run is pressed.
+                                                    # Requires the result cache (RESULT_CACHE_SIZE_MB > 0)
+
+REVISION_RESULTS                = 32                # Run results kept in memory along with the profoil.in
+                                                    # revisions of the session (Revert/Undo history)
+HISTORY_DB                      = "../work/history.sqlite3"
+                                                    # Every run is recorded in this SQLite database for the
+                                                    # Run History browser (File menu), "" disables it
+HISTORY_PAGE_SIZE               = 200               # Runs read from the database at a time by the browser
+
+SCRATCH_DIR                     = ""                # Scratch directories of the worker slots, empty picks
+                                                    # /dev/shm when available, otherwise the system temp dir
+WORKER_POOL_SIZE                = 0                 # Max number of concurrent background runs, 0 = all cores
+WORKER_IDLE_TEARDOWN_S          = 60                # Idle worker slots are removed after this many seconds
+
+USE_PROFOIL_SERVER              = False             # Sends the runs to profoil_server.py instead of starting
+                                                    # PROFOIL directly, so that several UI instances share one pool
+PROFOIL_SERVER_ADDRESS          = "../work/profoil_server.sock"
+                                                    # Unix socket path, or "127.0.0.1:<port>" (Windows)
+PROFOIL_SERVER_WORKERS          = 0                 # Max number of concurrent runs of the server, 0 = all cores
+
 #===================================== CONFIG OF PHI-ALPHA PLOT =====================================
 
 AN_PREV_LINE_LINESTYLE          = '--'              # dotted lines for previous plot
@@ -45,6 +80,8 @@ AN_MODI_LINE_COLOR              = "green"           # color of modifiable line
 
 AN_SPLN_LINE_LINESTYLE          = '--+'             # dotted lines with + marks for spline
 AN_SPLN_LINE_COLOR              = 'red'             # dotted lines with + marks for spline
+CURSOR_EDIT_BLIT                = True              # cursor edit clicks only redraw the spline line over a cached background
+SHOW_RENDER_COUNTS              = False             # debug: full figure draws of the last action shown in the status bar
 
 AN_PREV_LINE_MARKER             = "o"               # markers on the alfa_nu plot
 AN_CURR_LINE_MARKER             = "o"               # markers on the alfa_nu plot
@@ -94,6 +131,12 @@ LOWER_SURFACE_PHI_MARKER        = "v"               # Downward facing Triangular
 UPPER_SURFACE_PHI_MARKER_SIZE   = 8                 # Phi marker size - upper Surface
 LOWER_SURFACE_PHI_MARKER_SIZE   = 8                 # Phi marker size - lower Surface
 
+#================================= CONFIG OF LIVE RESIDUAL PLOT =====================================
+
+RES_PLOT_LINESTYLE              = '.-'              # Newton iteration residuals while PROFOIL is running
+RES_PLOT_COLOR                  = "red"             # Residual plot line color
+LIVE_LOG_REFRESH_MS             = 100               # Live log/residual plot refresh interval in milliseconds
+
 #================================= CONFIG RELATED TO MAIN WINDOW ====================================
 
 MAIN_WINDOW_WIDTH               = 1300              # Main window width
@@ -119,6 +162,8 @@ SHORTCUT_HISTORY_TOGGLE         = "H"               # Shortcut for toggling Hist
 SHORTCUT_SURFACE_TOGGLE         = "Q"               # Shortcut to toggle between Upper and Lower surface alpha* selection
 SHORTCUT_TOGGLE_COMMENT         = "Ctrl+/"          # Shortcut for toggling comment lines
 SHORTCUT_ANNOTATE               = "Ctrl+N"          # Shortcut for annotating profoil.in file
+SHORTCUT_CANCEL_RUN             = "Esc"             # Shortcut for cancelling a running PROFOIL
+SHORTCUT_RUN_HISTORY            = "Ctrl+H"          # Shortcut for File | Run History browser
 
 # Shortcuts for matplotlib toolbar in "Design View" tab:
 SHORTCUT_HOME                   = "A"               # Shortcut for Home action (reset graphics) in Design View